@@ -1,7 +1,26 @@
 #!/bin/sh
 set -e
 
-python manage.py migrate --noinput
-python manage.py collectstatic --noinput --verbosity 0
+# `manage.py boot` skips migrate/collectstatic when the database and static files already match
+# this image; pending migrations are applied by one replica at a time.
 
-exec gunicorn helloworld_project.wsgi:application --bind 0.0.0.0:${PORT:-8000}
+# Run one container per role from the same image: `web` (the default) and `worker`, which
+# runs the queued background tasks (inventory PDFs, payment status retries).
+case "${1:-web}" in
+    web)
+        # Boot runs beside the server instead of before it, so /healthz/ answers as soon as
+        # gunicorn binds even while boot waits on the migration lock. Static files were already
+        # collected into the image; until migrations finish this replica serves the old schema,
+        # as the previous release's replicas do during a rolling deploy.
+        (python manage.py boot || echo "boot failed; see the output above" >&2) &
+        exec gunicorn helloworld_project.wsgi:application --bind 0.0.0.0:${PORT:-8000}
+        ;;
+    worker)
+        # Tasks may need the new schema, and the worker has no health check to answer.
+        python manage.py boot
+        exec python manage.py run_worker --processes "${WORKER_PROCESSES:-1}"
+        ;;
+    *)
+        exec "$@"
+        ;;
+esac
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -18,6 +19,15 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# How /media/ responses get their body: '' streams it from Django (sendfile through
+# wsgi.file_wrapper), 'x-accel-redirect' hands it to nginx, 'x-sendfile' to Apache/lighttpd.
+MEDIA_SERVE_BACKEND = os.environ.get('MEDIA_SERVE_BACKEND', '')
+# nginx `internal` location aliased to MEDIA_ROOT, for 'x-accel-redirect'.
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/')
+# Upload directories served publicly; invoices and other stored files are not.
+MEDIA_PUBLIC_PREFIXES = ('products/',)
+# Browser cache lifetime for media without a content hash in the name.
+MEDIA_CACHE_MAX_AGE = int(os.environ.get('MEDIA_CACHE_MAX_AGE', '3600'))
 LOGIN_REDIRECT_URL = "home"   # después de login o registro, redirige a 'home'
 LOGOUT_REDIRECT_URL = "home"  # después de logout también a 'home'
 # Stripe Keys
@@ -60,13 +70,18 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'pages.middleware.CorrelationIdMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     # LocaleMiddleware debe ir después de SessionMiddleware y antes de CommonMiddleware
     'django.middleware.locale.LocaleMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # After authentication, which it needs to tell staff apart; profiles everything below it.
+    'pages.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'pages.middleware.GuestCartMiddleware',
+    'pages.middleware.ThrottleMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -101,6 +116,94 @@ DATABASES = {
 }
 
 
+# Cache
+# Local memory is the default. Catalog versions, locks and throttling state must be shared by
+# every process that serves or changes the catalog, though, and local memory is per process, so
+# any deployment with more than one process (gunicorn workers, the task worker) must set
+# DJANGO_CACHE_BACKEND: "file" for the processes of one host, "redis" across hosts. Locally,
+# `manage.py run_cache_server` stands in for Redis.
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'valakia'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / '.cache')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/0'),
+}
+_cache_backend, _cache_location = CACHE_BACKENDS[os.environ.get('DJANGO_CACHE_BACKEND', 'locmem')]
+CACHES = {
+    'default': {
+        'BACKEND': _cache_backend,
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', _cache_location),
+        'TIMEOUT': int(os.environ.get('DJANGO_CACHE_TIMEOUT', '300')),
+        'KEY_PREFIX': 'valakia',
+    }
+}
+
+# Upper bound on the in-process catalog snapshot each worker keeps (pages/catalog.py).
+CATALOG_SNAPSHOT_MAX_BYTES = int(os.environ.get('CATALOG_SNAPSHOT_MAX_BYTES', str(64 * 1024 * 1024)))
+# Seconds shared caches may serve the JSON catalog API before revalidating. Catalog HTML pages
+# render a CSRF token, so they are always private and only revalidated by ETag.
+CATALOG_CACHE_MAX_AGE = int(os.environ.get('CATALOG_CACHE_MAX_AGE', '60'))
+# Bucket edges for the price and stock facets on the product list; each bucket is [edge, next edge).
+CATALOG_PRICE_FACETS = [0, 50000, 100000, 250000, 500000, 1000000]
+CATALOG_STOCK_FACETS = [0, 1, 10]
+# Products kept per entry by `manage.py build_recommendations`.
+RECOMMENDATIONS_PER_PRODUCT = 8
+# Inventory change feed (api/products/changes/): newest entries are held back this many seconds so
+# rows from transactions that commit out of id order are not skipped by a client's cursor.
+PRODUCT_CHANGES_SETTLE_SECONDS = int(os.environ.get('PRODUCT_CHANGES_SETTLE_SECONDS', '2'))
+PRODUCT_CHANGES_PAGE_SIZE = 500
+# `manage.py archive_orders` moves finalized orders untouched for this long out of the live tables.
+ORDER_ARCHIVE_AFTER_DAYS = int(os.environ.get('ORDER_ARCHIVE_AFTER_DAYS', '365'))
+
+# Background tasks (pages/tasks.py, `manage.py run_worker`). A claimed task goes back to the
+# queue if its worker has not finished it within the lease.
+TASK_LEASE_SECONDS = int(os.environ.get('TASK_LEASE_SECONDS', '300'))
+TASK_MAX_ATTEMPTS = 5
+# Retry n waits about base * 2**(n-1) seconds, capped at the max.
+TASK_RETRY_BASE_SECONDS = 10
+TASK_RETRY_MAX_SECONDS = 60 * 60
+TASK_KEEP_DONE_DAYS = 7
+
+# Request profiling (pages/profiling.py): staff send "X-Profile: 1" to profile a request, and
+# this fraction of all requests is profiled too. Results are listed under "Request profiles" in the admin.
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_INTERVAL_MS = 5
+PROFILE_MAX_QUERIES = 500
+# Older profiles are deleted as new ones are stored.
+PROFILE_KEEP = 500
+
+# Anonymous carts live in a signed cookie (pages/guest_cart.py); these bound its size.
+GUEST_CART_MAX_ITEMS = 50
+GUEST_CART_MAX_QUANTITY = 99
+GUEST_CART_MAX_AGE = 60 * 60 * 24 * 30
+
+# Token-bucket request limits per URL name (pages/throttle.py), as "<requests>/<s|min|h>".
+# "user" buckets apply to logged-in users, "ip" buckets to every client address.
+# Keyed by URL name (the `name=` in urls.py), not by view function.
+THROTTLE_RATES = {
+    'add_to_cart': {'user': '30/min', 'ip': '60/min'},
+    'checkout': {'user': '5/min', 'ip': '10/min'},
+    'product_inventory_api': {'ip': '60/min'},
+    'product_changes_api': {'ip': '120/min'},
+    'product_suggest_api': {'ip': '600/min'},
+}
+# Reverse proxies in front of gunicorn; the client address is read from X-Forwarded-For when set.
+THROTTLE_PROXY_COUNT = int(os.environ.get('DJANGO_THROTTLE_PROXY_COUNT', '0'))
+
+
+# Sessions
+# Cache-first by default: reads come from the cache and only fall back to django_session on a miss.
+# Use "signed_cookies" to keep sessions out of the server entirely, or "cache" / "db" for the pure backends.
+SESSION_ENGINES = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+    'db': 'django.contrib.sessions.backends.db',
+}
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get('DJANGO_SESSION_BACKEND', 'cached_db')]
+# Rows deleted per statement by `manage.py purge_sessions`.
+SESSION_PURGE_BATCH_SIZE = int(os.environ.get('DJANGO_SESSION_PURGE_BATCH_SIZE', '1000'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -161,6 +264,42 @@ MERCADOPAGO_PUBLIC_KEY = os.environ.get(
     'MERCADOPAGO_PUBLIC_KEY',
     'TEST-92d8c8f6-025e-404b-ad56-bfb3f3bade08',
 )
+# Minutes a payment preference stays payable; checkouts of an unchanged cart reuse it until then.
+CHECKOUT_PREFERENCE_TTL_MINUTES = int(os.environ.get('CHECKOUT_PREFERENCE_TTL_MINUTES', '30'))
+
+# Logging
+# JSON lines on stdout, written by a background thread (pages/logs.py) so requests never wait on I/O.
+LOG_LEVEL = os.environ.get('DJANGO_LOG_LEVEL', 'INFO')
+# Fraction of sub-WARNING records kept, per logger, for high-volume events.
+LOG_SAMPLE_RATES = {
+    'pages.throttle': 0.1,
+}
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'correlation_id': {'()': 'pages.logs.CorrelationIdFilter'},
+        'sampling': {'()': 'pages.logs.SamplingFilter', 'rates': LOG_SAMPLE_RATES},
+    },
+    'formatters': {
+        'json': {'()': 'pages.logs.JsonFormatter'},
+    },
+    'handlers': {
+        'queue': {
+            '()': 'pages.logs.BackgroundQueueHandler',
+            'formatter': 'json',
+            'filters': ['correlation_id', 'sampling'],
+        },
+    },
+    'root': {'handlers': ['queue'], 'level': LOG_LEVEL},
+    'loggers': {
+        'django': {'handlers': ['queue'], 'level': LOG_LEVEL, 'propagate': False},
+    },
+}
+# `manage.py test` keeps the loggers, filters and levels (tests read records through their own
+# handlers or assertLogs) but does not print the JSON lines.
+if sys.argv[1:2] == ['test']:
+    LOGGING['handlers']['queue'] = {'class': 'logging.NullHandler'}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
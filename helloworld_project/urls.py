@@ -17,7 +17,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
+from pages.media import serve_media
 
 # Para la vista set_language de Django (cambiar idioma en runtime)
 from django.conf.urls.i18n import i18n_patterns
@@ -27,6 +27,8 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('i18n/', include('django.conf.urls.i18n')),
     path('', include('pages.urls')),
+    # Works with DEBUG off too; see pages/media.py for handing files to nginx/Apache.
+    path(settings.MEDIA_URL.lstrip('/') + '<path:path>', serve_media, name='media'),
     
-]+ static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
 
@@ -1,25 +1,161 @@
-import io
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
 import json
 import urllib.error
-import urllib.request
-from django.http import HttpResponse
-from django.urls import path
-from django.utils import timezone
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest, Now
+from django.core.files.storage import default_storage
+from django.http import FileResponse, HttpResponse
+from django.shortcuts import redirect
+from django.urls import path, reverse
 from django.utils.translation import gettext_lazy as _
 from django.template.response import TemplateResponse
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+from django.utils.html import format_html, format_html_join
 
-from .models import Order, OrderItem, Product
+from .analytics import dashboard_data
+from .catalog import bump_catalog_version
+from .changefeed import record_product_changes
+from .exports import streaming_export_response
+from .feeds import FeedError, fetch_chunks, ingest_feeds
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem, PartnerFeed, Product, RequestProfile, Task
+from .profiling import hot_frames
+from .reports import INVENTORY_REPORT_NAME, build_inventory_report
+from .tasks import enqueue, is_pending
+from .text import normalize
+
+# The ad-hoc "Consume API" fetch gets the same limits as a registered partner feed by default.
+CONSUME_API_TIMEOUT = 30
+CONSUME_API_MAX_BYTES = 5 * 1024 * 1024
+# Ids are 64-bit signed integers.
+MAX_PRODUCT_ID = 2**63 - 1
+
+
+class RangeListFilter(admin.SimpleListFilter):
+	"""Fixed buckets over an indexed integer field, instead of one choice per distinct value."""
+
+	field_name = None
+	# (value, label, lower bound, upper bound or None); bounds are inclusive.
+	ranges = ()
+
+	def lookups(self, request, model_admin):
+		return [(value, label) for value, label, _lower, _upper in self.ranges]
+
+	def queryset(self, request, queryset):
+		for value, _label, lower, upper in self.ranges:
+			if self.value() == value:
+				queryset = queryset.filter(**{f"{self.field_name}__gte": lower})
+				if upper is not None:
+					queryset = queryset.filter(**{f"{self.field_name}__lte": upper})
+				return queryset
+		return queryset
+
+
+class SalesRangeFilter(RangeListFilter):
+	title = _("Quantity sold")
+	parameter_name = "sold"
+	field_name = "cantidad_vendidos"
+	ranges = (
+		("none", _("None"), 0, 0),
+		("1-9", _("1 to 9"), 1, 9),
+		("10-99", _("10 to 99"), 10, 99),
+		("100+", _("100 or more"), 100, None),
+	)
+
+
+class StockRangeFilter(RangeListFilter):
+	title = _("Stock")
+	parameter_name = "stock_level"
+	field_name = "stock"
+	ranges = (
+		("out", _("Out of stock"), 0, 0),
+		("low", _("1 to 5"), 1, 5),
+		("6-20", _("6 to 20"), 6, 20),
+		("21+", _("More than 20"), 21, None),
+	)
+
+
+class ProductActionForm(ActionForm):
+	stock_delta = forms.IntegerField(required=False, label=_("Stock change"))
+	price = forms.DecimalField(required=False, min_value=0, max_digits=10, decimal_places=2, label=_("New price"))
 
 
 class ProductAdmin(admin.ModelAdmin):
 	list_display = ("name", "price", "stock", "cantidad_vendidos", "es_producto_dia")
-	search_fields = ("name", "descripcion")
-	list_filter = ("cantidad_vendidos", "es_producto_dia")
+	search_fields = ("name",)
+	search_help_text = _("Any part of the name, ignoring accents and case, or a product id.")
+	list_filter = (SalesRangeFilter, StockRangeFilter, "es_producto_dia")
 	fields = ("name", "price", "stock", "image", "descripcion", "cantidad_vendidos", "es_producto_dia")
 	change_list_template = "admin/pages/product/change_list.html"
+	actions = ["adjust_stock", "set_price", "rotate_product_of_day"]
+	action_form = ProductActionForm
+	# Skips the unfiltered COUNT(*) the changelist would otherwise run on every page.
+	show_full_result_count = False
+
+	def get_search_results(self, request, queryset, search_term):
+		# One match on the short, normalized search_name (accents and case folded in Python,
+		# which SQLite's LOWER cannot do beyond ASCII); the long descripcion is never scanned.
+		term = search_term.strip()
+		if not term:
+			return queryset, False
+		# Larger numbers cannot be ids, and overflow SQLite's integer parameters.
+		by_id = [Q(pk=int(term))] if term.isascii() and term.isdigit() and int(term) <= MAX_PRODUCT_ID else []
+		key = normalize(term)
+		name = Q(search_name__contains=key) if key else Q(name__icontains=term)
+		return queryset.filter(Q(name, *by_id, _connector=Q.OR)), False
+
+	def _bulk_update(self, queryset, **values):
+		# The selection is a subquery, so "select all" on a large catalog binds no id list.
+		selected = queryset.values("pk")
+		with transaction.atomic():
+			# Logged first: the update can move products out of the selection's filters.
+			record_product_changes(selected.values_list("pk", flat=True).iterator(chunk_size=2000))
+			updated = Product.objects.filter(pk__in=selected).update(updated_at=Now(), **values)
+		bump_catalog_version()
+		return updated
+
+	def _action_value(self, request, field):
+		form = self.action_form(request.POST)
+		form.fields["action"].choices = self.get_action_choices(request)
+		if not form.is_valid() or form.cleaned_data[field] is None:
+			label = form.fields[field].label
+			self.message_user(request, _("Fill in “%(field)s” to run this action.") % {"field": label}, messages.ERROR)
+			return None
+		return form.cleaned_data[field]
+
+	def adjust_stock(self, request, queryset):
+		delta = self._action_value(request, "stock_delta")
+		if delta is None:
+			return
+		# Clamped at zero in SQL: stock is unsigned.
+		updated = self._bulk_update(queryset, stock=Greatest(F("stock") + delta, 0))
+		self.message_user(request, _("Stock changed by %(delta)d on %(count)d product(s).") % {"delta": delta, "count": updated})
+
+	adjust_stock.short_description = _("Adjust stock of selected products by “Stock change”")
+
+	def set_price(self, request, queryset):
+		price = self._action_value(request, "price")
+		if price is None:
+			return
+		updated = self._bulk_update(queryset, price=price)
+		self.message_user(request, _("Price set to %(price)s on %(count)d product(s).") % {"price": price, "count": updated})
+
+	set_price.short_description = _("Set price of selected products to “New price”")
+
+	def rotate_product_of_day(self, request, queryset):
+		# Moves the flag to the selected product after the current one (by id), wrapping around.
+		selected = list(queryset.order_by("pk").values_list("pk", flat=True))
+		current = Product.objects.filter(es_producto_dia=True).values_list("pk", flat=True).first()
+		following = [pk for pk in selected if current is not None and pk > current]
+		chosen = (following or selected)[0]
+		product_ids = list(Product.objects.filter(Q(es_producto_dia=True) | Q(pk=chosen)).values_list("pk", flat=True))
+		Product.objects.filter(pk__in=product_ids).update(es_producto_dia=Q(pk=chosen), updated_at=Now())
+		record_product_changes(product_ids)
+		bump_catalog_version()
+		self.message_user(request, _("%(name)s is now the product of the day.") % {"name": Product.objects.get(pk=chosen).name})
+
+	rotate_product_of_day.short_description = _("Rotate product of the day through selected products")
 
 	def get_urls(self):
 		urls = super().get_urls()
@@ -29,6 +165,11 @@ class ProductAdmin(admin.ModelAdmin):
 				self.admin_site.admin_view(self.export_inventory_pdf),
 				name="pages_product_export_inventory",
 			),
+			path(
+				"inventory-report/",
+				self.admin_site.admin_view(self.inventory_report_view),
+				name="pages_product_inventory_report",
+			),
 			path(
 				"consume-api/",
 				self.admin_site.admin_view(self.consume_api_view),
@@ -38,46 +179,24 @@ class ProductAdmin(admin.ModelAdmin):
 		return custom_urls + urls
 
 	def export_inventory_pdf(self, request):
-		buffer = io.BytesIO()
-		pdf = canvas.Canvas(buffer, pagesize=letter)
-		width, height = letter
-
-		pdf.setFont("Helvetica-Bold", 16)
-		pdf.drawString(72, height - 72, str(_("Inventory report")))
-		pdf.setFont("Helvetica", 10)
-		generated_at = timezone.localtime().strftime("%Y-%m-%d %H:%M")
-		pdf.drawString(72, height - 90, f"{str(_('Generated on'))}: {generated_at}")
-
-		pdf.setFont("Helvetica-Bold", 12)
-		pdf.drawString(72, height - 120, str(_("Product")))
-		pdf.drawString(320, height - 120, str(_("Stock")))
-
-		y_position = height - 140
-		pdf.setFont("Helvetica", 11)
-
-		products = Product.objects.order_by("name")
-
-		if not products:
-			pdf.drawString(72, y_position, str(_("No products available.")))
-		else:
-			for product in products:
-				pdf.drawString(72, y_position, product.name)
-				pdf.drawRightString(400, y_position, str(product.stock))
-				y_position -= 18
-				if y_position < 72:
-					pdf.showPage()
-					pdf.setFont("Helvetica-Bold", 12)
-					pdf.drawString(72, height - 72, str(_("Product")))
-					pdf.drawString(320, height - 72, str(_("Stock")))
-					pdf.setFont("Helvetica", 11)
-					y_position = height - 90
-
-		pdf.save()
-
-		buffer.seek(0)
-		response = HttpResponse(buffer.getvalue(), content_type="application/pdf")
-		response["Content-Disposition"] = "attachment; filename=inventory.pdf"
-		return response
+		# Built by the task worker; the admin only queues it once.
+		if not is_pending(build_inventory_report):
+			enqueue(build_inventory_report)
+		self.message_user(
+			request, _("The inventory PDF is being generated. Download it from “Latest inventory PDF” in a moment.")
+		)
+		return redirect("admin:pages_product_changelist")
+
+	def inventory_report_view(self, request):
+		if not default_storage.exists(INVENTORY_REPORT_NAME):
+			self.message_user(request, _("No inventory PDF has been generated yet."), messages.WARNING)
+			return redirect("admin:pages_product_changelist")
+		return FileResponse(
+			default_storage.open(INVENTORY_REPORT_NAME, "rb"),
+			as_attachment=True,
+			filename="inventory.pdf",
+			content_type="application/pdf",
+		)
 
 	def consume_api_view(self, request):
 		default_endpoint = request.build_absolute_uri("/api/products/")
@@ -90,9 +209,9 @@ class ProductAdmin(admin.ModelAdmin):
 				error = _("You must provide an endpoint URL.")
 			else:
 				try:
-					with urllib.request.urlopen(endpoint) as response:
-						charset = response.headers.get_content_charset() or "utf-8"
-						payload = response.read().decode(charset)
+					payload = b"".join(
+						fetch_chunks(endpoint, timeout=CONSUME_API_TIMEOUT, max_bytes=CONSUME_API_MAX_BYTES)
+					).decode("utf-8", errors="replace")
 					try:
 						parsed = json.loads(payload)
 						response_text = json.dumps(parsed, indent=2, ensure_ascii=False)
@@ -100,6 +219,8 @@ class ProductAdmin(admin.ModelAdmin):
 						response_text = payload
 				except urllib.error.URLError as exc:
 					error = str(exc.reason)
+				except (FeedError, TimeoutError) as exc:
+					error = str(exc)
 				except Exception as exc:  # pragma: no cover - defensive
 					error = str(exc)
 
@@ -116,6 +237,44 @@ class ProductAdmin(admin.ModelAdmin):
 admin.site.register(Product, ProductAdmin)
 
 
+@admin.register(PartnerFeed)
+class PartnerFeedAdmin(admin.ModelAdmin):
+	list_display = (
+		"name",
+		"enabled",
+		"match_on",
+		"interval_minutes",
+		"last_status",
+		"last_run_at",
+		"last_duration_ms",
+		"items_seen",
+		"products_updated",
+	)
+	list_filter = ("enabled", "last_status")
+	search_fields = ("name", "url")
+	actions = ["run_now"]
+	readonly_fields = (
+		"last_run_at",
+		"last_status",
+		"last_error",
+		"last_duration_ms",
+		"items_seen",
+		"products_updated",
+	)
+
+	def run_now(self, request, queryset):
+		for feed in ingest_feeds(queryset.order_by("name")):
+			level = messages.SUCCESS if feed.last_status == PartnerFeed.Status.OK else messages.ERROR
+			self.message_user(
+				request,
+				_("%(feed)s: %(updated)d product(s) updated from %(seen)d item(s). %(error)s")
+				% {"feed": feed.name, "updated": feed.products_updated, "seen": feed.items_seen, "error": feed.last_error},
+				level,
+			)
+
+	run_now.short_description = _("Ingest selected feeds now")
+
+
 class OrderItemInline(admin.TabularInline):
 	model = OrderItem
 	extra = 0
@@ -133,6 +292,8 @@ class OrderAdmin(admin.ModelAdmin):
 	list_filter = ("status", "created_at")
 	search_fields = ("preference_id", "payment_id", "user__username")
 	inlines = [OrderItemInline]
+	actions = ["export_csv", "export_jsonl"]
+	change_list_template = "admin/pages/order/change_list.html"
 	readonly_fields = (
 		"preference_id",
 		"payment_id",
@@ -142,3 +303,183 @@ class OrderAdmin(admin.ModelAdmin):
 		"created_at",
 		"updated_at",
 	)
+
+	def export_csv(self, request, queryset):
+		return streaming_export_response(queryset, "csv")
+
+	export_csv.short_description = _("Export selected orders with items (CSV)")
+
+	def export_jsonl(self, request, queryset):
+		return streaming_export_response(queryset, "jsonl")
+
+	export_jsonl.short_description = _("Export selected orders with items (JSON Lines)")
+
+	def get_urls(self):
+		urls = super().get_urls()
+		custom_urls = [
+			path(
+				"sales-dashboard/",
+				self.admin_site.admin_view(self.sales_dashboard_view),
+				name="pages_order_sales_dashboard",
+			),
+		]
+		return custom_urls + urls
+
+	def sales_dashboard_view(self, request):
+		context = dict(
+			self.admin_site.each_context(request),
+			title=_("Sales dashboard"),
+			opts=self.model._meta,
+			**dashboard_data(),
+		)
+		return TemplateResponse(request, "admin/pages/order/sales_dashboard.html", context)
+
+
+class ArchivedOrderItemInline(admin.TabularInline):
+	model = ArchivedOrderItem
+	extra = 0
+	fields = ("product_name", "quantity", "unit_price")
+	readonly_fields = fields
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+	"""Read-only view of orders moved out of the live tables by `manage.py archive_orders`."""
+
+	list_display = ("preference_id", "user", "status", "total", "created_at", "archived_at")
+	list_filter = ("status",)
+	search_fields = ("preference_id", "payment_id", "user__username")
+	date_hierarchy = "created_at"
+	inlines = [ArchivedOrderItemInline]
+	actions = ["export_csv", "export_jsonl"]
+	list_select_related = ("user",)
+	show_full_result_count = False
+
+	export_csv = OrderAdmin.export_csv
+	export_jsonl = OrderAdmin.export_jsonl
+
+	def has_add_permission(self, request):
+		return False
+
+	def has_change_permission(self, request, obj=None):
+		return False
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+	"""Background tasks queued by views and run by `manage.py run_worker`."""
+
+	list_display = ("name", "status", "attempts", "max_attempts", "run_at", "locked_by", "updated_at")
+	list_filter = ("status", "name")
+	search_fields = ("name", "correlation_id")
+	readonly_fields = (
+		"name",
+		"args",
+		"kwargs",
+		"status",
+		"attempts",
+		"locked_by",
+		"locked_until",
+		"last_error",
+		"correlation_id",
+		"created_at",
+		"updated_at",
+	)
+	actions = ["retry_now"]
+	show_full_result_count = False
+
+	def has_add_permission(self, request):
+		return False
+
+	def retry_now(self, request, queryset):
+		updated = queryset.exclude(status=Task.Status.RUNNING).update(
+			status=Task.Status.QUEUED, run_at=Now(), attempts=0, last_error="", updated_at=Now()
+		)
+		self.message_user(request, _("%(count)d task(s) queued again.") % {"count": updated})
+
+	retry_now.short_description = _("Run selected tasks again now")
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+	"""Profiles stored by ProfilingMiddleware; the folded stacks download opens in speedscope or flamegraph.pl."""
+
+	list_display = (
+		"created_at",
+		"method",
+		"path",
+		"status_code",
+		"duration_ms",
+		"sql_count",
+		"sql_ms",
+		"template_ms",
+		"sample_count",
+		"trigger",
+		"folded_link",
+	)
+	list_filter = ("trigger", "view_name")
+	search_fields = ("path", "correlation_id")
+	date_hierarchy = "created_at"
+	list_select_related = ("user",)
+	show_full_result_count = False
+	fields = (
+		"method",
+		"path",
+		"view_name",
+		"status_code",
+		"user",
+		"trigger",
+		"correlation_id",
+		"created_at",
+		"duration_ms",
+		"sql_count",
+		"sql_ms",
+		"template_ms",
+		"sample_count",
+		"sample_interval_ms",
+		"folded_link",
+		"hot_frames_table",
+		"slowest_queries",
+		"templates_table",
+	)
+	readonly_fields = fields
+
+	def has_add_permission(self, request):
+		return False
+
+	def has_change_permission(self, request, obj=None):
+		return False
+
+	def get_urls(self):
+		return [
+			path(
+				"<path:object_id>/folded/",
+				self.admin_site.admin_view(self.folded_view),
+				name="pages_requestprofile_folded",
+			),
+		] + super().get_urls()
+
+	def folded_view(self, request, object_id):
+		profile = self.get_object(request, object_id)
+		if profile is None or not self.has_view_permission(request, profile):
+			return self._get_obj_does_not_exist_redirect(request, self.opts, object_id)
+		response = HttpResponse(profile.folded, content_type="text/plain; charset=utf-8")
+		response["Content-Disposition"] = f"attachment; filename=profile-{profile.pk}.folded"
+		return response
+
+	@admin.display(description=_("Flame graph"))
+	def folded_link(self, obj):
+		return format_html('<a href="{}">{}</a>', reverse("admin:pages_requestprofile_folded", args=[obj.pk]), _("Folded stacks"))
+
+	@admin.display(description=_("Hottest frames (samples)"))
+	def hot_frames_table(self, obj):
+		return format_html_join("", "<div><code>{}</code> {}</div>", hot_frames(obj.folded))
+
+	@admin.display(description=_("Slowest queries (ms)"))
+	def slowest_queries(self, obj):
+		queries = sorted(obj.queries, key=lambda query: -query["ms"])[:20]
+		return format_html_join("", "<div>{} <code>{}</code></div>", ((query["ms"], query["sql"]) for query in queries))
+
+	@admin.display(description=_("Templates (ms)"))
+	def templates_table(self, obj):
+		return format_html_join("", "<div><code>{}</code> {}</div>", ((t["template"], t["ms"]) for t in obj.templates))
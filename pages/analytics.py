@@ -0,0 +1,156 @@
+"""Daily and monthly order rollups behind the admin sales dashboard.
+
+``refresh_sales_analytics`` recomputes only the day buckets touched by orders changed since
+the last run (plus the months containing them), so a refresh costs time proportional to
+recent activity and the dashboard reads a fixed number of rows regardless of order volume.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .archive import ORDER_SOURCES
+from .models import Order, ProductSalesDay, RollupCheckpoint, SalesDay, SalesMonth
+
+CHECKPOINT_NAME = "sales_analytics"
+# Buckets are recomputed from scratch, so overlapping the previous run is harmless and covers
+# orders whose transactions committed after that run read the table.
+CHECKPOINT_OVERLAP = timedelta(minutes=5)
+PERIOD_FIELDS = ("orders_pending", "orders_approved", "orders_rejected", "orders_cancelled", "revenue", "units")
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _day_bounds(first, last):
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(first, time.min), tz)
+    end = timezone.make_aware(datetime.combine(last + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def _day_spans(days):
+    """``[(first, last)]`` runs of consecutive days, so a refresh never reads the days between changes."""
+    spans = []
+    for day in sorted(days):
+        if spans and day == spans[-1][1] + timedelta(days=1):
+            spans[-1][1] = day
+        else:
+            spans.append([day, day])
+    return spans
+
+
+def _in_spans(field, spans):
+    ranges = Q()
+    for first, last in spans:
+        start, end = _day_bounds(first, last)
+        ranges |= Q(**{f"{field}__gte": start, f"{field}__lt": end})
+    return ranges
+
+
+def _compute_days(days, spans=None):
+    """Aggregate the given days from live and archived orders: one grouped query per table for orders, one for units."""
+    spans = spans or _day_spans(days)
+    created = _in_spans("created_at", spans)
+    item_created = _in_spans("order__created_at", spans)
+    totals = defaultdict(lambda: dict.fromkeys(PERIOD_FIELDS, 0))
+    for order_model, item_model in ORDER_SOURCES:
+        for row in (
+            order_model.objects.filter(created)
+            .annotate(day=TruncDate("created_at"))
+            .values("day", "status")
+            .annotate(orders=Count("id"), revenue=Sum("total"))
+            .order_by()
+        ):
+            bucket = totals[row["day"]]
+            bucket[f"orders_{row['status']}"] += row["orders"]
+            if row["status"] == Order.Status.APPROVED:
+                bucket["revenue"] += row["revenue"] or Decimal("0")
+        for row in (
+            item_model.objects.filter(item_created, order__status=Order.Status.APPROVED)
+            .annotate(day=TruncDate("order__created_at"))
+            .values("day")
+            .annotate(units=Sum("quantity"))
+            .order_by()
+        ):
+            totals[row["day"]]["units"] += row["units"] or 0
+    return {day: totals[day] for day in days}
+
+
+def _changed_days(since):
+    if since is None:
+        # A full rebuild covers the archive too; archived orders never change, so incremental runs skip it.
+        return {
+            day
+            for order_model, _item_model in ORDER_SOURCES
+            for day in order_model.objects.annotate(day=TruncDate("created_at")).values_list("day", flat=True).distinct()
+        }
+    orders = Order.objects.filter(updated_at__gte=since)
+    return set(orders.annotate(day=TruncDate("created_at")).values_list("day", flat=True).distinct())
+
+
+def refresh_sales_analytics(full=False):
+    """Recompute the day and month buckets that changed since the last refresh.
+
+    Returns ``(days_refreshed, months_refreshed)``.
+    """
+    started = timezone.now()
+    checkpoint = None if full else RollupCheckpoint.objects.filter(name=CHECKPOINT_NAME).first()
+    days = _changed_days(checkpoint.value - CHECKPOINT_OVERLAP if checkpoint else None)
+
+    months = {_month_start(day) for day in days}
+    # A full rebuild recomputes every day that has orders, so one span over all of them reads nothing extra.
+    spans = [[min(days), max(days)]] if full and days else None
+    with transaction.atomic():
+        if full:
+            SalesDay.objects.all().delete()
+            SalesMonth.objects.all().delete()
+        if days:
+            SalesDay.objects.bulk_create(
+                [SalesDay(day=day, **values) for day, values in _compute_days(days, spans).items()],
+                update_conflicts=True,
+                unique_fields=["day"],
+                update_fields=[*PERIOD_FIELDS, "refreshed_at"],
+            )
+        for month in months:
+            next_month = _month_start(month + timedelta(days=32))
+            values = SalesDay.objects.filter(day__gte=month, day__lt=next_month).aggregate(
+                **{field: Sum(field) for field in PERIOD_FIELDS}
+            )
+            SalesMonth.objects.update_or_create(
+                month=month,
+                defaults={field: value or 0 for field, value in values.items()},
+            )
+        RollupCheckpoint.objects.update_or_create(name=CHECKPOINT_NAME, defaults={"value": started})
+    return len(days), len(months)
+
+
+def dashboard_data(days=30, months=12, top_products=10):
+    """Everything the admin dashboard shows, read from the rollup tables only."""
+    today = timezone.localdate()
+    since = today - timedelta(days=days - 1)
+    daily = list(SalesDay.objects.filter(day__gte=since).order_by("-day"))
+    monthly = list(SalesMonth.objects.order_by("-month")[:months])
+    totals = {field: sum(getattr(row, field) for row in daily) for field in PERIOD_FIELDS}
+    totals["average_order_value"] = (
+        totals["revenue"] / totals["orders_approved"] if totals["orders_approved"] else 0
+    )
+    top = (
+        ProductSalesDay.objects.filter(day__gte=since)
+        .values("product_id", name=F("product__name"))
+        .annotate(units=Sum("units"), revenue=Sum("revenue"))
+        .order_by("-revenue")[:top_products]
+    )
+    return {
+        "since": since,
+        "daily": daily,
+        "monthly": monthly,
+        "totals": totals,
+        "top_products": list(top),
+        "refreshed": RollupCheckpoint.objects.filter(name=CHECKPOINT_NAME).first(),
+    }
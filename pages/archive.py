@@ -0,0 +1,80 @@
+"""Hot/cold split of the order history.
+
+Finalized orders that have not changed for a while are copied, with their items, into
+``ArchivedOrder`` / ``ArchivedOrderItem`` (keeping their ids) and deleted from the live
+tables, one bounded transaction per batch. Pending orders are never archived, so payment
+callbacks and checkout only ever touch the small live tables; history views and full
+rollup rebuilds read both through ``ORDER_SOURCES``.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+
+# (order model, item model) pairs; the archive mirrors the live schema field for field.
+ORDER_SOURCES = ((Order, OrderItem), (ArchivedOrder, ArchivedOrderItem))
+FINAL_STATUSES = (Order.Status.APPROVED, Order.Status.REJECTED, Order.Status.CANCELLED)
+
+_ORDER_FIELDS = [field.attname for field in ArchivedOrder._meta.concrete_fields if field.name != "archived_at"]
+_ITEM_FIELDS = [field.attname for field in ArchivedOrderItem._meta.concrete_fields]
+
+
+def archive_cutoff(older_than_days, now=None):
+    return (now or timezone.now()) - timedelta(days=older_than_days)
+
+
+def archivable_orders(older_than_days, now=None, cutoff=None):
+    cutoff = cutoff or archive_cutoff(older_than_days, now)
+    return Order.objects.filter(status__in=FINAL_STATUSES, updated_at__lt=cutoff)
+
+
+def archive_batch(order_ids, cutoff):
+    """Move the given orders and their items to the archive; returns ``(orders, items)`` moved.
+
+    Only orders still final and untouched since ``cutoff`` are moved.
+    """
+    with transaction.atomic():
+        # Re-checked under the row locks, in case an order changed since it was selected.
+        locked = list(
+            Order.objects.select_for_update()
+            .filter(pk__in=order_ids, status__in=FINAL_STATUSES, updated_at__lt=cutoff)
+            .values(*_ORDER_FIELDS)
+        )
+        if not locked:
+            return 0, 0
+        ids = [row["id"] for row in locked]
+        items = list(OrderItem.objects.filter(order_id__in=ids).values(*_ITEM_FIELDS))
+        ArchivedOrder.objects.bulk_create([ArchivedOrder(**row) for row in locked])
+        ArchivedOrderItem.objects.bulk_create([ArchivedOrderItem(**row) for row in items])
+        OrderItem.objects.filter(order_id__in=ids).delete()
+        Order.objects.filter(pk__in=ids).delete()
+    return len(locked), len(items)
+
+
+def archive_orders(older_than_days, batch_size=500, max_batches=None):
+    """Archive finalized orders untouched for ``older_than_days``; returns ``(orders, items)`` moved."""
+    cutoff = archive_cutoff(older_than_days)
+    candidates = archivable_orders(older_than_days, cutoff=cutoff).order_by("pk").values_list("pk", flat=True)
+    moved_orders = moved_items = batches = 0
+    last_id = 0
+    while max_batches is None or batches < max_batches:
+        order_ids = list(candidates.filter(pk__gt=last_id)[:batch_size])
+        if not order_ids:
+            break
+        orders, items = archive_batch(order_ids, cutoff)
+        moved_orders += orders
+        moved_items += items
+        last_id = order_ids[-1]
+        batches += 1
+    return moved_orders, moved_items
+
+
+def find_order(pk, **filters):
+    """The live order with ``pk``, else its archived copy, else ``None``."""
+    for order_model, _item_model in ORDER_SOURCES:
+        order = order_model.objects.select_related("user").filter(pk=pk, **filters).first()
+        if order is not None:
+            return order
+    return None
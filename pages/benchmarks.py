@@ -0,0 +1,290 @@
+"""Micro-benchmarks for the project's hot paths, run by ``manage.py run_benchmarks``.
+
+Each benchmark builds its fixtures from a seeded ``random.Random`` and returns the call to
+time. The call is repeated until a run lasts long enough to time reliably, several runs are
+taken and the median per-call time is reported. Peak memory comes from one more call under
+``tracemalloc``, so tracing does not distort the timings. Database fixtures are rolled back
+after each benchmark.
+"""
+import importlib.util
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import RequestFactory
+
+# Results of a full run on the reference machine, refreshed with ``run_benchmarks --save-baseline``.
+BASELINE_PATH = Path(__file__).resolve().with_name("benchmarks_baseline.json")
+# Runs shorter than this are repeated more times per measurement.
+MIN_RUN_SECONDS = 0.2
+# Slow benchmarks get fewer runs so one size does not take minutes.
+MAX_BENCHMARK_SECONDS = 20.0
+_WORDS = (
+    "lamp cable tent stove chair table mug kettle speaker amplifier keyboard mouse monitor "
+    "jacket boots backpack lantern charger pillow blanket café crème niño señal"
+).split()
+
+
+class Benchmark(NamedTuple):
+    name: str
+    setup: Callable
+    param: Optional[int]
+
+
+BENCHMARKS = []
+
+
+def benchmark(name, params=(None,)):
+    """Register ``setup(rng, param)``, which builds fixtures and returns the zero-argument call to time."""
+    def decorator(setup):
+        for param in params:
+            BENCHMARKS.append(Benchmark(name if param is None else f"{name}[{param}]", setup, param))
+        return setup
+    return decorator
+
+
+def _product_name(rng):
+    return " ".join(rng.choice(_WORDS).capitalize() for _ in range(rng.randint(1, 3)))
+
+
+def _products(rng, count):
+    from .models import Product
+
+    return Product.objects.bulk_create(
+        (
+            Product(
+                name=_product_name(rng),
+                price=Decimal(rng.randint(1000, 2_000_000)),
+                stock=rng.randint(0, 500),
+                cantidad_vendidos=rng.randint(0, 10_000),
+            )
+            for _ in range(count)
+        ),
+        batch_size=5000,
+    )
+
+
+def _cart(rng, lines):
+    from .models import Cart, CartItem
+
+    user = get_user_model().objects.create_user(f"bench-{rng.randrange(10**9)}", email="bench@example.com")
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.bulk_create(
+        CartItem(cart=cart, product=product, quantity=rng.randint(1, 5)) for product in _products(rng, lines)
+    )
+    return cart
+
+
+@benchmark("cart_items_with_totals", params=(10, 100))
+def _cart_totals(rng, lines):
+    from .views import _cart_items_with_totals
+
+    cart = _cart(rng, lines)
+    return lambda: _cart_items_with_totals(cart)
+
+
+@benchmark("preference_payload", params=(10, 100))
+def _preference_payload(rng, lines):
+    from .views import _preference_data
+
+    cart = _cart(rng, lines)
+    items = list(cart.cartitem_set.select_related("product"))
+    request = RequestFactory().post("/checkout/", secure=True)
+    request.user = cart.user
+    return lambda: _preference_data(request, items)
+
+
+@benchmark("update_order_status")
+def _update_order_status(rng, _param):
+    from .models import Order, OrderItem
+    from .views import _update_order_status
+
+    cart = _cart(rng, 5)
+    order = Order.objects.create(user=cart.user, preference_id=f"BENCH-{rng.randrange(10**9)}", total=Decimal("1"))
+    OrderItem.objects.bulk_create(
+        OrderItem(
+            order=order,
+            product=item.product,
+            product_name=item.product.name,
+            quantity=item.quantity,
+            unit_price=item.product.price,
+        )
+        for item in cart.cartitem_set.select_related("product")
+    )
+    response = {"response": {"status": "approved", "id": "PAY-BENCH", "status_detail": "accredited"}}
+
+    def approve():
+        # Rolled back each time, so every call approves a pending order, records its sales and
+        # clears a full cart instead of finding the work already done.
+        with transaction.atomic():
+            _update_order_status(order, response)
+            transaction.set_rollback(True)
+
+    return approve
+
+
+@benchmark("inventory_pdf", params=(1_000, 10_000, 100_000))
+def _inventory_pdf(rng, count):
+    from .reports import render_inventory_pdf
+
+    _products(rng, count)
+    return render_inventory_pdf
+
+
+def _load_msgfmt():
+    spec = importlib.util.spec_from_file_location("msgfmt", Path(settings.BASE_DIR) / "tools" / "msgfmt.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@benchmark("msgfmt_make_mo", params=(1_000, 10_000))
+def _make_mo(rng, entries):
+    msgfmt = _load_msgfmt()
+    # Removed once the returned call (which holds it) is discarded.
+    scratch = tempfile.TemporaryDirectory(prefix="bench-msgfmt-")
+    directory = Path(scratch.name)
+    lines = ['msgid ""', 'msgstr ""', '"Content-Type: text/plain; charset=UTF-8\\n"', ""]
+    for index in range(entries):
+        lines += [
+            f"#: pages/views.py:{index}",
+            f'msgid "{_product_name(rng)} {index}"',
+            f'msgstr "{_product_name(rng)} {index}"',
+            "",
+        ]
+    po_file = directory / "django.po"
+    po_file.write_text("\n".join(lines), encoding="utf-8")
+    return lambda: msgfmt.make_mo(str(po_file), str(Path(scratch.name) / "django.mo"))
+
+
+def _catalog_products(rng, count):
+    from .catalog import CatalogProduct
+
+    updated_at = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+    return [
+        CatalogProduct(
+            id=pk,
+            name=_product_name(rng),
+            price=Decimal(rng.randint(1000, 2_000_000)),
+            stock=rng.randint(0, 50),
+            cantidad_vendidos=rng.randint(0, 10_000),
+            es_producto_dia=False,
+            updated_at=updated_at,
+            image_name="",
+            descripcion="",
+        )
+        for pk in range(1, count + 1)
+    ]
+
+
+@benchmark("typeahead_build", params=(100_000,))
+def _typeahead_build(rng, count):
+    from .typeahead import TypeaheadIndex
+
+    products = _catalog_products(rng, count)
+    return lambda: TypeaheadIndex(1, products)
+
+
+@benchmark("typeahead_suggest", params=(100_000,))
+def _typeahead_suggest(rng, count):
+    from .typeahead import TypeaheadIndex
+
+    index = TypeaheadIndex(1, _catalog_products(rng, count))
+    # Long enough prefixes that every call ranks its range instead of hitting the memoized short ones.
+    queries = [rng.choice(_WORDS)[: rng.randint(4, 6)] for _ in range(100)]
+    return lambda: [index.suggest(query) for query in queries]
+
+
+@benchmark("recommendations_matrix", params=(100_000, 1_000_000))
+def _recommendations_matrix(rng, lines):
+    import numpy as np
+
+    from .recommendations import cooccurrence_matrix, top_related
+
+    products = 20_000
+    numbers = np.random.default_rng(rng.randrange(2**32))
+    order_keys = np.arange(lines, dtype=np.int64) // 4
+    # Zipf-like popularity so a few products dominate, as in real catalogs.
+    product_ids = np.minimum(numbers.zipf(1.3, size=lines), products) - 1
+
+    def build():
+        matrix = cooccurrence_matrix(order_keys, product_ids, products)
+        return sum(len(top) for _, top in top_related(matrix, range(products), 8))
+
+    return build
+
+
+def measure(func, repeat=5):
+    """Median and best per-call seconds over ``repeat`` runs, and peak traced memory in bytes."""
+    number, elapsed = 1, 0.0
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= MIN_RUN_SECONDS:
+            break
+        number *= 10 if elapsed < MIN_RUN_SECONDS / 10 else 2
+    repeat = max(1, min(repeat, int(MAX_BENCHMARK_SECONDS / elapsed)))
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - started) / number)
+
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 4),
+        "min_ms": round(min(timings) * 1000, 4),
+        "runs": len(timings),
+        "calls_per_run": number,
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def run_benchmarks(selected=None, seed=0, repeat=5, progress=None):
+    """Run the benchmarks whose name contains any of ``selected`` (all by default); returns {name: result}."""
+    results = {}
+    for bench in BENCHMARKS:
+        if selected and not any(pattern in bench.name for pattern in selected):
+            continue
+        rng = random.Random(f"{seed}:{bench.name}")
+        with transaction.atomic():
+            try:
+                func = bench.setup(rng, bench.param)
+            except ImportError as exc:
+                results[bench.name] = {"skipped": f"missing dependency: {exc.name}"}
+            else:
+                results[bench.name] = measure(func, repeat)
+            transaction.set_rollback(True)
+        if progress:
+            progress(bench.name, results[bench.name])
+    return results
+
+
+def find_regressions(results, baseline, threshold):
+    """``[(name, metric, baseline value, current value)]`` for metrics more than ``threshold`` above the baseline."""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous or "skipped" in result or "skipped" in previous:
+            continue
+        for metric in ("median_ms", "peak_kib"):
+            if previous.get(metric) and result[metric] > previous[metric] * (1 + threshold):
+                regressions.append((name, metric, previous[metric], result[metric]))
+    return regressions
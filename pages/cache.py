@@ -0,0 +1,128 @@
+"""Shared cache helpers: namespaced, version-bumped keys and stampede-safe ``get_or_compute``."""
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+
+CATALOG_NAMESPACE = "catalog"
+
+# Entries are stored as (value, compute_seconds, expires_at) so readers can recompute early.
+_MISSING = object()
+# The last computed value of each key also outlives its entry (and namespace bumps) by this
+# factor, so readers that lose the recompute lock can be answered at once.
+STALE_FACTOR = 10
+
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: {"hits": 0, "misses": 0, "early_recomputes": 0, "stale_hits": 0, "lock_waits": 0})
+
+
+def _record(namespace, counter):
+    with _stats_lock:
+        _stats[namespace or "default"][counter] += 1
+
+
+def cache_stats():
+    """Hit/miss counters collected by this worker since start-up (or the last reset)."""
+    with _stats_lock:
+        stats = {}
+        for namespace, counters in _stats.items():
+            lookups = counters["hits"] + counters["misses"]
+            stats[namespace] = dict(counters, hit_ratio=round(counters["hits"] / lookups, 4) if lookups else None)
+        return stats
+
+
+def reset_cache_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def _namespace_key(namespace):
+    return f"ns:{namespace}"
+
+
+def _initial_version():
+    # Seeded from the clock so a counter that was evicted (or a cleared cache) never restarts at a
+    # version that an in-process snapshot built earlier may still be tagged with.
+    return int(time.time() * 1000)
+
+
+def namespace_version(namespace):
+    version = cache.get(_namespace_key(namespace))
+    if version is None:
+        initial = _initial_version()
+        cache.add(_namespace_key(namespace), initial, timeout=None)
+        version = cache.get(_namespace_key(namespace), initial)
+    return version
+
+
+def bump_namespace(namespace):
+    """Invalidate every key in ``namespace`` at once by moving to a new version."""
+    try:
+        return cache.incr(_namespace_key(namespace))
+    except ValueError:
+        initial = _initial_version()
+        cache.add(_namespace_key(namespace), initial, timeout=None)
+        return cache.get(_namespace_key(namespace), initial)
+
+
+def versioned_key(namespace, key):
+    return f"{namespace}:v{namespace_version(namespace)}:{key}"
+
+
+def get_or_compute(key, compute, timeout=300, namespace=None, beta=1.0, lock_timeout=10, max_wait=0.5):
+    """Return the cached value for ``key`` or compute, store and return it.
+
+    Two mechanisms keep a popular key from stampeding the database when it expires:
+    readers recompute probabilistically a little *before* expiry (XFetch, weighted by
+    how long the last computation took and ``beta``), and on a hard miss only the worker
+    that wins a short ``cache.add`` lock computes. The others get the key's previous value
+    if there is one, or wait up to ``max_wait`` seconds for the result before computing it
+    themselves, so a slow computation never ties up every request thread.
+    """
+    full_key = versioned_key(namespace, key) if namespace else key
+    stale_key = f"stale:{namespace}:{key}" if namespace else f"stale:{key}"
+    entry = cache.get(full_key, _MISSING)
+
+    if entry is not _MISSING:
+        value, delta, expires_at = entry
+        if time.time() - delta * beta * math.log(random.random() or 1e-12) < expires_at:
+            _record(namespace, "hits")
+            return value
+        _record(namespace, "early_recomputes")
+        return _compute_and_store(full_key, stale_key, compute, timeout)
+
+    _record(namespace, "misses")
+    lock_key = f"lock:{full_key}"
+    if cache.add(lock_key, 1, timeout=lock_timeout):
+        try:
+            return _compute_and_store(full_key, stale_key, compute, timeout)
+        finally:
+            cache.delete(lock_key)
+
+    stale = cache.get(stale_key, _MISSING)
+    if stale is not _MISSING:
+        _record(namespace, "stale_hits")
+        return stale
+
+    _record(namespace, "lock_waits")
+    deadline = time.monotonic() + max_wait
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(full_key, _MISSING)
+        if entry is not _MISSING:
+            return entry[0]
+    # The lock holder is slow (or died); compute rather than keep the request waiting.
+    return _compute_and_store(full_key, stale_key, compute, timeout)
+
+
+def _compute_and_store(full_key, stale_key, compute, timeout):
+    started = time.time()
+    value = compute()
+    finished = time.time()
+    expires_at = finished + timeout if timeout is not None else math.inf
+    cache.set(full_key, (value, finished - started, expires_at), timeout=timeout)
+    cache.set(stale_key, value, timeout=timeout * STALE_FACTOR if timeout is not None else None)
+    return value
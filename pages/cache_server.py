@@ -0,0 +1,262 @@
+"""A small Redis-protocol (RESP2) server for local development, run by ``manage.py run_cache_server``.
+
+It implements the commands Django's ``RedisCache`` sends (strings with expiry, ``MGET``/``MSET``,
+``INCRBY``, ``MULTI``/``EXEC`` pipelines, ``FLUSHDB``), so ``DJANGO_CACHE_BACKEND=redis`` can be
+used, and several processes can share one cache, without installing Redis. Data lives in
+memory and expires lazily on access; it is not a replacement for Redis in production.
+"""
+import socketserver
+import threading
+import time
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class CommandError(Exception):
+    pass
+
+
+class Queued:
+    """Reply for a command queued inside ``MULTI``."""
+
+
+def read_value(stream):
+    """Read one RESP value from a binary file object; ``None`` at end of stream."""
+    line = stream.readline()
+    if not line:
+        return None
+    if not line.endswith(b"\r\n"):
+        raise ProtocolError("unterminated line")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode()
+    if kind == b"-":
+        return CommandError(payload.decode())
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)
+        if len(data) != length + 2:
+            raise ProtocolError("truncated bulk string")
+        return data[:-2]
+    if kind == b"*":
+        count = int(payload)
+        if count < 0:
+            return None
+        return [read_value(stream) for _ in range(count)]
+    raise ProtocolError(f"unexpected type byte {kind!r}")
+
+
+def encode(value):
+    """RESP encoding of a reply (or of a command, given as a list of bytes/str)."""
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, Queued):
+        return b"+QUEUED\r\n"
+    if isinstance(value, CommandError):
+        return f"-{value}\r\n".encode()
+    if isinstance(value, bool):
+        return b":1\r\n" if value else b":0\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        if value == "OK" or value == "PONG":
+            return f"+{value}\r\n".encode()
+        value = value.encode()
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    if isinstance(value, (list, tuple)):
+        return b"*%d\r\n" % len(value) + b"".join(encode(item) for item in value)
+    raise TypeError(f"cannot encode {type(value).__name__}")
+
+
+def _seconds(value):
+    try:
+        return int(value)
+    except ValueError:
+        raise CommandError("ERR value is not an integer or out of range") from None
+
+
+class Store:
+    """Thread-safe key/value store with per-key deadlines (``time.monotonic()``)."""
+
+    SWEEP_INTERVAL = 1.0
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}
+        self.deadlines = {}
+        self._swept_at = time.monotonic()
+
+    def _sweep(self):
+        # Keys nobody reads again (old namespace versions) would otherwise never expire.
+        now = time.monotonic()
+        if now - self._swept_at < self.SWEEP_INTERVAL:
+            return
+        self._swept_at = now
+        for key in [key for key, deadline in self.deadlines.items() if deadline <= now]:
+            del self.deadlines[key]
+            self.data.pop(key, None)
+
+    def _live(self, key):
+        deadline = self.deadlines.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self.data.pop(key, None)
+            self.deadlines.pop(key, None)
+        return key in self.data
+
+    def _set(self, key, value, ttl=None):
+        self.data[key] = value
+        if ttl is None:
+            self.deadlines.pop(key, None)
+        else:
+            self.deadlines[key] = time.monotonic() + ttl
+
+    def execute(self, commands):
+        """Run ``[(name, args)]`` back to back under the lock; returns one reply per command."""
+        with self.lock:
+            self._sweep()
+            return [self._dispatch(name, args) for name, args in commands]
+
+    def _dispatch(self, name, args):
+        handler = getattr(self, f"cmd_{name.lower()}", None)
+        if handler is None:
+            return CommandError(f"ERR unknown command '{name}'")
+        try:
+            return handler(*args)
+        except TypeError:
+            return CommandError(f"ERR wrong number of arguments for '{name.lower()}' command")
+        except CommandError as exc:
+            return exc
+
+    def cmd_ping(self, *args):
+        return args[0] if args else "PONG"
+
+    def cmd_select(self, db):
+        return "OK"
+
+    def cmd_client(self, *args):
+        # redis-py sends CLIENT SETINFO on connect.
+        return "OK"
+
+    def cmd_get(self, key):
+        return self.data[key] if self._live(key) else None
+
+    def cmd_set(self, key, value, *options):
+        ttl, only_new = None, False
+        options = [option.upper() for option in options]
+        index = 0
+        while index < len(options):
+            option = options[index]
+            if option in (b"EX", b"PX") and index + 1 < len(options):
+                ttl = _seconds(options[index + 1]) / (1000 if option == b"PX" else 1)
+                index += 2
+            elif option == b"NX":
+                only_new = True
+                index += 1
+            else:
+                raise CommandError("ERR syntax error")
+        if only_new and self._live(key):
+            return None
+        self._set(key, value, ttl)
+        return "OK"
+
+    def cmd_mget(self, *keys):
+        return [self.cmd_get(key) for key in keys]
+
+    def cmd_mset(self, *pairs):
+        if not pairs or len(pairs) % 2:
+            raise CommandError("ERR wrong number of arguments for 'mset' command")
+        for key, value in zip(pairs[::2], pairs[1::2]):
+            self._set(key, value)
+        return "OK"
+
+    def cmd_del(self, *keys):
+        deleted = 0
+        for key in keys:
+            if self._live(key):
+                del self.data[key]
+                self.deadlines.pop(key, None)
+                deleted += 1
+        return deleted
+
+    def cmd_exists(self, *keys):
+        return sum(1 for key in keys if self._live(key))
+
+    def cmd_expire(self, key, seconds):
+        if not self._live(key):
+            return 0
+        self._set(key, self.data[key], _seconds(seconds))
+        return 1
+
+    def cmd_persist(self, key):
+        return int(self._live(key) and self.deadlines.pop(key, None) is not None)
+
+    def cmd_incrby(self, key, amount):
+        current = self.data[key] if self._live(key) else b"0"
+        try:
+            value = int(current) + int(amount)
+        except ValueError:
+            raise CommandError("ERR value is not an integer or out of range") from None
+        self.data[key] = str(value).encode()
+        return value
+
+    def cmd_incr(self, key):
+        return self.cmd_incrby(key, b"1")
+
+    def cmd_flushdb(self, *options):
+        self.data.clear()
+        self.deadlines.clear()
+        return "OK"
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        store = self.server.store
+        transaction = None
+        while True:
+            try:
+                command = read_value(self.rfile)
+            except (ProtocolError, ValueError) as exc:
+                self.wfile.write(encode(CommandError(f"ERR protocol error: {exc}")))
+                return
+            if command is None:
+                return
+            if not isinstance(command, list) or not command:
+                self.wfile.write(encode(CommandError("ERR expected a command array")))
+                continue
+            name = command[0].decode().upper()
+            args = command[1:]
+            if name == "MULTI":
+                transaction = []
+                reply = "OK"
+            elif name == "EXEC":
+                if transaction is None:
+                    reply = CommandError("ERR EXEC without MULTI")
+                else:
+                    # Queued commands run together, like a Redis transaction.
+                    reply = store.execute(transaction)
+                    transaction = None
+            elif name == "DISCARD":
+                transaction = None
+                reply = "OK"
+            elif transaction is not None:
+                transaction.append((name, args))
+                reply = Queued()
+            else:
+                reply = store.execute([(name, args)])[0]
+            self.wfile.write(encode(reply))
+
+
+class CacheServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, _Handler)
+        self.store = Store()
@@ -0,0 +1,174 @@
+"""Per-worker, immutable in-memory snapshot of the product catalog.
+
+Catalog pages read from the snapshot instead of querying ``Product``. Each worker keeps one
+snapshot tagged with the shared catalog version (see ``pages.cache``); any product write bumps
+that version and the next read in every worker rebuilds and swaps in a fresh snapshot.
+Sales do not move the version, so ``cantidad_vendidos`` here is as of the last catalog change;
+live best-seller rankings come from ``pages.sales.best_sellers``.
+"""
+import logging
+import sys
+import threading
+from datetime import datetime
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .cache import CATALOG_NAMESPACE, bump_namespace, namespace_version
+from .facets import facet_counts, histogram, in_bucket, price_buckets, stock_buckets
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogImage(NamedTuple):
+    name: str
+
+    @property
+    def url(self):
+        return default_storage.url(self.name)
+
+
+class CatalogProduct(NamedTuple):
+    id: int
+    name: str
+    price: Decimal
+    stock: int
+    cantidad_vendidos: int
+    es_producto_dia: bool
+    updated_at: datetime
+    image_name: str
+    descripcion: str
+
+    @property
+    def pk(self):
+        return self.id
+
+    @property
+    def image(self):
+        # Mirrors the ImageField API the templates use: falsy when empty, ``.url`` otherwise.
+        return CatalogImage(self.image_name) if self.image_name else None
+
+    def __str__(self):
+        return self.name
+
+
+CATALOG_FIELDS = CatalogProduct._fields[:-2] + ("image", "descripcion")
+
+
+class CatalogSnapshot:
+    __slots__ = (
+        "version",
+        "products",
+        "by_id",
+        "by_price",
+        "by_name",
+        "in_stock_by_name",
+        "product_of_day",
+        "price_buckets",
+        "stock_buckets",
+        "histogram",
+        "memory_bytes",
+    )
+
+    def __init__(self, version, products):
+        self.version = version
+        self.products = tuple(products)
+        self.by_id = {product.id: product for product in self.products}
+        self.by_price = tuple(sorted(self.products, key=lambda product: (product.price, product.id)))
+        self.by_name = tuple(sorted(self.products, key=lambda product: (product.name, product.id)))
+        self.in_stock_by_name = tuple(product for product in self.by_name if product.stock > 0)
+        self.product_of_day = next((product for product in self.products if product.es_producto_dia), None)
+        self.price_buckets = price_buckets()
+        self.stock_buckets = stock_buckets()
+        # Facet counts for the unsearched list, so browsing the catalog never recounts it.
+        self.histogram = histogram(self.products, self.price_buckets, self.stock_buckets)
+        self.memory_bytes = self._measure()
+
+    def _measure(self):
+        containers = (self.products, self.by_price, self.by_name, self.in_stock_by_name, self.by_id)
+        total = sum(sys.getsizeof(container) for container in containers)
+        for product in self.products:
+            total += sys.getsizeof(product) + sum(sys.getsizeof(value) for value in product)
+        return total
+
+    def get(self, product_id):
+        return self.by_id.get(product_id)
+
+    def search(self, query=None, order=None, price=None, stock=None):
+        if order == "price_asc":
+            products = self.by_price
+        elif order == "price_desc":
+            products = self.by_price[::-1]
+        else:
+            products = self.products
+        if query:
+            needle = query.casefold()
+            products = tuple(product for product in products if needle in product.name.casefold())
+        if price or stock:
+            products = tuple(
+                product
+                for product in products
+                if (not price or in_bucket(product.price, price)) and (not stock or in_bucket(product.stock, stock))
+            )
+        return products
+
+    def facets(self, query=None, price=None, stock=None):
+        """Price and stock bucket counts for ``query``, each dimension filtered by the other's selection."""
+        counts = histogram(self.search(query), self.price_buckets, self.stock_buckets) if query else self.histogram
+        return facet_counts(counts, self.price_buckets, self.stock_buckets, price, stock)
+
+
+_snapshot = None
+_rebuild_lock = threading.Lock()
+
+
+def _build_snapshot(version):
+    rows = Product.objects.order_by("id").values_list(*CATALOG_FIELDS)
+    snapshot = CatalogSnapshot(
+        version,
+        (CatalogProduct(*row[:-2], row[-2] or "", row[-1]) for row in rows),
+    )
+    budget = settings.CATALOG_SNAPSHOT_MAX_BYTES
+    if snapshot.memory_bytes > budget:
+        logger.warning(
+            "Catalog snapshot uses %d bytes, over the %d byte per-worker budget (%d products).",
+            snapshot.memory_bytes,
+            budget,
+            len(snapshot.products),
+        )
+    return snapshot
+
+
+def get_catalog():
+    """Return the current snapshot, rebuilding it first if the shared catalog version moved."""
+    global _snapshot
+    # Read the version before loading rows: a write that lands mid-build leaves this snapshot
+    # tagged with the older version, so the next read rebuilds again.
+    version = namespace_version(CATALOG_NAMESPACE)
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    with _rebuild_lock:
+        snapshot = _snapshot
+        if snapshot is None or snapshot.version != version:
+            snapshot = _build_snapshot(version)
+            _snapshot = snapshot
+    return snapshot
+
+
+def bump_catalog_version():
+    """Mark every worker's snapshot stale; call after any write that bypasses ``Product.save()``."""
+    bump_namespace(CATALOG_NAMESPACE)
+    # Bump again once the write is visible, so a snapshot another worker built from
+    # pre-commit data in the meantime is not kept.
+    transaction.on_commit(lambda: bump_namespace(CATALOG_NAMESPACE))
+
+
+def reset_catalog():
+    global _snapshot
+    with _rebuild_lock:
+        _snapshot = None
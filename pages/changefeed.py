@@ -0,0 +1,74 @@
+"""Inventory change feed: which products changed since a client's cursor.
+
+Every product write appends a ``ProductChange`` row (from the model signals, or from
+``record_product_changes`` after queryset updates). Clients page through the log by id and
+receive each changed product's current state once per page, so a poll costs the number of
+changes rather than the catalog size. ``compact_product_changes`` drops superseded entries.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from .catalog import get_catalog
+from .models import ProductChange
+
+
+def record_product_changes(product_ids, deleted=False):
+    """Log a change for each product id; call alongside ``bump_catalog_version`` after bulk writes."""
+    ProductChange.objects.bulk_create(
+        [ProductChange(product_id=product_id, deleted=deleted) for product_id in product_ids],
+        batch_size=1000,
+    )
+
+
+def _serialize(product_id, product):
+    if product is None:
+        return {"id": product_id, "deleted": True}
+    # Products that dropped to zero stock are included, so mirrors can hide them.
+    return {
+        "id": product.id,
+        "deleted": False,
+        "name": product.name,
+        "price": str(product.price),
+        "stock": product.stock,
+    }
+
+
+def changes_since(cursor=0, limit=None):
+    """Return ``(products, next_cursor, has_more)`` for log entries after ``cursor``."""
+    limit = limit or settings.PRODUCT_CHANGES_PAGE_SIZE
+    entries = ProductChange.objects.filter(pk__gt=cursor)
+    settle = settings.PRODUCT_CHANGES_SETTLE_SECONDS
+    if settle:
+        entries = entries.filter(changed_at__lte=timezone.now() - timedelta(seconds=settle))
+    page = list(entries.order_by("pk").values_list("pk", "product_id")[: limit + 1])
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    catalog = get_catalog()
+    # Latest entry wins; the payload is the product's state now, not at the time of each change.
+    latest = {product_id: pk for pk, product_id in page}
+    products = [
+        _serialize(product_id, catalog.get(product_id))
+        for product_id, _ in sorted(latest.items(), key=lambda item: item[1])
+    ]
+    next_cursor = page[-1][0] if page else cursor
+    return products, next_cursor, has_more
+
+
+def compact_product_changes(batch_size=5000):
+    """Delete every entry superseded by a newer one for the same product; returns the number removed.
+
+    The newest entry per product is always kept, so a client at any cursor still sees each
+    product that changed after it, deletions included.
+    """
+    latest = ProductChange.objects.values("product_id").annotate(latest=Max("pk")).values("latest")
+    removed = 0
+    while True:
+        # Deleted in batches to keep each statement's locks short on a large log.
+        stale_ids = list(ProductChange.objects.exclude(pk__in=latest).values_list("pk", flat=True)[:batch_size])
+        if not stale_ids:
+            return removed
+        removed += ProductChange.objects.filter(pk__in=stale_ids).delete()[0]
@@ -0,0 +1,63 @@
+"""Idempotent checkout: one payment preference per distinct cart.
+
+A checkout is keyed on a fingerprint of the cart lines and their current prices. While a
+pending order for the same fingerprint is younger than ``CHECKOUT_PREFERENCE_TTL_MINUTES``
+its ``init_point`` is reused without calling Mercado Pago. Concurrent submissions of the same
+cart are coalesced by a CheckoutClaim row: its unique constraint lets one request, on any
+worker, create the preference while the others return at once instead of waiting.
+"""
+import hashlib
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import CheckoutClaim, Order
+
+# A claim older than this belongs to a request that died before releasing it.
+LOCK_TIMEOUT = 30
+
+
+def cart_fingerprint(items):
+    lines = sorted(f"{item.product_id}:{item.quantity}:{item.product.price}" for item in items)
+    return hashlib.sha256("|".join(lines).encode()).hexdigest()
+
+
+def preference_expires_at(now=None):
+    return (now or timezone.now()) + timedelta(minutes=settings.CHECKOUT_PREFERENCE_TTL_MINUTES)
+
+
+def reusable_order(user, fingerprint, now=None):
+    # A margin before the preference expires, so the buyer is not sent to a page about to close.
+    newest_allowed = (now or timezone.now()) - timedelta(minutes=settings.CHECKOUT_PREFERENCE_TTL_MINUTES - 1)
+    return (
+        Order.objects.filter(
+            user=user,
+            cart_fingerprint=fingerprint,
+            status=Order.Status.PENDING,
+            created_at__gte=newest_allowed,
+        )
+        .exclude(init_point="")
+        .order_by("-created_at")
+        .first()
+    )
+
+
+@contextmanager
+def checkout_lock(user, fingerprint):
+    """Yield True if this request holds the checkout claim for the cart, False if another one does."""
+    claims = CheckoutClaim.objects.filter(user=user, cart_fingerprint=fingerprint)
+    claims.filter(created_at__lt=timezone.now() - timedelta(seconds=LOCK_TIMEOUT)).delete()
+    try:
+        # Committed at once, so checkouts on other workers see the claim.
+        with transaction.atomic():
+            claim = CheckoutClaim.objects.create(user=user, cart_fingerprint=fingerprint)
+    except IntegrityError:
+        claim = None
+    try:
+        yield claim is not None
+    finally:
+        if claim is not None:
+            claim.delete()
@@ -0,0 +1,96 @@
+"""Price and stock facets for the product list.
+
+Each dimension is split into half-open buckets ``[low, high)`` by the edges in settings. A set
+of products is reduced to one joint histogram ``{(price_bucket, stock_bucket): count}`` in a
+single pass; the count shown next to each bucket is then summed from that histogram, holding
+the other dimension's selected bucket fixed. The full-catalog histogram is kept on the snapshot.
+"""
+from bisect import bisect_right
+from collections import Counter
+from decimal import Decimal
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.utils.translation import gettext as _
+
+
+class Bucket(NamedTuple):
+    key: str
+    low: Decimal
+    high: Optional[Decimal]
+
+
+def make_buckets(edges):
+    edges = [Decimal(str(edge)) for edge in edges]
+    bounds = list(zip(edges, edges[1:] + [None]))
+    return tuple(Bucket(f"{low}-{'' if high is None else high}", low, high) for low, high in bounds)
+
+
+def price_buckets():
+    return make_buckets(settings.CATALOG_PRICE_FACETS)
+
+
+def stock_buckets():
+    return make_buckets(settings.CATALOG_STOCK_FACETS)
+
+
+def find_bucket(buckets, key):
+    return next((bucket for bucket in buckets if bucket.key == key), None)
+
+
+def _bucket_index(lows, value):
+    # Values under the first edge (there should be none) fall into the first bucket.
+    return max(bisect_right(lows, value) - 1, 0)
+
+
+def histogram(products, prices, stocks):
+    price_lows = [bucket.low for bucket in prices]
+    stock_lows = [bucket.low for bucket in stocks]
+    return Counter(
+        (_bucket_index(price_lows, product.price), _bucket_index(stock_lows, product.stock))
+        for product in products
+    )
+
+
+def price_label(bucket):
+    if bucket.high is None:
+        return _("%(low)s+ COP") % {"low": bucket.low}
+    return _("%(low)s – %(high)s COP") % {"low": bucket.low, "high": bucket.high}
+
+
+def stock_label(bucket):
+    if bucket.low == 0 and bucket.high == 1:
+        return _("Out of stock")
+    if bucket.high is None:
+        return _("%(low)s+ in stock") % {"low": bucket.low}
+    return _("%(low)s – %(high)s in stock") % {"low": bucket.low, "high": bucket.high - 1}
+
+
+def facet_counts(counts, prices, stocks, price=None, stock=None):
+    """Per-bucket counts for both dimensions from a joint ``histogram``.
+
+    Price counts respect the selected stock bucket and vice versa, so each number is what
+    the list would show after picking that bucket.
+    """
+    price_index = prices.index(price) if price else None
+    stock_index = stocks.index(stock) if stock else None
+    by_price, by_stock = Counter(), Counter()
+    for (p, s), count in counts.items():
+        if stock_index is None or s == stock_index:
+            by_price[p] += count
+        if price_index is None or p == price_index:
+            by_stock[s] += count
+    return {
+        "price": [
+            {"key": bucket.key, "label": price_label(bucket), "count": by_price[i], "selected": bucket == price}
+            for i, bucket in enumerate(prices)
+        ],
+        "stock": [
+            {"key": bucket.key, "label": stock_label(bucket), "count": by_stock[i], "selected": bucket == stock}
+            for i, bucket in enumerate(stocks)
+        ],
+    }
+
+
+def in_bucket(value, bucket):
+    return value >= bucket.low and (bucket.high is None or value < bucket.high)
@@ -0,0 +1,230 @@
+"""Partner inventory feeds: concurrent, bounded downloads applied to ``Product`` in batches.
+
+Each feed is downloaded in its own thread with a total time limit and a byte cap, and its JSON
+is parsed item by item as it arrives. Rows travel to the calling thread through a bounded
+queue and are applied there, so memory stays flat however large a payload is and every
+database write happens on the caller's connection.
+"""
+import codecs
+import json
+import queue
+import re
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from .catalog import bump_catalog_version
+from .changefeed import record_product_changes
+from .models import PartnerFeed, Product
+from .sales import units_case
+
+CHUNK_SIZE = 64 * 1024
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+class FeedError(Exception):
+    pass
+
+
+def fetch_chunks(url, timeout, max_bytes, chunk_size=CHUNK_SIZE):
+    """Yield the response body of ``url`` in chunks, failing past ``timeout`` seconds or ``max_bytes``."""
+    if urllib.parse.urlsplit(url).scheme not in ("http", "https"):
+        raise FeedError(f"Unsupported URL scheme in {url!r}.")
+    deadline = time.monotonic() + timeout
+    received = 0
+    # ``timeout`` also bounds each socket read, so a stalled server cannot block past the deadline for long.
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        declared = response.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise FeedError(f"Response is {declared} bytes, over the {max_bytes} byte limit.")
+        while True:
+            chunk = response.read(chunk_size)
+            if not chunk:
+                return
+            received += len(chunk)
+            if received > max_bytes:
+                raise FeedError(f"Response exceeded the {max_bytes} byte limit.")
+            if time.monotonic() > deadline:
+                raise FeedError(f"Download took longer than {timeout} seconds.")
+            yield chunk
+
+
+def iter_json_items(chunks, key="products"):
+    """Yield the elements of a top-level JSON array, or of the ``key`` array of a top-level object.
+
+    Only the unparsed tail of the payload is buffered, so memory is bounded by the largest item.
+    """
+    chunks = iter(chunks)
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    eof = False
+
+    def read_more():
+        nonlocal buffer, eof
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+            buffer += text.decode(b"", final=True)
+        else:
+            buffer += text.decode(chunk)
+
+    start = re.compile(r'^\s*\[|"%s"\s*:\s*\[' % re.escape(key))
+    while True:
+        match = start.search(buffer)
+        if match:
+            position = match.end()
+            break
+        if eof:
+            raise FeedError(f'The payload has no "{key}" array.')
+        read_more()
+
+    while True:
+        position = _SEPARATORS.match(buffer, position).end()
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # Usually an item cut at a chunk boundary; only an error once the payload is complete.
+            if eof:
+                raise FeedError("The payload is not valid JSON.") from None
+            buffer = buffer[position:]
+            position = 0
+            read_more()
+            continue
+        yield item
+
+
+def _parse_item(item, match_on):
+    if not isinstance(item, dict):
+        return None
+    try:
+        key = int(item["id"]) if match_on == PartnerFeed.MatchOn.ID else str(item["name"])
+        price = Decimal(str(item["price"])).quantize(Decimal("0.01"))
+        stock = max(int(item["stock"]), 0)
+    except (KeyError, TypeError, ValueError, InvalidOperation):
+        return None
+    if price < 0:
+        return None
+    return key, (price, stock)
+
+
+def apply_feed_rows(rows, match_on):
+    """Set price and stock for the products matching ``rows`` ({key: (price, stock)}); returns how many changed."""
+    field = "pk" if match_on == PartnerFeed.MatchOn.ID else "name"
+    current = Product.objects.filter(**{f"{field}__in": rows}).values_list(field, "pk", "price", "stock")
+    changed = {pk: rows[key] for key, pk, price, stock in current if (price, stock) != rows[key]}
+    if not changed:
+        return 0
+    with transaction.atomic():
+        Product.objects.filter(pk__in=changed).update(
+            price=units_case({pk: price for pk, (price, _) in changed.items()}, default=Decimal("0")),
+            stock=units_case({pk: stock for pk, (_, stock) in changed.items()}),
+            updated_at=Now(),
+        )
+        record_product_changes(changed)
+    bump_catalog_version()
+    return len(changed)
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def _send(results, stop, message):
+    while not stop.is_set():
+        try:
+            results.put(message, timeout=0.5)
+            return
+        except queue.Full:
+            continue
+    raise _Cancelled
+
+
+def _read_feed(feed, batch_size, results, stop):
+    try:
+        batch, seen = {}, 0
+        chunks = fetch_chunks(feed.url, feed.timeout_seconds, feed.max_bytes)
+        for item in iter_json_items(chunks):
+            seen += 1
+            row = _parse_item(item, feed.match_on)
+            if row is not None:
+                batch[row[0]] = row[1]
+            if len(batch) >= batch_size:
+                _send(results, stop, ("batch", feed.pk, batch, seen))
+                batch, seen = {}, 0
+        _send(results, stop, ("batch", feed.pk, batch, seen))
+        error = None
+    except _Cancelled:
+        return
+    except Exception as exc:
+        error = str(exc) or exc.__class__.__name__
+    try:
+        _send(results, stop, ("done", feed.pk, error, 0))
+    except _Cancelled:
+        pass
+
+
+def ingest_feeds(feeds, workers=4, batch_size=500):
+    """Download ``feeds`` concurrently and apply them; returns the feeds with their run status saved.
+
+    Batches applied before a feed fails are kept; the feed is marked failed with the error.
+    """
+    feeds = list(feeds)
+    if not feeds:
+        return []
+    # Bounded, so a fast download waits for the writer instead of piling parsed rows up in memory.
+    results = queue.Queue(maxsize=workers * 2)
+    started = {feed.pk: (timezone.now(), time.monotonic()) for feed in feeds}
+    totals = {feed.pk: {"items_seen": 0, "products_updated": 0} for feed in feeds}
+    by_id = {feed.pk: feed for feed in feeds}
+    # Set if applying a batch fails, so the readers stop instead of blocking on the full queue.
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="partner-feed") as pool:
+        for feed in feeds:
+            pool.submit(_read_feed, feed, batch_size, results, stop)
+        try:
+            _collect(results, len(feeds), by_id, started, totals)
+        finally:
+            stop.set()
+    return feeds
+
+
+def _collect(results, remaining, by_id, started, totals):
+    while remaining:
+        kind, feed_id, payload, seen = results.get()
+        feed = by_id[feed_id]
+        if kind == "batch":
+            totals[feed_id]["items_seen"] += seen
+            if payload:
+                totals[feed_id]["products_updated"] += apply_feed_rows(payload, feed.match_on)
+            continue
+        remaining -= 1
+        run_at, began = started[feed_id]
+        status = {
+            "last_run_at": run_at,
+            "last_status": PartnerFeed.Status.FAILED if payload else PartnerFeed.Status.OK,
+            "last_error": payload or "",
+            "last_duration_ms": int((time.monotonic() - began) * 1000),
+            **totals[feed_id],
+        }
+        PartnerFeed.objects.filter(pk=feed_id).update(**status)
+        for field, value in status.items():
+            setattr(feed, field, value)
+
+
+def due_feeds(now=None):
+    now = now or timezone.now()
+    return [
+        feed
+        for feed in PartnerFeed.objects.filter(enabled=True).order_by("name")
+        if feed.last_run_at is None or (now - feed.last_run_at).total_seconds() >= feed.interval_minutes * 60
+    ]
@@ -0,0 +1,100 @@
+"""Anonymous carts kept in a signed cookie, so guests never create Cart or CartItem rows.
+
+The cookie holds ``product_id:quantity`` pairs, bounded by ``GUEST_CART_MAX_ITEMS`` lines
+and ``GUEST_CART_MAX_QUANTITY`` units per line. On login it is merged into the user's
+``Cart`` with one validation query and one bulk upsert.
+"""
+from decimal import Decimal
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core import signing
+
+from .models import Cart, CartItem, Product
+
+GUEST_CART_COOKIE = "guest_cart"
+_SALT = "pages.guest_cart"
+
+
+class GuestCartItem(NamedTuple):
+    product: object
+    quantity: int
+
+    def get_total(self):
+        return self.product.price * self.quantity
+
+
+def read_guest_cart(request):
+    try:
+        raw = request.get_signed_cookie(GUEST_CART_COOKIE, default="", salt=_SALT, max_age=settings.GUEST_CART_MAX_AGE)
+    except signing.BadSignature:
+        return {}
+    items = {}
+    for part in raw.split(","):
+        product_id, sep, quantity = part.partition(":")
+        if not (sep and product_id.isdigit() and quantity.isdigit() and int(quantity) > 0):
+            continue
+        items[int(product_id)] = min(int(quantity), settings.GUEST_CART_MAX_QUANTITY)
+        if len(items) >= settings.GUEST_CART_MAX_ITEMS:
+            break
+    return items
+
+
+def write_guest_cart(response, items):
+    if not items:
+        response.delete_cookie(GUEST_CART_COOKIE)
+        return
+    response.set_signed_cookie(
+        GUEST_CART_COOKIE,
+        ",".join(f"{product_id}:{quantity}" for product_id, quantity in items.items()),
+        salt=_SALT,
+        max_age=settings.GUEST_CART_MAX_AGE,
+        secure=settings.SESSION_COOKIE_SECURE,
+        httponly=True,
+        samesite="Lax",
+    )
+
+
+def add_to_guest_cart(items, product_id, quantity=1):
+    """Add ``quantity`` units in place; returns False when the cart is already at its line limit."""
+    if product_id not in items and len(items) >= settings.GUEST_CART_MAX_ITEMS:
+        return False
+    items[product_id] = min(items.get(product_id, 0) + quantity, settings.GUEST_CART_MAX_QUANTITY)
+    return True
+
+
+def guest_cart_items(items, catalog):
+    cart_items = [
+        GuestCartItem(catalog.get(product_id), quantity)
+        for product_id, quantity in items.items()
+        if catalog.get(product_id) is not None
+    ]
+    return cart_items, sum((item.get_total() for item in cart_items), Decimal("0"))
+
+
+def merge_guest_cart(user, items):
+    """Fold a guest cart into ``user``'s Cart, capping each line at the product's current stock.
+
+    Returns the number of cart lines written.
+    """
+    if not items:
+        return 0
+    # One query validates every line: unknown and sold-out products are dropped here.
+    stock = dict(Product.objects.filter(id__in=items, stock__gt=0).values_list("id", "stock"))
+    if not stock:
+        return 0
+    cart, created = Cart.objects.get_or_create(user=user)
+    existing = {} if created else dict(
+        CartItem.objects.filter(cart=cart, product_id__in=stock).values_list("product_id", "quantity")
+    )
+    rows = [
+        CartItem(cart=cart, product_id=product_id, quantity=min(existing.get(product_id, 0) + items[product_id], available))
+        for product_id, available in stock.items()
+    ]
+    CartItem.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["cart", "product"],
+        update_fields=["quantity"],
+    )
+    return len(rows)
@@ -0,0 +1,85 @@
+"""Invoice PDFs for approved orders, rendered once and kept in default storage."""
+import io
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from .models import Order
+
+
+def render_invoice_pdf(order):
+    # reportlab is imported on first use, like the admin inventory export.
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+
+    pdf.setFont("Helvetica-Bold", 16)
+    pdf.drawString(72, height - 72, _("Invoice"))
+    pdf.setFont("Helvetica", 10)
+    pdf.drawString(72, height - 90, f"{_('Order')}: {order.preference_id}")
+    pdf.drawString(72, height - 104, f"{_('Date')}: {timezone.localtime(order.created_at):%Y-%m-%d %H:%M}")
+    pdf.drawString(72, height - 118, f"{_('Customer')}: {order.user.get_full_name() or order.user.username}")
+    if order.payment_id:
+        pdf.drawString(72, height - 132, f"{_('Payment')}: {order.payment_id}")
+
+    def draw_header(y):
+        pdf.setFont("Helvetica-Bold", 11)
+        pdf.drawString(72, y, _("Product"))
+        pdf.drawRightString(380, y, _("Quantity"))
+        pdf.drawRightString(460, y, _("Unit price"))
+        pdf.drawRightString(540, y, _("Total"))
+        pdf.setFont("Helvetica", 10)
+
+    y_position = height - 165
+    draw_header(y_position)
+    y_position -= 18
+    for item in order.items.all():
+        pdf.drawString(72, y_position, item.product_name[:45])
+        pdf.drawRightString(380, y_position, str(item.quantity))
+        pdf.drawRightString(460, y_position, f"{item.unit_price:.2f}")
+        pdf.drawRightString(540, y_position, f"{item.get_total():.2f}")
+        y_position -= 16
+        if y_position < 90:
+            pdf.showPage()
+            y_position = height - 72
+            draw_header(y_position)
+            y_position -= 18
+
+    pdf.setFont("Helvetica-Bold", 12)
+    pdf.drawRightString(540, y_position - 10, f"{_('Total')}: {order.total:.2f} COP")
+    pdf.save()
+    return buffer.getvalue()
+
+
+def ensure_invoice(order):
+    """Return the order's stored invoice, rendering and saving it first if needed.
+
+    Only approved orders get invoices: they no longer change, so the file never goes stale.
+    """
+    if order.invoice:
+        return order.invoice
+    if order.status != Order.Status.APPROVED:
+        raise ValueError("Invoices are only issued for approved orders.")
+    name = f"{order.pk}-{order.preference_id}.pdf"
+    order.invoice.save(name, ContentFile(render_invoice_pdf(order)), save=False)
+    # ``order`` may be an ArchivedOrder; it has the same invoice column.
+    type(order).objects.filter(pk=order.pk).update(invoice=order.invoice.name)
+    return order.invoice
+
+
+def render_invoices(order_ids):
+    """Render invoices for the given order ids; used inline and as a process-pool task."""
+    rendered = 0
+    orders = (
+        Order.objects.filter(pk__in=order_ids, status=Order.Status.APPROVED, invoice="")
+        .select_related("user")
+        .prefetch_related("items")
+    )
+    for order in orders:
+        ensure_invoice(order)
+        rendered += 1
+    return rendered
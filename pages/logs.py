@@ -0,0 +1,156 @@
+"""Structured JSON logging that never blocks the request thread.
+
+Records are formatted (and redacted) in the calling thread, then handed to a bounded queue;
+a background ``QueueListener`` thread does the actual write. If the queue is full the record
+is dropped and counted rather than making the request wait. Configured from ``LOGGING`` in
+settings, so this module must not import Django models.
+"""
+import atexit
+import contextlib
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import uuid
+from datetime import datetime, timezone
+
+_correlation_id = contextvars.ContextVar("correlation_id", default=None)
+
+REDACTED = "[redacted]"
+# Payer data sent to and returned by Mercado Pago; redacted wherever it appears in a record. Only
+# keys that always hold personal data: a bare "name" is as often a product's or a feed's.
+REDACTED_FIELDS = frozenset(
+    {"payer", "email", "surname", "first_name", "last_name", "phone", "identification", "address"}
+)
+# Attributes every LogRecord has; anything else on a record came from ``extra=``.
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def new_correlation_id():
+    return uuid.uuid4().hex
+
+
+def get_correlation_id():
+    return _correlation_id.get()
+
+
+def set_correlation_id(value):
+    """Bind ``value`` to the current context for every later record; returns a token for ``reset_correlation_id``."""
+    return _correlation_id.set(value)
+
+
+def reset_correlation_id(token):
+    """Restore the id that was bound before the ``set_correlation_id`` call that returned ``token``."""
+    try:
+        _correlation_id.reset(token)
+    except ValueError:
+        # Reset from a copy of the context (ASGI closes responses in a worker thread); the
+        # context that holds the id is discarded with the request anyway.
+        pass
+
+
+@contextlib.contextmanager
+def bind_correlation_id(value):
+    """Log under ``value`` inside the block only."""
+    token = set_correlation_id(value)
+    try:
+        yield
+    finally:
+        reset_correlation_id(token)
+
+
+def redact(value):
+    if isinstance(value, dict):
+        return {key: REDACTED if key in REDACTED_FIELDS else redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    return value
+
+
+class CorrelationIdFilter(logging.Filter):
+    def filter(self, record):
+        record.correlation_id = _correlation_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of the records below WARNING from the loggers listed in ``rates``.
+
+    ``rates`` maps logger names to a keep ratio; it also applies to their child loggers.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = dict(rates or {})
+
+    def _rate(self, name):
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "correlation_id": getattr(record, "correlation_id", None),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = redact(value)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class BackgroundQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler with its own listener thread writing formatted lines to ``stream``."""
+
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize=maxsize))
+        self.dropped = 0
+        self.listener = logging.handlers.QueueListener(self.queue, logging.StreamHandler(stream or sys.stdout))
+        self._running = False
+        self.start()
+        # Flush what is still queued when the process exits.
+        atexit.register(self.stop)
+        # The listener thread does not survive fork() (run_worker --processes, gunicorn --preload).
+        os.register_at_fork(after_in_child=self._restart_after_fork)
+
+    def _restart_after_fork(self):
+        running, self._running = self._running, False
+        self.queue = queue.Queue(maxsize=self.queue.maxsize)
+        self.listener = logging.handlers.QueueListener(self.queue, *self.listener.handlers)
+        if running:
+            self.start()
+
+    def start(self):
+        if not self._running:
+            self.listener.start()
+            self._running = True
+
+    def stop(self):
+        if self._running:
+            self.listener.stop()
+            self._running = False
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from pages.archive import archivable_orders, archive_orders
+
+
+class Command(BaseCommand):
+    help = "Move finalized orders older than --days, with their items, into the archive tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+            help="Archive orders whose last change is older than this many days.",
+        )
+        parser.add_argument("--batch-size", type=int, default=500, help="Orders moved per transaction.")
+        parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches.")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the orders that would be moved.")
+
+    def handle(self, *args, **options):
+        if options["days"] < 1:
+            raise CommandError("--days must be at least 1.")
+        if options["dry_run"]:
+            self.stdout.write(f"{archivable_orders(options['days']).count()} order(s) would be archived.")
+            return
+        orders, items = archive_orders(
+            options["days"],
+            batch_size=options["batch_size"],
+            max_batches=options["max_batches"],
+        )
+        self.stdout.write(f"Archived {orders} order(s) with {items} item(s).")
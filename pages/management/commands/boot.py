@@ -0,0 +1,107 @@
+import fcntl
+import hashlib
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+# Arbitrary application-wide key for pg_advisory_lock; every replica must use the same value.
+MIGRATION_LOCK_ID = 726_400_027
+STATIC_STAMP_NAME = ".boot-static-manifest"
+
+
+def pending_migrations(connection):
+    executor = MigrationExecutor(connection)
+    return executor.migration_plan(executor.loader.graph.leaf_nodes())
+
+
+def static_fingerprint():
+    """Hash the relative path and contents of every file the static finders would collect.
+
+    Contents rather than mtimes, so a fresh checkout or image layer with the same files still matches.
+    """
+    digest = hashlib.sha256()
+    entries = []
+    for finder in finders.get_finders():
+        for path, storage in finder.list([]):
+            with storage.open(path) as source:
+                content_hash = hashlib.file_digest(source, "sha256").hexdigest()
+            entries.append(f"{path}\0{content_hash}")
+    for entry in sorted(entries):
+        digest.update(entry.encode())
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+@contextmanager
+def migration_lock(connection):
+    """Serialize migrations across replicas: an advisory lock on PostgreSQL, a file lock elsewhere."""
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", [MIGRATION_LOCK_ID])
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [MIGRATION_LOCK_ID])
+        return
+
+    lock_path = Path(getattr(settings, "BOOT_LOCK_PATH", Path(settings.BASE_DIR) / ".boot-migrate.lock"))
+    with open(lock_path, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class Command(BaseCommand):
+    help = "Prepare a container for serving: apply pending migrations and collect static files only when needed."
+
+    # Boot sits on every replica's critical path; system checks belong in CI, not here.
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument("--skip-migrate", action="store_true", help="Do not check or apply migrations.")
+        parser.add_argument("--skip-static", action="store_true", help="Do not check or collect static files.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if not options["skip_migrate"]:
+            self._migrate(connections[options["database"]], options["database"])
+        if not options["skip_static"]:
+            self._collectstatic()
+        self.stdout.write(f"Boot finished in {time.monotonic() - started:.2f}s")
+
+    def _migrate(self, connection, database):
+        if not pending_migrations(connection):
+            self.stdout.write("Migrations: up to date, skipping.")
+            return
+
+        with migration_lock(connection):
+            # Another replica may have applied them while we waited for the lock.
+            plan = pending_migrations(connection)
+            if not plan:
+                self.stdout.write("Migrations: applied by another replica, skipping.")
+                return
+            self.stdout.write(f"Migrations: applying {len(plan)} pending migration(s).")
+            call_command("migrate", database=database, interactive=False, verbosity=0)
+
+    def _collectstatic(self):
+        fingerprint = static_fingerprint()
+        stamp = Path(settings.STATIC_ROOT) / STATIC_STAMP_NAME
+        if stamp.exists() and stamp.read_text().strip() == fingerprint:
+            self.stdout.write("Static files: up to date, skipping.")
+            return
+
+        self.stdout.write("Static files: sources changed, collecting.")
+        call_command("collectstatic", interactive=False, verbosity=0)
+        stamp.parent.mkdir(parents=True, exist_ok=True)
+        stamp.write_text(fingerprint)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from pages.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = "Build 'customers also bought' recommendations from approved orders (incremental by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Recompute from the whole order history.")
+        parser.add_argument("--top-k", type=int, default=None, help="Recommendations kept per product.")
+
+    def handle(self, *args, **options):
+        refreshed = build_recommendations(full=options["full"], k=options["top_k"])
+        self.stdout.write(f"Refreshed recommendations for {refreshed} product(s).")
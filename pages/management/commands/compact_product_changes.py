@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from pages.changefeed import compact_product_changes
+
+
+class Command(BaseCommand):
+    help = "Drop inventory change-feed entries superseded by a newer entry for the same product."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000, help="Entries deleted per statement.")
+
+    def handle(self, *args, **options):
+        removed = compact_product_changes(batch_size=options["batch_size"])
+        self.stdout.write(f"Removed {removed} superseded change(s).")
@@ -0,0 +1,46 @@
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from pages.exports import EXPORT_FORMATS, export_lines
+from pages.models import Order
+
+
+def _parse_day(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError as exc:
+        raise CommandError(f"Invalid date {value!r}; use YYYY-MM-DD.") from exc
+
+
+class Command(BaseCommand):
+    help = "Stream orders and their items as CSV or JSON Lines, in constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="csv")
+        parser.add_argument("--since", help="First day to include (YYYY-MM-DD), by order creation date.")
+        parser.add_argument("--until", help="Last day to include (YYYY-MM-DD), by order creation date.")
+        parser.add_argument("--status", choices=[choice for choice, _ in Order.Status.choices], action="append")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument("--output", "-o", help="File to write to; defaults to stdout.")
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all()
+        tz = timezone.get_current_timezone()
+        if options["since"]:
+            start = datetime.combine(_parse_day(options["since"]), time.min)
+            orders = orders.filter(created_at__gte=timezone.make_aware(start, tz))
+        if options["until"]:
+            end = datetime.combine(_parse_day(options["until"]) + timedelta(days=1), time.min)
+            orders = orders.filter(created_at__lt=timezone.make_aware(end, tz))
+        if options["status"]:
+            orders = orders.filter(status__in=options["status"])
+
+        lines = export_lines(orders, options["format"], chunk_size=options["chunk_size"])
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8", newline="") as output:
+                output.writelines(lines)
+        else:
+            for chunk in lines:
+                self.stdout.write(chunk, ending="")
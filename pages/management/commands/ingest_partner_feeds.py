@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from pages.feeds import due_feeds, ingest_feeds
+from pages.models import PartnerFeed
+
+
+class Command(BaseCommand):
+    help = (
+        "Download the partner inventory feeds that are due and apply their stock and prices. "
+        "Meant to run from cron every few minutes; each feed's own interval decides whether it runs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--feed", action="append", default=[], help="Run only this feed (by name); repeatable.")
+        parser.add_argument("--all", action="store_true", help="Run every enabled feed, due or not.")
+        parser.add_argument("--workers", type=int, default=4, help="Feeds downloaded at the same time.")
+        parser.add_argument("--batch-size", type=int, default=500, help="Products updated per statement.")
+
+    def handle(self, *args, **options):
+        if options["feed"]:
+            feeds = list(PartnerFeed.objects.filter(name__in=options["feed"]).order_by("name"))
+            missing = set(options["feed"]) - {feed.name for feed in feeds}
+            if missing:
+                raise CommandError(f"Unknown feed(s): {', '.join(sorted(missing))}")
+        elif options["all"]:
+            feeds = list(PartnerFeed.objects.filter(enabled=True).order_by("name"))
+        else:
+            feeds = due_feeds()
+
+        for feed in ingest_feeds(feeds, workers=max(options["workers"], 1), batch_size=options["batch_size"]):
+            line = (
+                f"{feed.name}: {feed.last_status}, {feed.items_seen} item(s), "
+                f"{feed.products_updated} product(s) updated in {feed.last_duration_ms} ms"
+            )
+            self.stdout.write(f"{line} ({feed.last_error})" if feed.last_error else line)
+        if not feeds:
+            self.stdout.write("No feeds due.")
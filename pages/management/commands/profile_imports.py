@@ -0,0 +1,101 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Imports exactly what a gunicorn worker imports before serving its first request.
+STARTUP_SNIPPET = (
+    "import django; django.setup(); "
+    "from django.urls import get_resolver; get_resolver().url_patterns; "
+    "import helloworld_project.wsgi"
+)
+
+
+def parse_importtime(lines):
+    """Parse ``python -X importtime`` output into (self_us, cumulative_us, depth, module) rows."""
+    rows = []
+    for line in lines:
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        self_us, cumulative_us, name = parts
+        if not self_us.strip().isdigit():
+            # header line: "self [us] | cumulative | imported package"
+            continue
+        name = name[1:]
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        rows.append((int(self_us), int(cumulative_us), depth, name.strip()))
+    return rows
+
+
+def summarize_importtime(rows, top=20):
+    total_us = sum(cumulative for _, cumulative, depth, _ in rows if depth == 0)
+    packages = defaultdict(int)
+    for self_us, _, _, module in rows:
+        packages[module.split(".")[0]] += self_us
+    slowest = sorted(rows, key=lambda row: row[1], reverse=True)[:top]
+    return {
+        "total_ms": round(total_us / 1000, 2),
+        "modules": len(rows),
+        "packages": [
+            {"package": package, "ms": round(us / 1000, 2)}
+            for package, us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        ],
+        "slowest": [
+            {"module": module, "self_ms": round(self_us / 1000, 2), "cumulative_ms": round(cumulative_us / 1000, 2)}
+            for self_us, cumulative_us, _, module in slowest
+        ],
+    }
+
+
+class Command(BaseCommand):
+    help = "Report a cumulative import-time breakdown for django.setup() and the WSGI application."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=20, help="Number of packages and modules to list.")
+        parser.add_argument(
+            "--budget-ms",
+            type=float,
+            default=None,
+            help="Fail with a non-zero exit code when total import time exceeds this many milliseconds.",
+        )
+        parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ)
+        env.setdefault("DJANGO_SETTINGS_MODULE", settings.SETTINGS_MODULE)
+        # A fresh interpreter is the only way to measure a cold import; this process already has everything loaded.
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", STARTUP_SNIPPET],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Startup import failed:\n{result.stderr[-2000:]}")
+
+        report = summarize_importtime(parse_importtime(result.stderr.splitlines()), top=options["top"])
+        budget = options["budget_ms"]
+        report["budget_ms"] = budget
+        report["over_budget"] = budget is not None and report["total_ms"] > budget
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.stdout.write(f"Total import time: {report['total_ms']:.1f} ms across {report['modules']} modules")
+            self.stdout.write("\nBy top-level package:")
+            for row in report["packages"]:
+                self.stdout.write(f"  {row['ms']:>9.1f} ms  {row['package']}")
+            self.stdout.write("\nSlowest modules (cumulative):")
+            for row in report["slowest"]:
+                self.stdout.write(f"  {row['cumulative_ms']:>9.1f} ms  {row['module']}")
+
+        if report["over_budget"]:
+            raise CommandError(f"Import time {report['total_ms']:.1f} ms exceeds budget of {budget:.1f} ms.")
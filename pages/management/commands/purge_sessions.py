@@ -0,0 +1,47 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DatabaseSessionStore
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = "Delete expired sessions in small batches so the session table is never locked for long."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=settings.SESSION_PURGE_BATCH_SIZE)
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.0,
+            help="Seconds to pause between batches to leave room for request traffic.",
+        )
+        parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches.")
+
+    def handle(self, *args, **options):
+        store_class = import_module(settings.SESSION_ENGINE).SessionStore
+        if not issubclass(store_class, DatabaseSessionStore):
+            # Cache entries expire on their own and signed cookies live in the browser.
+            self.stdout.write(f"{settings.SESSION_ENGINE} keeps no session rows; nothing to purge.")
+            return
+
+        model = store_class.get_model_class()
+        batch_size = options["batch_size"]
+        cutoff = timezone.now()
+        deleted = batches = 0
+
+        while options["max_batches"] is None or batches < options["max_batches"]:
+            # Each batch is its own short autocommit statement keyed on the primary key.
+            keys = list(
+                model.objects.filter(expire_date__lt=cutoff).values_list("session_key", flat=True)[:batch_size]
+            )
+            if not keys:
+                break
+            deleted += model.objects.filter(session_key__in=keys).delete()[0]
+            batches += 1
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+
+        self.stdout.write(f"Deleted {deleted} expired session(s) in {batches} batch(es).")
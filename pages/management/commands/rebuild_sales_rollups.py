@@ -0,0 +1,94 @@
+import heapq
+from itertools import groupby
+from operator import itemgetter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce, Now, TruncDate
+
+from pages.archive import ORDER_SOURCES
+from pages.cache import bump_namespace
+from pages.catalog import bump_catalog_version
+from pages.models import Order, Product, ProductSalesDay
+from pages.sales import SALES_NAMESPACE, units_case
+
+
+def _merged(querysets, key_fields, sum_fields, chunk_size):
+    """Merge grouped rows from the live and archive tables, which are sorted by ``key_fields``, into one stream.
+
+    An order lives in exactly one table, so rows with the same key only need their sums added.
+    """
+    key = itemgetter(*key_fields)
+    streams = [queryset.order_by(*key_fields).iterator(chunk_size=chunk_size) for queryset in querysets]
+    for _key, rows in groupby(heapq.merge(*streams, key=key), key=key):
+        rows = list(rows)
+        merged = dict(rows[0])
+        for row in rows[1:]:
+            for field in sum_fields:
+                merged[field] += row[field]
+        yield merged
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily per-product sales rollup (and optionally the all-time counters) from approved orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--counters",
+            action="store_true",
+            help="Also recompute Product.cantidad_vendidos from order history, replacing manual values.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        sold = [
+            item_model.objects.filter(order__status=Order.Status.APPROVED, product__isnull=False)
+            for _order_model, item_model in ORDER_SOURCES
+        ]
+
+        with transaction.atomic():
+            ProductSalesDay.objects.all().delete()
+            daily = _merged(
+                [
+                    queryset.annotate(day=TruncDate(Coalesce("order__approved_at", "order__updated_at")))
+                    .values("product_id", "day")
+                    .annotate(units=Sum("quantity"), revenue=Sum(F("quantity") * F("unit_price")))
+                    for queryset in sold
+                ],
+                ("product_id", "day"),
+                ("units", "revenue"),
+                batch_size,
+            )
+            batch = []
+            days_written = 0
+            for row in daily:
+                batch.append(ProductSalesDay(product_id=row["product_id"], day=row["day"], units=row["units"], revenue=row["revenue"]))
+                if len(batch) >= batch_size:
+                    days_written += len(ProductSalesDay.objects.bulk_create(batch))
+                    batch = []
+            days_written += len(ProductSalesDay.objects.bulk_create(batch))
+
+            if options["counters"]:
+                Product.objects.update(cantidad_vendidos=0, updated_at=Now())
+                totals = {}
+                per_product = _merged(
+                    [queryset.values("product_id").annotate(units=Sum("quantity")) for queryset in sold],
+                    ("product_id",),
+                    ("units",),
+                    batch_size,
+                )
+                for row in per_product:
+                    totals[row["product_id"]] = row["units"]
+                    if len(totals) >= batch_size:
+                        Product.objects.filter(pk__in=totals).update(cantidad_vendidos=units_case(totals))
+                        totals = {}
+                if totals:
+                    Product.objects.filter(pk__in=totals).update(cantidad_vendidos=units_case(totals))
+
+            Order.objects.filter(status=Order.Status.APPROVED, sales_recorded=False).update(sales_recorded=True)
+
+        bump_catalog_version()
+        bump_namespace(SALES_NAMESPACE)
+        self.stdout.write(f"Wrote {days_written} product-day rollup row(s).")
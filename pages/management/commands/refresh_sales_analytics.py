@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from pages.analytics import refresh_sales_analytics
+
+
+class Command(BaseCommand):
+    help = "Refresh the daily and monthly sales rollups for the time buckets changed since the last run."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Rebuild every bucket from the full order history.")
+
+    def handle(self, *args, **options):
+        days, months = refresh_sales_analytics(full=options["full"])
+        self.stdout.write(f"Refreshed {days} day bucket(s) and {months} month bucket(s).")
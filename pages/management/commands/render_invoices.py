@@ -0,0 +1,57 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from pages.invoices import render_invoices
+from pages.models import Order
+
+
+def _init_worker():
+    import django
+
+    django.setup()
+    # Forked workers inherit the parent's database connections; each must open its own.
+    connections.close_all()
+
+
+def _parse_day(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError as exc:
+        raise CommandError(f"Invalid date {value!r}; use YYYY-MM-DD.") from exc
+
+
+class Command(BaseCommand):
+    help = "Pre-render invoice PDFs for approved orders in a date range, in a process pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="First day to include (YYYY-MM-DD), by order creation date.")
+        parser.add_argument("--until", help="Last day to include (YYYY-MM-DD), by order creation date.")
+        parser.add_argument("--workers", type=int, default=4, help="Worker processes; 1 renders in this process.")
+        parser.add_argument("--chunk-size", type=int, default=50, help="Orders handed to a worker at a time.")
+
+    def handle(self, *args, **options):
+        orders = Order.objects.filter(status=Order.Status.APPROVED, invoice="")
+        tz = timezone.get_current_timezone()
+        if options["since"]:
+            start = datetime.combine(_parse_day(options["since"]), time.min)
+            orders = orders.filter(created_at__gte=timezone.make_aware(start, tz))
+        if options["until"]:
+            end = datetime.combine(_parse_day(options["until"]) + timedelta(days=1), time.min)
+            orders = orders.filter(created_at__lt=timezone.make_aware(end, tz))
+
+        order_ids = list(orders.order_by("pk").values_list("pk", flat=True))
+        chunk_size = options["chunk_size"]
+        chunks = [order_ids[start:start + chunk_size] for start in range(0, len(order_ids), chunk_size)]
+
+        if options["workers"] <= 1 or len(chunks) <= 1:
+            rendered = sum(render_invoices(chunk) for chunk in chunks)
+        else:
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options["workers"], initializer=_init_worker) as pool:
+                rendered = sum(pool.map(render_invoices, chunks))
+
+        self.stdout.write(f"Rendered {rendered} invoice(s).")
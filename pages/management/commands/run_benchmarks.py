@@ -0,0 +1,101 @@
+import json
+import platform
+import sys
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from pages.benchmarks import BASELINE_PATH, BENCHMARKS, find_regressions, run_benchmarks
+
+# The benchmarks bump cache namespaces (catalog, sales); against the configured cache they
+# would invalidate the entries every replica sharing it is serving.
+BENCHMARK_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "benchmarks"}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the hot-path micro-benchmarks (pages.benchmarks) on seeded fixtures in a throwaway test "
+        "database, and compare them with a stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--filter",
+            action="append",
+            default=[],
+            help="Only run benchmarks whose name contains this; repeatable.",
+        )
+        parser.add_argument("--list", action="store_true", help="List the benchmarks and exit.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark.")
+        parser.add_argument("--output", help="Write the JSON results to this file instead of stdout.")
+        parser.add_argument(
+            "--baseline",
+            default=str(BASELINE_PATH),
+            help="JSON results of an earlier run to compare against (default: the committed baseline; \"\" skips).",
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Write this run's results to --baseline instead of comparing.",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.25,
+            help="Flag a regression when median time or peak memory exceeds the baseline by this fraction.",
+        )
+
+    def handle(self, *args, **options):
+        if options["list"]:
+            for bench in BENCHMARKS:
+                self.stdout.write(bench.name)
+            return
+        def progress(name, result):
+            summary = result.get("skipped") or f"{result['median_ms']} ms, peak {result['peak_kib']} KiB"
+            self.stderr.write(f"{name}: {summary}")
+
+        # Fixtures go into a throwaway database and cache, never the configured ones, and mail
+        # goes to the in-memory backend, as under the test runner.
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(CACHES=BENCHMARK_CACHES):
+                results = run_benchmarks(options["filter"], options["seed"], options["repeat"], progress)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            "python": sys.version.split()[0],
+            "django": django.get_version(),
+            "machine": platform.machine(),
+            "seed": options["seed"],
+            "results": results,
+        }
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options["output"]:
+            Path(options["output"]).write_text(output + "\n", encoding="utf-8")
+        else:
+            self.stdout.write(output)
+
+        if not options["baseline"]:
+            return
+        baseline_path = Path(options["baseline"])
+        if options["save_baseline"]:
+            baseline_path.write_text(output + "\n", encoding="utf-8")
+            self.stderr.write(f"Baseline saved to {baseline_path}.")
+            return
+        if not baseline_path.exists():
+            raise CommandError(f"No baseline at {baseline_path}; run with --save-baseline first.")
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))["results"]
+        regressions = find_regressions(results, baseline, options["threshold"])
+        for name, metric, before, after in regressions:
+            self.stderr.write(f"REGRESSION {name} {metric}: {before} -> {after}")
+        if regressions:
+            raise CommandError(f"{len(regressions)} benchmark metric(s) regressed past the baseline.")
+        self.stderr.write("No regressions against the baseline.")
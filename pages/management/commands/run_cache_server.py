@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from pages.cache_server import CacheServer
+
+
+class Command(BaseCommand):
+    help = "Run a local Redis-protocol cache server for DJANGO_CACHE_BACKEND=redis (development only)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1", help="Address to listen on.")
+        parser.add_argument("--port", type=int, default=6379, help="Port to listen on.")
+
+    def handle(self, *args, **options):
+        with CacheServer((options["host"], options["port"])) as server:
+            host, port = server.server_address[:2]
+            self.stdout.write(f"Cache server listening on redis://{host}:{port}/0")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
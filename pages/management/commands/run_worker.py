@@ -0,0 +1,70 @@
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from pages.tasks import Worker
+
+
+def _work(batch_size, poll_interval, once):
+    worker = Worker(batch_size=batch_size, poll_interval=poll_interval)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run(once=once)
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks (pages.tasks) in one or more worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=1, help="Worker processes to run.")
+        parser.add_argument("--batch-size", type=int, default=10, help="Tasks each worker claims at a time.")
+        parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds to wait when no task is due.")
+        parser.add_argument("--once", action="store_true", help="Exit once no task is due instead of waiting.")
+
+    def handle(self, *args, **options):
+        if options["processes"] < 1:
+            raise CommandError("--processes must be at least 1.")
+        worker_args = (options["batch_size"], options["poll_interval"], options["once"])
+        if options["processes"] == 1:
+            worker = Worker(batch_size=options["batch_size"], poll_interval=options["poll_interval"])
+            signal.signal(signal.SIGTERM, worker.stop)
+            ran = worker.run(once=options["once"])
+            self.stdout.write(f"Worker {worker.id} ran {ran} task(s).")
+            return
+
+        # Children get their own connections; a socket shared across fork() is corrupted by both sides.
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        stopping = False
+
+        def stop(*_args):
+            nonlocal stopping
+            stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        processes = [context.Process(target=_work, args=worker_args) for _ in range(options["processes"])]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Started {len(processes)} worker process(es).")
+
+        while not stopping:
+            if not any(process.is_alive() for process in processes):
+                break
+            if not options["once"]:
+                for index, process in enumerate(processes):
+                    if not process.is_alive() and process.exitcode != 0:
+                        self.stderr.write(f"Worker process {process.pid} exited with {process.exitcode}; restarting it.")
+                        processes[index] = context.Process(target=_work, args=worker_args)
+                        processes[index].start()
+            time.sleep(0.5)
+        # SIGTERM lets each worker finish its current task and hand back the rest of its batch.
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+        self.stdout.write("Workers stopped.")
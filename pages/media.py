@@ -0,0 +1,176 @@
+"""Serving uploaded media in production.
+
+Product images are stored under content-hashed names (``products/tent.3f9c2a7b1d04e6a8.jpg``),
+so a name never points at different bytes and responses for them are cached as immutable.
+``serve_media`` validates the request and answers conditional requests itself, then hands
+the file body to the front server (``X-Accel-Redirect`` for nginx, ``X-Sendfile`` for
+Apache/lighttpd) or, without one, streams it from Django: whole files through
+``FileResponse`` (``wsgi.file_wrapper``, i.e. ``sendfile`` under gunicorn/uWSGI) and single
+byte ranges through a bounded reader.
+"""
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db import models
+from django.db.models.fields.files import ImageFieldFile
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+_HASHED_NAME = re.compile(r"\.(?P<digest>[0-9a-f]{16})(\.[^./]+)?$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def content_hashed_name(name, content):
+    """``"Tent Photo.JPG"`` -> ``"Tent Photo.3f9c2a7b1d04e6a8.jpg"``, hashing the file in chunks."""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in iter(lambda: content.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+    content.seek(0)
+    stem, extension = posixpath.splitext(posixpath.basename(name))
+    return f"{stem[:40]}.{digest.hexdigest()[:16]}{extension.lower()}"
+
+
+class ContentHashedImageFieldFile(ImageFieldFile):
+    def save(self, name, content, save=True):
+        name = content_hashed_name(name, content)
+        stored_name = self.field.generate_filename(self.instance, name)
+        if not self.storage.exists(stored_name):
+            super().save(name, content, save)
+            return
+        # The same bytes are already stored under this name; point at them instead of a suffixed copy.
+        self.name = stored_name
+        setattr(self.instance, self.field.attname, self.name)
+        self._committed = True
+        if save:
+            self.instance.save()
+
+
+class ContentHashedImageField(models.ImageField):
+    """ImageField that names each upload after its content, e.g. ``products/tent.3f9c2a7b1d04e6a8.jpg``."""
+
+    attr_class = ContentHashedImageFieldFile
+
+
+def is_content_hashed(name):
+    return _HASHED_NAME.search(name) is not None
+
+
+def media_etag(name, stat):
+    match = _HASHED_NAME.search(name)
+    if match:
+        return quote_etag(match["digest"])
+    return quote_etag(f"{stat.st_mtime_ns:x}-{stat.st_size:x}")
+
+
+def parse_range(header, size):
+    """``(start, end)`` (inclusive) for a single ``bytes=`` range, ``None`` to send the whole file.
+
+    Raises ``ValueError`` when the range cannot be satisfied.
+    """
+    match = _RANGE.match(header.strip())
+    if not match:
+        # Malformed or multi-range requests get the full body, which RFC 9110 allows.
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def _read_range(file, start, length):
+    with file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def _public_path(name):
+    name = posixpath.normpath(name).lstrip("/")
+    if not name.startswith(tuple(settings.MEDIA_PUBLIC_PREFIXES)):
+        raise Http404
+    try:
+        path = Path(safe_join(settings.MEDIA_ROOT, name))
+    except ValueError:
+        raise Http404 from None
+    if not path.is_file():
+        raise Http404
+    return name, path
+
+
+@require_safe
+def serve_media(request, path):
+    name, full_path = _public_path(path)
+    stat = full_path.stat()
+    etag = media_etag(name, stat)
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        response = _file_response(request, name, full_path, stat, etag)
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    if is_content_hashed(name):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_CACHE_MAX_AGE)
+    return response
+
+
+def _file_response(request, name, full_path, stat, etag):
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    backend = settings.MEDIA_SERVE_BACKEND
+    if backend == "x-accel-redirect":
+        # nginx serves the body, ranges included, from an `internal` location aliased to MEDIA_ROOT.
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_PREFIX + quote(name)
+        return response
+    if backend == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = os.fspath(full_path)
+        return response
+
+    size = stat.st_size
+    byte_range = None
+    if request.method == "GET" and "HTTP_RANGE" in request.META:
+        # A stale If-Range (the file changed since the client's partial copy) means "send it all".
+        if_range = request.META.get("HTTP_IF_RANGE")
+        if if_range is None or if_range == etag:
+            try:
+                byte_range = parse_range(request.META["HTTP_RANGE"], size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response["Content-Range"] = f"bytes */{size}"
+                return response
+
+    if byte_range is None:
+        response = FileResponse(full_path.open("rb"), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read_range(full_path.open("rb"), start, end - start + 1), status=206, content_type=content_type
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(end - start + 1)
+    response["Accept-Ranges"] = "bytes"
+    return response
@@ -0,0 +1,144 @@
+import logging
+import math
+import random
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.http import HttpResponse
+from django.utils.translation import gettext as _
+
+from .guest_cart import GUEST_CART_COOKIE
+from .logs import get_correlation_id, new_correlation_id, reset_correlation_id, set_correlation_id
+from .models import RequestProfile
+from .profiling import install_template_timer, new_profiler
+from .throttle import check_request
+
+throttle_logger = logging.getLogger("pages.throttle")
+
+CORRELATION_ID_HEADER = "X-Request-ID"
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+
+class CorrelationIdMiddleware:
+    """Bind a correlation id to every log record of the request and echo it in ``X-Request-ID``.
+
+    An incoming ``X-Request-ID`` (from the load balancer) is reused when it looks sane.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        incoming = request.headers.get(CORRELATION_ID_HEADER, "")
+        correlation_id = incoming if incoming.isalnum() and len(incoming) <= 64 else new_correlation_id()
+        request.correlation_id = correlation_id
+        token = set_correlation_id(correlation_id)
+        response = self.get_response(request)
+        response[CORRELATION_ID_HEADER] = correlation_id
+        # Django logs 4xx/5xx responses after the middleware chain returns, so the id stays bound
+        # until the response is closed (where the handler also closes the request), then the
+        # thread's previous binding is restored.
+        response._resource_closers.append(lambda: reset_correlation_id(token))
+        return response
+
+
+class GuestCartMiddleware:
+    """Clear the guest cart cookie once its contents have been merged into a user's cart."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if getattr(request, "guest_cart_merged", False):
+            response.delete_cookie(GUEST_CART_COOKIE)
+        return response
+
+
+class ThrottleMiddleware:
+    """Answer 429 for routes listed in ``THROTTLE_RATES`` once a client's bucket is empty.
+
+    Runs before the view and identifies the user from the session alone, so a throttled
+    request never loads the user row or touches the ORM.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        route = request.resolver_match.url_name if request.resolver_match else None
+        if route not in settings.THROTTLE_RATES:
+            return None
+        session = getattr(request, "session", None)
+        user_id = session.get(SESSION_KEY) if session is not None else None
+        wait = check_request(request, route, user_id)
+        if not wait:
+            return None
+        throttle_logger.info("request throttled", extra={"route": route, "retry_after": math.ceil(wait)})
+        response = HttpResponse(_("Too many requests. Please try again shortly."), status=429, content_type="text/plain")
+        response["Retry-After"] = str(math.ceil(wait))
+        return response
+
+
+class ProfilingMiddleware:
+    """Profile the rest of the request for staff sending ``X-Profile: 1``, and for a
+    ``PROFILE_SAMPLE_RATE`` fraction of all requests; results are stored as RequestProfile.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install_template_timer()
+
+    def _trigger(self, request):
+        if request.headers.get(PROFILE_HEADER) == "1":
+            user = request.user
+            if user.is_active and user.is_staff:
+                return RequestProfile.Trigger.HEADER
+        rate = settings.PROFILE_SAMPLE_RATE
+        if rate and random.random() < rate:
+            return RequestProfile.Trigger.SAMPLED
+        return None
+
+    def __call__(self, request):
+        trigger = self._trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+        profiler = new_profiler()
+        response = profiler.run(self.get_response, request)
+        profile = save_profile(request, response, profiler, trigger)
+        if trigger == RequestProfile.Trigger.HEADER:
+            response[PROFILE_ID_HEADER] = str(profile.pk)
+        return response
+
+
+def save_profile(request, response, profiler, trigger):
+    match = request.resolver_match
+    user = getattr(request, "user", None)
+    profile = RequestProfile.objects.create(
+        method=request.method,
+        path=request.get_full_path()[:500],
+        view_name=(match.view_name if match else "")[:200],
+        status_code=response.status_code,
+        user=user if user is not None and user.is_authenticated else None,
+        trigger=trigger,
+        correlation_id=get_correlation_id() or "",
+        duration_ms=profiler.duration * 1000,
+        sample_interval_ms=profiler.interval * 1000,
+        sample_count=sum(profiler.sampler.stacks.values()),
+        sql_count=profiler.query_count,
+        sql_ms=profiler.sql_seconds * 1000,
+        template_ms=profiler.template_seconds * 1000,
+        folded=profiler.sampler.folded(),
+        queries=profiler.queries,
+        templates=profiler.templates,
+    )
+    # Keep only the newest profiles.
+    keep = settings.PROFILE_KEEP
+    stale = RequestProfile.objects.order_by("-pk").values_list("pk", flat=True)[keep : keep + 1]
+    if stale:
+        RequestProfile.objects.filter(pk__lte=stale[0]).delete()
+    return profile
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def mark_existing_approved_orders(apps, schema_editor):
+    # Historical sales are backfilled with `manage.py rebuild_sales_rollups`; flag them so a
+    # repeated payment callback does not count them a second time.
+    Order = apps.get_model('pages', 'Order')
+    Order.objects.filter(status='approved').update(sales_recorded=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0007_cartitem_unique_cart_product'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='approved_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='sales_recorded',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_existing_approved_orders, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='product',
+            name='cantidad_vendidos',
+            field=models.PositiveIntegerField(db_index=True, default=0, verbose_name='Quantity sold'),
+        ),
+        migrations.CreateModel(
+            name='ProductSalesDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('units', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_days', to='pages.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'product'], name='sales_day_product_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'day'), name='unique_product_sales_day')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0009_sales_analytics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='invoice',
+            field=models.FileField(blank=True, upload_to='invoices/'),
+        ),
+    ]
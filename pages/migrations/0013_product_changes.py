@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:37
+
+from django.db import migrations, models
+
+
+def seed_existing_products(apps, schema_editor):
+    # One entry per existing product, so a client starting from cursor 0 receives the whole catalog.
+    Product = apps.get_model('pages', 'Product')
+    ProductChange = apps.get_model('pages', 'ProductChange')
+    product_ids = Product.objects.order_by('pk').values_list('pk', flat=True)
+    ProductChange.objects.bulk_create(
+        (ProductChange(product_id=product_id) for product_id in product_ids.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0012_product_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.BigIntegerField(db_index=True)),
+                ('deleted', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(seed_existing_products, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0013_product_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PartnerFeed',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('url', models.URLField(max_length=500)),
+                ('match_on', models.CharField(choices=[('id', 'Product id'), ('name', 'Product name')], default='id', max_length=10)),
+                ('enabled', models.BooleanField(default=True)),
+                ('interval_minutes', models.PositiveIntegerField(default=60)),
+                ('timeout_seconds', models.PositiveSmallIntegerField(default=30, help_text='Limit for the whole download.')),
+                ('max_bytes', models.PositiveIntegerField(default=52428800)),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+                ('last_status', models.CharField(choices=[('never', 'Never run'), ('ok', 'OK'), ('failed', 'Failed')], default='never', max_length=10)),
+                ('last_error', models.TextField(blank=True)),
+                ('last_duration_ms', models.PositiveIntegerField(blank=True, null=True)),
+                ('items_seen', models.PositiveIntegerField(default=0)),
+                ('products_updated', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
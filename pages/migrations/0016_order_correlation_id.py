@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0015_product_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='correlation_id',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
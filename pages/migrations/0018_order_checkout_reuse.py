@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0017_order_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='cart_fingerprint',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='init_point',
+            field=models.URLField(blank=True, max_length=500),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'cart_fingerprint', 'status'], name='order_checkout_reuse_idx'),
+        ),
+    ]
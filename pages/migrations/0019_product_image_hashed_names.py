@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:57
+
+import pages.media
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0018_order_checkout_reuse'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=pages.media.ContentHashedImageField(blank=True, null=True, upload_to='products/'),
+        ),
+    ]
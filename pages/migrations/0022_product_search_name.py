@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-19 13:21
+
+from django.db import migrations, models
+
+from pages.text import normalize
+
+
+def fill_search_names(apps, schema_editor):
+    Product = apps.get_model('pages', 'Product')
+    products = list(Product.objects.only('pk', 'name'))
+    for product in products:
+        product.search_name = normalize(product.name)[:100]
+    Product.objects.bulk_update(products, ['search_name'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0021_request_profile'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_name_lower_idx',
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='search_name',
+            field=models.CharField(default='', editable=False, max_length=100),
+        ),
+        migrations.RunPython(fill_search_names, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['search_name'], name='product_search_name_idx'),
+        ),
+    ]
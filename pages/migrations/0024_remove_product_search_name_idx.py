@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-19 13:48
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0023_checkout_claim'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_search_name_idx',
+        ),
+    ]
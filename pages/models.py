@@ -1,20 +1,40 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from .media import ContentHashedImageField
+from .text import normalize
+
 
 class Product(models.Model):
     name = models.CharField(max_length=100)
     price = models.DecimalField(max_digits=10, decimal_places=2)
-    image = models.ImageField(upload_to="products/", blank=True, null=True)
+    image = ContentHashedImageField(upload_to="products/", blank=True, null=True)
     descripcion = models.TextField(blank=True, verbose_name=_("Description"))
-    cantidad_vendidos = models.PositiveIntegerField(default=0, verbose_name=_("Quantity sold"))
+    cantidad_vendidos = models.PositiveIntegerField(default=0, db_index=True, verbose_name=_("Quantity sold"))
     es_producto_dia = models.BooleanField(default=False, verbose_name=_("Is product of the day?"))
     stock = models.PositiveIntegerField(default=0, verbose_name=_("Stock"))
+    # Drives ETag/Last-Modified on catalog pages; set it explicitly in queryset.update() calls.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # normalize(name), kept by save(); the admin searches it (see ProductAdmin.get_search_results).
+    search_name = models.CharField(max_length=100, default="", editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["stock"], name="product_stock_idx"),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.search_name = normalize(self.name)[:100]
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "name" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "search_name"}
+        super().save(*args, **kwargs)
+
 
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -31,6 +51,11 @@ class CartItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["cart", "product"], name="unique_cart_product"),
+        ]
+
     def __str__(self):
         return f"{self.quantity} × {self.product.name}"
 
@@ -38,35 +63,302 @@ class CartItem(models.Model):
         return self.product.price * self.quantity
 
 
-class Order(models.Model):
+class OrderRecord(models.Model):
+    """Columns shared by live orders and their archived copies (see pages.archive)."""
+
     class Status(models.TextChoices):
         PENDING = "pending", _("Pending")
         APPROVED = "approved", _("Approved")
         REJECTED = "rejected", _("Rejected")
         CANCELLED = "cancelled", _("Cancelled")
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="orders")
     preference_id = models.CharField(max_length=100, unique=True)
     payment_id = models.CharField(max_length=100, blank=True)
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
     status_detail = models.CharField(max_length=255, blank=True)
     total = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    approved_at = models.DateTimeField(null=True, blank=True)
+    # Set once the order's units have been added to the sales counters, so repeated
+    # payment callbacks never count the same order twice.
+    sales_recorded = models.BooleanField(default=False)
+    # Correlation id of the checkout request; payment callbacks log under it too (pages/logs.py).
+    correlation_id = models.CharField(max_length=64, blank=True)
+    # Rendered once, after approval, by pages.invoices.ensure_invoice.
+    invoice = models.FileField(upload_to="invoices/", blank=True)
+
+    class Meta:
+        abstract = True
 
     def __str__(self):
         return f"Order {self.preference_id}"
 
 
-class OrderItem(models.Model):
-    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
-    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
+class Order(OrderRecord):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="orders")
+    # Hash of the cart lines and prices the preference was created for (pages.checkout), so a
+    # repeated checkout of the same cart reuses this order and its Mercado Pago init_point.
+    cart_fingerprint = models.CharField(max_length=64, blank=True)
+    init_point = models.URLField(max_length=500, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "cart_fingerprint", "status"], name="order_checkout_reuse_idx"),
+        ]
+
+
+class CheckoutClaim(models.Model):
+    """Held while one request creates the payment preference for a cart (see pages.checkout.checkout_lock).
+
+    The unique constraint turns concurrent checkouts of the same cart, on any worker, into one
+    winner and immediate losers.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    cart_fingerprint = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "cart_fingerprint"], name="unique_checkout_claim"),
+        ]
+
+
+class OrderItemRecord(models.Model):
     product_name = models.CharField(max_length=100)
     quantity = models.PositiveIntegerField()
     unit_price = models.DecimalField(max_digits=10, decimal_places=2)
 
+    class Meta:
+        abstract = True
+
     def __str__(self):
         return f"{self.product_name} ({self.quantity})"
 
     def get_total(self):
         return self.unit_price * self.quantity
+
+
+class OrderItem(OrderItemRecord):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
+
+
+class ArchivedOrder(OrderRecord):
+    """A finalized order moved out of ``Order`` by `manage.py archive_orders`; keeps its original id."""
+
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="archived_orders")
+    # Not auto_now: the archive keeps the order's own timestamps.
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at"], name="archived_order_user_idx"),
+        ]
+
+
+class ArchivedOrderItem(OrderItemRecord):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name="items")
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+
+
+class ProductSalesDay(models.Model):
+    """Units of a product sold on one day, maintained from approved orders."""
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="sales_days")
+    day = models.DateField()
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "day"], name="unique_product_sales_day"),
+        ]
+        indexes = [
+            models.Index(fields=["day", "product"], name="sales_day_product_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.day}: {self.units}"
+
+
+class SalesPeriod(models.Model):
+    """Order totals for one time bucket, refreshed by ``manage.py refresh_sales_analytics``.
+
+    Orders are bucketed by the day they were placed; revenue and units count approved orders only.
+    """
+
+    orders_pending = models.PositiveIntegerField(default=0)
+    orders_approved = models.PositiveIntegerField(default=0)
+    orders_rejected = models.PositiveIntegerField(default=0)
+    orders_cancelled = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.PositiveIntegerField(default=0)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def orders_total(self):
+        return self.orders_pending + self.orders_approved + self.orders_rejected + self.orders_cancelled
+
+    @property
+    def average_order_value(self):
+        return self.revenue / self.orders_approved if self.orders_approved else 0
+
+
+class SalesDay(SalesPeriod):
+    day = models.DateField(unique=True)
+
+    def __str__(self):
+        return str(self.day)
+
+
+class SalesMonth(SalesPeriod):
+    month = models.DateField(unique=True, help_text=_("First day of the month."))
+
+    def __str__(self):
+        return self.month.strftime("%Y-%m")
+
+
+class RollupCheckpoint(models.Model):
+    """High-water mark of the source rows an incremental batch job has already processed."""
+
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class ProductRecommendation(models.Model):
+    """One of the top-k products most often bought together with ``product``."""
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="recommendations")
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    rank = models.PositiveSmallIntegerField()
+    score = models.PositiveIntegerField(help_text=_("Number of approved orders containing both products."))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "rank"], name="unique_product_recommendation_rank"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.related_id} (#{self.rank})"
+
+
+class ProductChange(models.Model):
+    """Append-only log of product writes; its auto-increment id is the inventory change-feed cursor."""
+
+    # Plain integer rather than a foreign key so the entry outlives the product it records.
+    product_id = models.BigIntegerField(db_index=True)
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"#{self.pk} product {self.product_id}{' (deleted)' if self.deleted else ''}"
+
+
+class PartnerFeed(models.Model):
+    """A partner inventory endpoint whose stock and prices `manage.py ingest_partner_feeds` applies."""
+
+    class MatchOn(models.TextChoices):
+        ID = "id", _("Product id")
+        NAME = "name", _("Product name")
+
+    class Status(models.TextChoices):
+        NEVER = "never", _("Never run")
+        OK = "ok", _("OK")
+        FAILED = "failed", _("Failed")
+
+    name = models.CharField(max_length=100, unique=True)
+    url = models.URLField(max_length=500)
+    match_on = models.CharField(max_length=10, choices=MatchOn.choices, default=MatchOn.ID)
+    enabled = models.BooleanField(default=True)
+    interval_minutes = models.PositiveIntegerField(default=60)
+    timeout_seconds = models.PositiveSmallIntegerField(default=30, help_text=_("Limit for the whole download."))
+    max_bytes = models.PositiveIntegerField(default=50 * 1024 * 1024)
+
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    last_status = models.CharField(max_length=10, choices=Status.choices, default=Status.NEVER)
+    last_error = models.TextField(blank=True)
+    last_duration_ms = models.PositiveIntegerField(null=True, blank=True)
+    items_seen = models.PositiveIntegerField(default=0)
+    products_updated = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
+
+
+class Task(models.Model):
+    """Background work queued by a view and run by `manage.py run_worker` (see pages.tasks)."""
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", _("Queued")
+        RUNNING = "running", _("Running")
+        DONE = "done", _("Done")
+        FAILED = "failed", _("Failed")
+
+    # Dotted path of a function decorated with pages.tasks.task.
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    # Lease held by the worker running the task; once it expires another worker may take the task.
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    # Correlation id of the request that queued the task, so its logs line up with the request's.
+    correlation_id = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Set explicitly in queryset.update() calls, like Product.updated_at.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Serves the workers' "due tasks" claim query.
+            models.Index(fields=["status", "run_at"], name="task_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class RequestProfile(models.Model):
+    """One profiled request (pages.profiling); ``folded`` loads directly into flamegraph.pl or speedscope."""
+
+    class Trigger(models.TextChoices):
+        HEADER = "header", _("Requested by staff")
+        SAMPLED = "sampled", _("Sampled")
+
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    view_name = models.CharField(max_length=200, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    trigger = models.CharField(max_length=10, choices=Trigger.choices)
+    correlation_id = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    duration_ms = models.FloatField()
+    sample_interval_ms = models.FloatField()
+    sample_count = models.PositiveIntegerField()
+    sql_count = models.PositiveIntegerField()
+    sql_ms = models.FloatField()
+    template_ms = models.FloatField()
+    # "frame;frame;frame count" lines, one per distinct stack.
+    folded = models.TextField(blank=True)
+    queries = models.JSONField(default=list, blank=True)
+    templates = models.JSONField(default=list, blank=True)
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
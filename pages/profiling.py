@@ -0,0 +1,146 @@
+"""On-demand statistical profiling of live requests.
+
+A profiled request runs with a sampler thread that reads the request thread's stack every
+``PROFILE_INTERVAL_MS`` (``sys._current_frames``) and counts identical stacks, giving
+"folded" output (``frame;frame;frame count`` per line) that flamegraph.pl and speedscope load
+as is. SQL statements are timed with a connection ``execute_wrapper`` and template renders
+through a hook on ``Template.render``. Requests that are not profiled only pay for one
+context-variable lookup per template render.
+"""
+import contextvars
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+_active_profile = contextvars.ContextVar("request_profile", default=None)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class StackSampler:
+    """Counts the stacks of one thread, sampled from a background thread, below ``root_code``."""
+
+    def __init__(self, thread_id, interval, root_code=None):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.root_code = root_code
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame.f_code is not self.root_code:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def folded(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+class Profiler:
+    def __init__(self, interval, max_queries):
+        self.interval = interval
+        self.max_queries = max_queries
+        self.queries = []
+        self.query_count = 0
+        self.sql_seconds = 0.0
+        self.templates = []
+        self.template_seconds = 0.0
+        self._template_depth = 0
+        self.sampler = None
+        self.duration = 0.0
+
+    def _time_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.query_count += 1
+            self.sql_seconds += elapsed
+            if len(self.queries) < self.max_queries:
+                self.queries.append({"sql": sql[:2000], "ms": round(elapsed * 1000, 3), "many": many})
+
+    def time_template(self, render, template, context):
+        # Only outermost renders are timed; {% include %}d templates are part of their parent's time.
+        self._template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(template, context)
+        finally:
+            self._template_depth -= 1
+            if not self._template_depth:
+                elapsed = time.perf_counter() - started
+                self.template_seconds += elapsed
+                name = template.origin.template_name or "<string>"
+                self.templates.append({"template": name, "ms": round(elapsed * 1000, 3)})
+
+    def run(self, func, *args):
+        """Call ``func(*args)`` under the profiler and return its result."""
+        token = _active_profile.set(self)
+        self.sampler = StackSampler(threading.get_ident(), self.interval, root_code=sys._getframe().f_code)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(self._time_query))
+                self.sampler.start()
+                try:
+                    return func(*args)
+                finally:
+                    self.sampler.stop()
+        finally:
+            self.duration = time.perf_counter() - started
+            _active_profile.reset(token)
+
+
+def install_template_timer():
+    """Route ``Template.render`` through the active profile, if any; safe to call more than once."""
+    from django.template.base import Template
+
+    if getattr(Template.render, "profiled", False):
+        return
+    render = Template.render
+
+    def profiled_render(self, context):
+        profile = _active_profile.get()
+        if profile is None:
+            return render(self, context)
+        return profile.time_template(render, self, context)
+
+    profiled_render.profiled = True
+    Template.render = profiled_render
+
+
+def new_profiler():
+    return Profiler(settings.PROFILE_INTERVAL_MS / 1000, settings.PROFILE_MAX_QUERIES)
+
+
+def hot_frames(folded, limit=15):
+    """``[(frame, samples)]`` for the frames that were on top of the stack most often."""
+    leaves = Counter()
+    for line in folded.splitlines():
+        stack, _, count = line.rpartition(" ")
+        if stack and count.isdigit():
+            leaves[stack.rpartition(";")[2]] += int(count)
+    return leaves.most_common(limit)
@@ -0,0 +1,189 @@
+""""Customers also bought" recommendations built from approved-order co-purchases.
+
+The co-purchase matrix ``C = XᵀX`` (``X`` being the binary orders × products incidence matrix)
+is kept in default storage between runs, so an incremental build only reads order lines
+approved since the previous run and recomputes the top-k lists of the products they touch.
+"""
+import io
+import json
+from array import array
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .archive import ORDER_SOURCES
+from .cache import bump_namespace
+from .models import Order, OrderItem, Product, ProductRecommendation, RollupCheckpoint
+
+RECOMMENDATIONS_NAMESPACE = "recommendations"
+CHECKPOINT_NAME = "recommendations"
+MATRIX_NAME = "recommendations/copurchase.npz"
+# Ids of the orders already counted near the checkpoint, so the overlap is not counted twice.
+COUNTED_NAME = "recommendations/counted-orders.json"
+# Like the sales rollups, each run re-reads this much before the checkpoint: an order whose
+# approved_at was set before a run started can commit after that run read the table.
+CHECKPOINT_OVERLAP = timedelta(minutes=5)
+
+
+def cooccurrence_matrix(order_keys, product_ids, size):
+    """Sparse ``size`` × ``size`` matrix counting the orders that contain each pair of products."""
+    import numpy as np
+    from scipy import sparse
+
+    order_keys = np.asarray(order_keys, dtype=np.int64)
+    product_ids = np.asarray(product_ids, dtype=np.int64)
+    if not len(order_keys):
+        return sparse.csr_matrix((size, size), dtype=np.int32)
+    _, order_index = np.unique(order_keys, return_inverse=True)
+    incidence = sparse.csr_matrix(
+        (np.ones(len(product_ids), dtype=np.int32), (order_index, product_ids)),
+        shape=(int(order_index.max()) + 1, size),
+    )
+    # Two lines of the same product in one order still count as one purchase of it.
+    incidence.data[:] = 1
+    cooccurrence = (incidence.T @ incidence).tocsr()
+    cooccurrence.setdiag(0)
+    cooccurrence.eliminate_zeros()
+    return cooccurrence
+
+
+def top_related(cooccurrence, rows, k):
+    """Yield ``(row, [(related_id, score), ...])`` with the ``k`` highest-scoring partners per row."""
+    import numpy as np
+
+    for row in rows:
+        start, end = cooccurrence.indptr[row], cooccurrence.indptr[row + 1]
+        indices = cooccurrence.indices[start:end]
+        scores = cooccurrence.data[start:end]
+        if len(scores) > k:
+            keep = np.argpartition(-scores, k)[:k]
+            indices, scores = indices[keep], scores[keep]
+        ranked = np.lexsort((indices, -scores))
+        yield row, list(zip(indices[ranked].tolist(), scores[ranked].tolist()))
+
+
+def _load_matrix():
+    from scipy import sparse
+
+    if not default_storage.exists(MATRIX_NAME):
+        return None
+    with default_storage.open(MATRIX_NAME, "rb") as stored:
+        return sparse.load_npz(io.BytesIO(stored.read())).tocsr()
+
+
+def _save_matrix(matrix):
+    from scipy import sparse
+
+    buffer = io.BytesIO()
+    sparse.save_npz(buffer, matrix)
+    if default_storage.exists(MATRIX_NAME):
+        default_storage.delete(MATRIX_NAME)
+    default_storage.save(MATRIX_NAME, ContentFile(buffer.getvalue()))
+
+
+def _load_counted():
+    if not default_storage.exists(COUNTED_NAME):
+        return set()
+    with default_storage.open(COUNTED_NAME, "rb") as stored:
+        return set(json.load(stored))
+
+
+def _save_counted(order_ids):
+    if default_storage.exists(COUNTED_NAME):
+        default_storage.delete(COUNTED_NAME)
+    default_storage.save(COUNTED_NAME, ContentFile(json.dumps(sorted(order_ids)).encode()))
+
+
+def _order_lines(approved_until, approved_after=None, counted=(), recent_after=None, chunk_size=10000):
+    """Lines of orders approved in ``(approved_after, approved_until]`` that are not in ``counted``.
+
+    Also returns the ids of the orders in the window approved after ``recent_after``, which the
+    next run's overlap will read again.
+    """
+    order_keys, product_ids = array("q"), array("q")
+    recent = set()
+    if approved_after is None:
+        item_models = [item_model for _order_model, item_model in ORDER_SOURCES]
+    else:
+        # Archived orders were approved long before any checkpoint; only live lines can be new.
+        item_models = [OrderItem]
+    for item_model in item_models:
+        lines = item_model.objects.filter(order__status=Order.Status.APPROVED, product__isnull=False).exclude(
+            order__approved_at__gt=approved_until
+        )
+        if approved_after is not None:
+            lines = lines.filter(order__approved_at__gt=approved_after)
+        rows = lines.values_list("order_id", "product_id", "order__approved_at").iterator(chunk_size=chunk_size)
+        for order_id, product_id, approved_at in rows:
+            if approved_at is not None and approved_at > recent_after:
+                recent.add(order_id)
+            if order_id in counted:
+                continue
+            order_keys.append(order_id)
+            product_ids.append(product_id)
+    return order_keys, product_ids, recent
+
+
+def build_recommendations(full=False, k=None):
+    """Rebuild (or incrementally update) ProductRecommendation; returns the number of products refreshed."""
+    k = k or settings.RECOMMENDATIONS_PER_PRODUCT
+    started = timezone.now()
+    checkpoint = None if full else RollupCheckpoint.objects.filter(name=CHECKPOINT_NAME).first()
+    stored = _load_matrix() if checkpoint else None
+    incremental = stored is not None
+
+    # Orders approved after `started` are left to the next run, whose window starts there.
+    order_keys, product_ids, recent = _order_lines(
+        started,
+        checkpoint.value - CHECKPOINT_OVERLAP if incremental else None,
+        counted=_load_counted() if incremental else set(),
+        recent_after=started - CHECKPOINT_OVERLAP,
+    )
+    size = max(
+        stored.shape[0] if incremental else 0,
+        (max(product_ids) + 1) if product_ids else 0,
+    )
+    delta = cooccurrence_matrix(order_keys, product_ids, size)
+    if incremental:
+        stored.resize((size, size))
+        matrix = (stored + delta).tocsr()
+        rows = sorted(set(product_ids))
+    else:
+        matrix = delta
+        rows = range(size)
+
+    existing = set(Product.objects.values_list("id", flat=True))
+    recommendations = []
+    refreshed = []
+    for row, related in top_related(matrix, rows, k * 2):
+        if row not in existing:
+            continue
+        refreshed.append(row)
+        related = [(related_id, score) for related_id, score in related if related_id in existing][:k]
+        recommendations.extend(
+            ProductRecommendation(product_id=row, related_id=related_id, rank=rank, score=score)
+            for rank, (related_id, score) in enumerate(related, start=1)
+        )
+
+    with transaction.atomic():
+        stale = ProductRecommendation.objects.all() if not incremental else ProductRecommendation.objects.filter(
+            product_id__in=refreshed
+        )
+        stale.delete()
+        ProductRecommendation.objects.bulk_create(recommendations, batch_size=5000)
+        RollupCheckpoint.objects.update_or_create(name=CHECKPOINT_NAME, defaults={"value": started})
+    _save_matrix(matrix)
+    _save_counted(recent)
+    bump_namespace(RECOMMENDATIONS_NAMESPACE)
+    return len(refreshed)
+
+
+def related_product_ids(product_id):
+    # Served by the (product, rank) unique index.
+    return list(
+        ProductRecommendation.objects.filter(product_id=product_id).order_by("rank").values_list("related_id", flat=True)
+    )
@@ -0,0 +1,65 @@
+"""Inventory PDF, built by the task worker and kept in default storage for the admin to download."""
+import io
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from .models import Product
+from .tasks import task
+
+INVENTORY_REPORT_NAME = "reports/inventory.pdf"
+
+
+def render_inventory_pdf():
+    # reportlab is imported on first use, like the invoices.
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+
+    pdf.setFont("Helvetica-Bold", 16)
+    pdf.drawString(72, height - 72, _("Inventory report"))
+    pdf.setFont("Helvetica", 10)
+    generated_at = timezone.localtime().strftime("%Y-%m-%d %H:%M")
+    pdf.drawString(72, height - 90, f"{_('Generated on')}: {generated_at}")
+
+    pdf.setFont("Helvetica-Bold", 12)
+    pdf.drawString(72, height - 120, _("Product"))
+    pdf.drawString(320, height - 120, _("Stock"))
+
+    y_position = height - 140
+    pdf.setFont("Helvetica", 11)
+
+    products = Product.objects.order_by("name").values_list("name", "stock")
+
+    # One streamed pass over the table; an empty catalog is noticed when nothing was drawn.
+    drawn = False
+    for name, stock in products.iterator(chunk_size=2000):
+        drawn = True
+        pdf.drawString(72, y_position, name)
+        pdf.drawRightString(400, y_position, str(stock))
+        y_position -= 18
+        if y_position < 72:
+            pdf.showPage()
+            pdf.setFont("Helvetica-Bold", 12)
+            pdf.drawString(72, height - 72, _("Product"))
+            pdf.drawString(320, height - 72, _("Stock"))
+            pdf.setFont("Helvetica", 11)
+            y_position = height - 90
+    if not drawn:
+        pdf.drawString(72, y_position, _("No products available."))
+
+    pdf.save()
+    return buffer.getvalue()
+
+
+@task()
+def build_inventory_report():
+    content = render_inventory_pdf()
+    if default_storage.exists(INVENTORY_REPORT_NAME):
+        default_storage.delete(INVENTORY_REPORT_NAME)
+    default_storage.save(INVENTORY_REPORT_NAME, ContentFile(content))
@@ -0,0 +1,90 @@
+"""Best-seller counters and daily per-product rollups, maintained from approved orders."""
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, Sum, Value, When
+from django.utils import timezone
+
+from .cache import bump_namespace, get_or_compute
+from .models import Order, OrderItem, Product, ProductSalesDay
+
+SALES_NAMESPACE = "sales"
+
+
+def units_case(values_by_key, field="pk", default=0):
+    """``CASE`` expression mapping each key to its value, for one set-based ``UPDATE``."""
+    return Case(
+        *(When(**{field: key}, then=Value(value)) for key, value in values_by_key.items()),
+        default=Value(default),
+    )
+
+
+def apply_sales(units_by_product, day, revenue_by_product=None):
+    """Add sales to the all-time counters and to ``day``'s rollup in three statements, however many products."""
+    if not units_by_product:
+        return
+    revenue_by_product = revenue_by_product or {}
+    with transaction.atomic():
+        Product.objects.filter(pk__in=units_by_product).update(
+            cantidad_vendidos=F("cantidad_vendidos") + units_case(units_by_product),
+        )
+        ProductSalesDay.objects.bulk_create(
+            [ProductSalesDay(product_id=product_id, day=day) for product_id in units_by_product],
+            ignore_conflicts=True,
+        )
+        ProductSalesDay.objects.filter(day=day, product_id__in=units_by_product).update(
+            units=F("units") + units_case(units_by_product, "product_id"),
+            revenue=F("revenue") + units_case(
+                {product_id: revenue_by_product.get(product_id, Decimal("0")) for product_id in units_by_product},
+                "product_id",
+                default=Decimal("0"),
+            ),
+        )
+    # Rankings are read through the sales namespace, not the catalog snapshot: a sale must not
+    # invalidate every worker's snapshot and every product ETag.
+    bump_namespace(SALES_NAMESPACE)
+
+
+def record_order_sales(order):
+    """Count an approved order's units exactly once; returns False if it was already counted."""
+    now = timezone.now()
+    with transaction.atomic():
+        claimed = Order.objects.filter(pk=order.pk, sales_recorded=False).update(sales_recorded=True, approved_at=now)
+        if not claimed:
+            return False
+        units = Counter()
+        revenue = Counter()
+        for product_id, quantity, unit_price in OrderItem.objects.filter(order=order, product__isnull=False).values_list(
+            "product_id", "quantity", "unit_price"
+        ):
+            units[product_id] += quantity
+            revenue[product_id] += quantity * unit_price
+        apply_sales(units, timezone.localdate(now), revenue)
+    order.sales_recorded = True
+    order.approved_at = now
+    return True
+
+
+def best_sellers(days=None, limit=10):
+    """Top ``limit`` ``(product_id, units)`` pairs, all-time or over the trailing ``days`` days."""
+    today = timezone.localdate()
+
+    def compute():
+        if days is None:
+            # Served by the index on cantidad_vendidos.
+            return list(
+                Product.objects.filter(cantidad_vendidos__gt=0)
+                .order_by("-cantidad_vendidos", "id")
+                .values_list("id", "cantidad_vendidos")[:limit]
+            )
+        return list(
+            ProductSalesDay.objects.filter(day__gt=today - timedelta(days=days))
+            .values("product_id")
+            .annotate(total=Sum("units"))
+            .order_by("-total", "product_id")
+            .values_list("product_id", "total")[:limit]
+        )
+
+    return get_or_compute(f"best:{days or 'all'}:{limit}:{today}", compute, namespace=SALES_NAMESPACE)
@@ -0,0 +1,24 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalog import bump_catalog_version
+from .changefeed import record_product_changes
+from .guest_cart import merge_guest_cart, read_guest_cart
+from .models import Product
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, signal, **kwargs):
+    record_product_changes([instance.pk], deleted=signal is post_delete)
+    bump_catalog_version()
+
+
+@receiver(user_logged_in)
+def merge_guest_cart_on_login(sender, request, user, **kwargs):
+    items = read_guest_cart(request)
+    if items:
+        merge_guest_cart(user, items)
+        # GuestCartMiddleware drops the cookie on the way out so the cart is not merged twice.
+        request.guest_cart_merged = True
@@ -0,0 +1,209 @@
+"""Database-backed background tasks, run by ``manage.py run_worker``.
+
+Views call ``enqueue(func, *args, **kwargs)`` and return. The row is written in the caller's
+transaction, so work that was rolled back is never run. Workers claim due tasks in batches
+with ``SELECT ... FOR UPDATE SKIP LOCKED`` where the database supports it; elsewhere (SQLite)
+a single conditional ``UPDATE`` takes the lease. A claimed task is leased for
+``TASK_LEASE_SECONDS``: if its worker dies, another one picks it up once the lease runs out.
+Failures are retried with exponential backoff up to the task's ``max_attempts``.
+"""
+import logging
+import os
+import random
+import socket
+import time
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q, Subquery
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .logs import bind_correlation_id, get_correlation_id, new_correlation_id
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+
+def task(max_attempts=None):
+    """Mark a module-level function as runnable by the worker."""
+    def decorator(func):
+        if "<locals>" in func.__qualname__:
+            raise ValueError(f"{func.__qualname__} must be defined at module level to be a task.")
+        func.task_name = f"{func.__module__}.{func.__qualname__}"
+        func.task_max_attempts = max_attempts
+        return func
+    return decorator
+
+
+def enqueue(func, *args, run_at=None, **kwargs):
+    """Queue ``func(*args, **kwargs)`` to run now or at ``run_at``; arguments must be JSON-serializable."""
+    name = getattr(func, "task_name", None)
+    if name is None:
+        raise ValueError(f"{func!r} is not a task; decorate it with @task().")
+    return Task.objects.create(
+        name=name,
+        args=list(args),
+        kwargs=kwargs,
+        run_at=run_at or timezone.now(),
+        max_attempts=func.task_max_attempts or settings.TASK_MAX_ATTEMPTS,
+        correlation_id=get_correlation_id() or "",
+    )
+
+
+def is_pending(func):
+    return Task.objects.filter(name=func.task_name, status__in=[Task.Status.QUEUED, Task.Status.RUNNING]).exists()
+
+
+def retry_delay(attempt):
+    """Seconds before retry ``attempt`` + 1: exponential, capped, with jitter so failures don't retry in lockstep."""
+    delay = min(settings.TASK_RETRY_BASE_SECONDS * 2 ** (attempt - 1), settings.TASK_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _due(now):
+    # Queued and due, or running under a lease that expired (its worker died or hung).
+    return Q(status=Task.Status.QUEUED, run_at__lte=now) | Q(status=Task.Status.RUNNING, locked_until__lt=now)
+
+
+def claim_tasks(worker_id, limit=1):
+    """Lease up to ``limit`` due tasks to ``worker_id`` and return them, oldest first."""
+    now = timezone.now()
+    locked_until = now + timedelta(seconds=settings.TASK_LEASE_SECONDS)
+    lease = {
+        "status": Task.Status.RUNNING,
+        "locked_by": worker_id,
+        "locked_until": locked_until,
+        "attempts": F("attempts") + 1,
+        "updated_at": now,
+    }
+    due = Task.objects.filter(_due(now)).order_by("run_at", "id")
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            # Rows another worker is claiming right now are skipped instead of waited on.
+            ids = list(due.select_for_update(skip_locked=True).values_list("id", flat=True)[:limit])
+            Task.objects.filter(pk__in=ids).update(**lease)
+    else:
+        # One UPDATE, so the database's write lock makes choosing and leasing a single step.
+        # The due condition is checked again on the rows themselves.
+        Task.objects.filter(_due(now), pk__in=Subquery(due.values("id")[:limit])).update(**lease)
+    return list(
+        Task.objects.filter(locked_by=worker_id, locked_until=locked_until, status=Task.Status.RUNNING).order_by(
+            "run_at", "id"
+        )
+    )
+
+
+def _held(task, worker_id):
+    return Task.objects.filter(pk=task.pk, locked_by=worker_id, status=Task.Status.RUNNING)
+
+
+def _resolve(name):
+    func = import_string(name)
+    if getattr(func, "task_name", None) != name:
+        raise ImportError(f"{name} is not a task.")
+    return func
+
+
+def run_task(task, worker_id):
+    """Run a claimed task and record the outcome; returns whether it succeeded."""
+    with bind_correlation_id(task.correlation_id or new_correlation_id()):
+        return _run_task(task, worker_id)
+
+
+def _run_task(task, worker_id):
+    started = time.monotonic()
+    details = {"task_id": task.pk, "task": task.name, "attempt": task.attempts}
+    try:
+        func = _resolve(task.name)
+    except ImportError as exc:
+        # Retrying cannot make an unknown name (or a function that is not a task) runnable.
+        _held(task, worker_id).update(
+            status=Task.Status.FAILED, locked_by="", locked_until=None, last_error=str(exc), updated_at=timezone.now()
+        )
+        logger.error("task failed", extra=details, exc_info=True)
+        return False
+    try:
+        func(*task.args, **task.kwargs)
+    except Exception as exc:
+        now = timezone.now()
+        error = "".join(traceback.format_exception(exc))[-4000:]
+        details["duration_ms"] = int((time.monotonic() - started) * 1000)
+        if task.attempts >= task.max_attempts:
+            _held(task, worker_id).update(
+                status=Task.Status.FAILED, locked_by="", locked_until=None, last_error=error, updated_at=now
+            )
+            logger.error("task failed", extra=details, exc_info=True)
+        else:
+            retry_at = now + timedelta(seconds=retry_delay(task.attempts))
+            _held(task, worker_id).update(
+                status=Task.Status.QUEUED, run_at=retry_at, locked_by="", locked_until=None, last_error=error, updated_at=now
+            )
+            logger.warning("task will be retried", extra={**details, "retry_at": retry_at}, exc_info=True)
+        return False
+    _held(task, worker_id).update(
+        status=Task.Status.DONE, locked_by="", locked_until=None, last_error="", updated_at=timezone.now()
+    )
+    details["duration_ms"] = int((time.monotonic() - started) * 1000)
+    logger.info("task done", extra=details)
+    return True
+
+
+def release_task(task, worker_id):
+    """Hand a claimed but unstarted task back to the queue (the worker is shutting down)."""
+    _held(task, worker_id).update(
+        status=Task.Status.QUEUED, locked_by="", locked_until=None, attempts=F("attempts") - 1, updated_at=timezone.now()
+    )
+
+
+def purge_finished_tasks(days=None):
+    """Delete tasks that succeeded more than ``days`` ago; failed ones are kept for inspection."""
+    cutoff = timezone.now() - timedelta(days=days if days is not None else settings.TASK_KEEP_DONE_DAYS)
+    deleted, _ = Task.objects.filter(status=Task.Status.DONE, updated_at__lt=cutoff).delete()
+    return deleted
+
+
+class Worker:
+    PURGE_INTERVAL = 3600
+
+    def __init__(self, batch_size=10, poll_interval=1.0):
+        self.id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.stopping = False
+        self._purged_at = None
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def run(self, once=False):
+        """Run due tasks until stopped, or until none are due when ``once``; returns how many ran."""
+        ran = 0
+        while not self.stopping:
+            tasks = claim_tasks(self.id, self.batch_size)
+            if not tasks:
+                if once:
+                    break
+                self._purge_if_due()
+                time.sleep(self.poll_interval)
+                continue
+            for task in tasks:
+                if self.stopping:
+                    release_task(task, self.id)
+                    continue
+                run_task(task, self.id)
+                ran += 1
+        return ran
+
+    def _purge_if_due(self):
+        if self._purged_at is None or time.monotonic() - self._purged_at > self.PURGE_INTERVAL:
+            self._purged_at = time.monotonic()
+            purge_finished_tasks()
+
+
+def run_pending_tasks():
+    """Run every task that is due right now in this process; returns how many ran."""
+    return Worker().run(once=True)
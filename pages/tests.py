@@ -1,11 +1,59 @@
+import io
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from decimal import Decimal
+from io import StringIO
+from pathlib import Path
 from unittest.mock import Mock, patch
 
+from django.conf import settings
+from django.contrib import messages
 from django.contrib.auth import get_user_model
-from django.test import TestCase, override_settings
-from django.urls import reverse
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from django.utils import timezone
 
-from .models import Cart, CartItem, Order, OrderItem, Product
+from .analytics import refresh_sales_analytics
+from .archive import archive_batch, archive_cutoff, archive_orders
+from .cache import CATALOG_NAMESPACE, bump_namespace, cache_stats, get_or_compute, reset_cache_stats, versioned_key
+from .cache_server import CacheServer, CommandError, encode, read_value
+from .benchmarks import BASELINE_PATH, BENCHMARKS, find_regressions, run_benchmarks
+from .catalog import get_catalog, reset_catalog
+from .changefeed import compact_product_changes
+from .checkout import cart_fingerprint, checkout_lock
+from .feeds import FeedError, ingest_feeds, iter_json_items
+from .guest_cart import GUEST_CART_COOKIE, read_guest_cart
+from .invoices import render_invoice_pdf
+from .logs import BackgroundQueueHandler, CorrelationIdFilter, JsonFormatter, SamplingFilter, get_correlation_id
+from .management.commands.boot import static_fingerprint
+from .management.commands.profile_imports import parse_importtime, summarize_importtime
+from .models import ArchivedOrder, ArchivedOrderItem, Cart, CartItem, CheckoutClaim, Order, OrderItem, PartnerFeed, Product, ProductChange, ProductRecommendation, ProductSalesDay, SalesDay, SalesMonth, RequestProfile, Task
+from .recommendations import build_recommendations
+from .sales import best_sellers, record_order_sales
+from .tasks import claim_tasks, enqueue, run_pending_tasks, run_task, task
+from .profiling import StackSampler, hot_frames
+from .reports import INVENTORY_REPORT_NAME, render_inventory_pdf
+from .throttle import take_token
+from .typeahead import get_typeahead, normalize
+from .views import _catalog_etag, _product_etag
 
 
 class ProductModelTests(TestCase):
@@ -119,3 +167,1510 @@ class MercadoPagoCheckoutTests(TestCase):
 		self.assertEqual(order.status, Order.Status.APPROVED)
 		self.assertEqual(order.payment_id, "PAY-1")
 		self.assertEqual(CartItem.objects.filter(cart=cart).count(), 0)
+
+	@override_settings(MERCADOPAGO_ACCESS_TOKEN="TEST-TOKEN")
+	@patch("pages.views._get_mercadopago_client")
+	def test_failed_payment_lookup_is_retried_by_the_worker(self, mock_client_factory):
+		order = Order.objects.create(user=self.user, preference_id="PREF-3", total=Decimal("150000.00"))
+		lookup = mock_client_factory.return_value.payment.return_value.get
+		lookup.side_effect = ConnectionError("timeout")
+
+		response = self.client.get(reverse("payment_success"), {"preference_id": "PREF-3", "payment_id": "PAY-3"})
+
+		self.assertEqual(response.status_code, 200)
+		order.refresh_from_db()
+		self.assertEqual(order.status, Order.Status.PENDING)
+		lookup.side_effect = None
+		lookup.return_value = {"response": {"status": "approved", "id": "PAY-3", "status_detail": "accredited"}}
+		self.assertEqual(run_pending_tasks(), 1)
+		order.refresh_from_db()
+		self.assertEqual(order.status, Order.Status.APPROVED)
+
+
+class StartupImportTests(TestCase):
+	def test_heavy_dependencies_are_not_imported_at_startup(self):
+		snippet = (
+			"import sys, django; django.setup(); import pages.admin, pages.views; "
+			"print(sorted(m for m in ('reportlab', 'mercadopago') if m in sys.modules))"
+		)
+		result = subprocess.run(
+			[sys.executable, "-c", snippet],
+			cwd=settings.BASE_DIR,
+			capture_output=True,
+			text=True,
+			check=True,
+		)
+
+		self.assertEqual(result.stdout.strip(), "[]")
+
+	def test_parse_importtime_tracks_depth_and_totals(self):
+		lines = [
+			"import time: self [us] | cumulative | imported package",
+			"import time:       100 |        100 |   django.utils",
+			"import time:       400 |        500 | django",
+			"import time:       250 |        250 | pages",
+		]
+
+		rows = parse_importtime(lines)
+		report = summarize_importtime(rows)
+
+		self.assertEqual(rows[0], (100, 100, 1, "django.utils"))
+		self.assertEqual(report["total_ms"], 0.75)
+		self.assertEqual(report["packages"][0], {"package": "django", "ms": 0.5})
+
+
+class BootCommandTests(TestCase):
+	def test_boot_skips_work_when_nothing_changed(self):
+		with tempfile.TemporaryDirectory() as static_root, override_settings(STATIC_ROOT=static_root):
+			first = StringIO()
+			call_command("boot", stdout=first)
+			second = StringIO()
+			call_command("boot", stdout=second)
+
+		self.assertIn("Migrations: up to date", first.getvalue())
+		self.assertIn("Static files: sources changed, collecting.", first.getvalue())
+		self.assertIn("Static files: up to date", second.getvalue())
+
+	def test_static_fingerprint_follows_contents_not_mtimes(self):
+		with tempfile.TemporaryDirectory() as source, override_settings(STATICFILES_DIRS=[source]):
+			asset = Path(source) / "site.css"
+			asset.write_text("body {}")
+			before = static_fingerprint()
+			os.utime(asset, (0, 0))
+			self.assertEqual(static_fingerprint(), before)
+			asset.write_text("body { margin: 0 }")
+			self.assertNotEqual(static_fingerprint(), before)
+
+	def test_healthz_does_not_query_the_database(self):
+		with self.assertNumQueries(0):
+			response = self.client.get(reverse("healthz"))
+
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.content, b"ok")
+
+
+class PurgeSessionsCommandTests(TestCase):
+	def test_purges_only_expired_sessions_in_batches(self):
+		now = timezone.now()
+		for index in range(5):
+			Session.objects.create(session_key=f"expired{index}", session_data="", expire_date=now - timedelta(days=1))
+		Session.objects.create(session_key="active", session_data="", expire_date=now + timedelta(days=1))
+
+		out = StringIO()
+		call_command("purge_sessions", batch_size=2, stdout=out)
+
+		self.assertEqual(list(Session.objects.values_list("session_key", flat=True)), ["active"])
+		self.assertIn("Deleted 5 expired session(s) in 3 batch(es).", out.getvalue())
+
+	@override_settings(SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies")
+	def test_cookie_sessions_have_nothing_to_purge(self):
+		out = StringIO()
+		call_command("purge_sessions", stdout=out)
+
+		self.assertIn("nothing to purge", out.getvalue())
+
+
+class CacheLayerTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		reset_cache_stats()
+
+	def test_get_or_compute_caches_and_counts_hits(self):
+		compute = Mock(return_value=42)
+
+		first = get_or_compute("answer", compute, namespace=CATALOG_NAMESPACE)
+		second = get_or_compute("answer", compute, namespace=CATALOG_NAMESPACE)
+
+		self.assertEqual((first, second), (42, 42))
+		compute.assert_called_once()
+		stats = cache_stats()[CATALOG_NAMESPACE]
+		self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+	def test_bumping_namespace_invalidates_its_keys(self):
+		old_key = versioned_key(CATALOG_NAMESPACE, "products")
+		get_or_compute("products", lambda: "old", namespace=CATALOG_NAMESPACE)
+
+		bump_namespace(CATALOG_NAMESPACE)
+
+		self.assertNotEqual(versioned_key(CATALOG_NAMESPACE, "products"), old_key)
+		self.assertEqual(get_or_compute("products", lambda: "new", namespace=CATALOG_NAMESPACE), "new")
+
+	def test_waits_for_lock_holder_instead_of_recomputing(self):
+		full_key = versioned_key(CATALOG_NAMESPACE, "busy")
+		cache.add(f"lock:{full_key}", 1)
+		compute = Mock(return_value="fallback")
+
+		with patch("pages.cache.time.sleep", side_effect=lambda _: cache.set(full_key, ("shared", 0.1, float("inf")))):
+			value = get_or_compute("busy", compute, namespace=CATALOG_NAMESPACE)
+
+		self.assertEqual(value, "shared")
+		compute.assert_not_called()
+
+	def test_serves_the_previous_value_while_another_worker_recomputes(self):
+		get_or_compute("busy", lambda: "old", namespace=CATALOG_NAMESPACE)
+		bump_namespace(CATALOG_NAMESPACE)
+		cache.add(f"lock:{versioned_key(CATALOG_NAMESPACE, 'busy')}", 1)
+		compute = Mock(return_value="new")
+
+		with patch("pages.cache.time.sleep") as sleep:
+			value = get_or_compute("busy", compute, namespace=CATALOG_NAMESPACE)
+
+		self.assertEqual(value, "old")
+		compute.assert_not_called()
+		sleep.assert_not_called()
+		self.assertEqual(cache_stats()[CATALOG_NAMESPACE]["stale_hits"], 1)
+
+	def test_computes_after_a_short_wait_when_the_lock_holder_is_slow(self):
+		cache.add(f"lock:{versioned_key(CATALOG_NAMESPACE, 'busy')}", 1)
+		compute = Mock(return_value="computed")
+
+		started = time.monotonic()
+		value = get_or_compute("busy", compute, namespace=CATALOG_NAMESPACE, max_wait=0.1)
+
+		self.assertEqual(value, "computed")
+		self.assertLess(time.monotonic() - started, 1)
+		self.assertEqual(cache_stats()[CATALOG_NAMESPACE]["lock_waits"], 1)
+
+	def test_works_with_file_based_backend(self):
+		location = tempfile.TemporaryDirectory()
+		self.addCleanup(location.cleanup)
+		backend = {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": location.name}
+
+		with override_settings(CACHES={"default": backend}):
+			self.assertEqual(get_or_compute("file", lambda: [1, 2]), [1, 2])
+			self.assertEqual(get_or_compute("file", lambda: [3]), [1, 2])
+
+	def test_cache_server_speaks_the_redis_protocol(self):
+		server = CacheServer(("127.0.0.1", 0))
+		threading.Thread(target=server.serve_forever, daemon=True).start()
+		self.addCleanup(server.server_close)
+		self.addCleanup(server.shutdown)
+		connection = socket.create_connection(server.server_address[:2])
+		self.addCleanup(connection.close)
+		stream = connection.makefile("rwb")
+
+		def call(*args):
+			stream.write(encode([str(arg).encode() for arg in args]))
+			stream.flush()
+			return read_value(stream)
+
+		self.assertEqual(call("SET", "k", "v", "EX", "60"), "OK")
+		self.assertIsNone(call("SET", "k", "other", "NX"))
+		self.assertEqual(call("MGET", "k", "missing"), [b"v", None])
+		self.assertEqual(call("INCRBY", "n", 5), 5)
+		self.assertEqual(call("SET", "gone", "1", "PX", "1"), "OK")
+		time.sleep(0.01)
+		self.assertEqual(call("EXISTS", "k", "gone"), 1)
+		self.assertEqual((call("MULTI"), call("MSET", "a", "1", "b", "2"), call("EXPIRE", "a", 60)), ("OK", "QUEUED", "QUEUED"))
+		self.assertEqual(call("EXEC"), ["OK", 1])
+		self.assertIsInstance(call("NOPE"), CommandError)
+		self.assertEqual(call("DEL", "a", "b", "k"), 3)
+
+	def test_works_with_the_redis_backend(self):
+		server = CacheServer(("127.0.0.1", 0))
+		threading.Thread(target=server.serve_forever, daemon=True).start()
+		self.addCleanup(server.server_close)
+		self.addCleanup(server.shutdown)
+		host, port = server.server_address[:2]
+		backend = {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": f"redis://{host}:{port}/0", "KEY_PREFIX": "valakia"}
+
+		with override_settings(CACHES={"default": backend}):
+			self.addCleanup(cache.close)
+			self.assertEqual(get_or_compute("products", lambda: [1, 2], namespace=CATALOG_NAMESPACE), [1, 2])
+			self.assertEqual(get_or_compute("products", lambda: [3], namespace=CATALOG_NAMESPACE), [1, 2])
+			bump_namespace(CATALOG_NAMESPACE)
+			self.assertEqual(get_or_compute("products", lambda: [3], namespace=CATALOG_NAMESPACE), [3])
+
+
+class CatalogSnapshotTests(TestCase):
+	def setUp(self):
+		reset_catalog()
+		self.cheap = Product.objects.create(name="Cable", price=Decimal("10.00"), stock=3, cantidad_vendidos=7)
+		self.pricey = Product.objects.create(name="Amplifier", price=Decimal("900.00"), stock=0, cantidad_vendidos=2)
+
+	def test_catalog_reads_do_not_query_the_database_once_loaded(self):
+		get_catalog()
+
+		with self.assertNumQueries(0):
+			self.client.get(reverse("products"), {"order": "price_desc"})
+			response = self.client.get(reverse("product_inventory_api"))
+		# The product page only adds the indexed recommendations lookup.
+		with self.assertNumQueries(1):
+			self.client.get(reverse("show", args=[self.cheap.pk]))
+
+		self.assertEqual([row["name"] for row in response.json()["products"]], ["Cable"])
+
+	def test_precomputed_orders(self):
+		catalog = get_catalog()
+
+		self.assertEqual([p.name for p in catalog.by_price], ["Cable", "Amplifier"])
+		self.assertEqual([p.name for p in catalog.by_name], ["Amplifier", "Cable"])
+		self.assertEqual([p.name for p in catalog.search("amp")], ["Amplifier"])
+		self.assertGreater(catalog.memory_bytes, 0)
+
+	def test_product_save_refreshes_snapshot(self):
+		before = get_catalog()
+		self.pricey.stock = 4
+		self.pricey.save()
+
+		after = get_catalog()
+
+		self.assertIsNot(before, after)
+		self.assertEqual(after.get(self.pricey.pk).stock, 4)
+
+	def test_unknown_product_returns_404(self):
+		self.assertEqual(self.client.get(reverse("show", args=["999999"])).status_code, 404)
+		self.assertEqual(self.client.get("/products/abc").status_code, 404)
+
+	@override_settings(CATALOG_SNAPSHOT_MAX_BYTES=1)
+	def test_warns_when_over_memory_budget(self):
+		with self.assertLogs("pages.catalog", level="WARNING"):
+			get_catalog()
+
+
+class GuestCartTests(TestCase):
+	def setUp(self):
+		reset_catalog()
+		self.keyboard = Product.objects.create(name="Keyboard", price=Decimal("100.00"), stock=3)
+		self.mouse = Product.objects.create(name="Mouse", price=Decimal("20.00"), stock=0)
+
+	def _add(self, product):
+		return self.client.post(reverse("add_to_cart", args=[product.pk]), HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+
+	def test_guest_cart_lives_in_cookie_without_database_rows(self):
+		self._add(self.keyboard)
+		response = self._add(self.keyboard)
+
+		self.assertEqual(response.json()["cart_count"], 2)
+		self.assertEqual(Cart.objects.count(), 0)
+		self.assertEqual(CartItem.objects.count(), 0)
+		cart_page = self.client.get(reverse("cart"))
+		self.assertEqual(cart_page.context["total"], Decimal("200.00"))
+
+	@override_settings(GUEST_CART_MAX_ITEMS=1)
+	def test_guest_cart_is_size_bounded(self):
+		self._add(self.keyboard)
+		response = self._add(self.mouse)
+
+		self.assertFalse(response.json()["success"])
+		self.assertEqual(response.json()["cart_count"], 1)
+
+	def test_tampered_cookie_is_ignored(self):
+		self._add(self.keyboard)
+		self.client.cookies[GUEST_CART_COOKIE] = self.client.cookies[GUEST_CART_COOKIE].value.replace(":1", ":9")
+
+		request = self.client.get(reverse("cart")).wsgi_request
+
+		self.assertEqual(read_guest_cart(request), {})
+
+	def test_login_merges_guest_cart_capped_by_stock(self):
+		user = get_user_model().objects.create_user(username="buyer", password="secret123")
+		cart = Cart.objects.create(user=user)
+		CartItem.objects.create(cart=cart, product=self.keyboard, quantity=2)
+		self._add(self.keyboard)
+		self._add(self.keyboard)
+		self._add(self.mouse)
+
+		response = self.client.post(reverse("login"), {"username": "buyer", "password": "secret123"})
+
+		self.assertEqual(list(CartItem.objects.filter(cart=cart).values_list("product_id", "quantity")), [(self.keyboard.pk, 3)])
+		self.assertEqual(response.cookies[GUEST_CART_COOKIE].value, "")
+
+
+class SalesRollupTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = get_user_model().objects.create_user(username="seller", password="secret123")
+		self.lamp = Product.objects.create(name="Lamp", price=Decimal("30.00"), stock=10)
+		self.desk = Product.objects.create(name="Desk", price=Decimal("300.00"), stock=10)
+
+	def _order(self, preference_id, **quantities):
+		order = Order.objects.create(user=self.user, preference_id=preference_id, total=Decimal("0"), status=Order.Status.APPROVED)
+		for product, quantity in ((self.lamp, quantities.get("lamp")), (self.desk, quantities.get("desk"))):
+			if quantity:
+				OrderItem.objects.create(order=order, product=product, product_name=product.name, quantity=quantity, unit_price=product.price)
+		return order
+
+	def test_order_sales_are_recorded_once(self):
+		order = self._order("PREF-S1", lamp=2, desk=1)
+
+		self.assertTrue(record_order_sales(order))
+		self.assertFalse(record_order_sales(order))
+
+		self.lamp.refresh_from_db()
+		self.assertEqual(self.lamp.cantidad_vendidos, 2)
+		self.assertEqual(ProductSalesDay.objects.get(product=self.desk, day=timezone.localdate()).units, 1)
+
+	def test_sales_leave_the_catalog_snapshot_alone(self):
+		reset_catalog()
+		before = get_catalog()
+		updated_at = self.lamp.updated_at
+
+		record_order_sales(self._order("PREF-S6", desk=1, lamp=2))
+
+		self.assertIs(get_catalog(), before)
+		self.lamp.refresh_from_db()
+		self.assertEqual(self.lamp.updated_at, updated_at)
+		response = self.client.get(reverse("home"))
+		self.assertEqual([p.name for p in response.context["productos_mas_vendidos"]], ["Lamp", "Desk"])
+
+	def test_callback_status_without_a_payment_does_not_approve(self):
+		order = self._order("PREF-S5", lamp=3)
+		Order.objects.filter(pk=order.pk).update(status=Order.Status.PENDING)
+		cart = Cart.objects.create(user=self.user)
+		CartItem.objects.create(cart=cart, product=self.lamp, quantity=1)
+		self.client.force_login(self.user)
+
+		response = self.client.get(reverse("payment_success"), {"preference_id": "PREF-S5", "status": "approved"})
+
+		self.assertEqual(response.context["order"].status, Order.Status.APPROVED)
+		order.refresh_from_db()
+		self.assertEqual(order.status, Order.Status.PENDING)
+		self.assertFalse(order.sales_recorded)
+		self.assertTrue(CartItem.objects.filter(cart=cart).exists())
+		self.lamp.refresh_from_db()
+		self.assertEqual(self.lamp.cantidad_vendidos, 0)
+
+	def test_best_sellers_for_all_time_and_trailing_window(self):
+		record_order_sales(self._order("PREF-S2", lamp=1, desk=3))
+		ProductSalesDay.objects.create(product=self.lamp, day=timezone.localdate() - timedelta(days=20), units=5)
+
+		self.assertEqual(best_sellers(days=7), [(self.desk.pk, 3), (self.lamp.pk, 1)])
+		self.assertEqual(best_sellers(days=30), [(self.lamp.pk, 6), (self.desk.pk, 3)])
+		self.assertEqual(best_sellers(), [(self.desk.pk, 3), (self.lamp.pk, 1)])
+
+	def test_rebuild_command_backfills_history(self):
+		self._order("PREF-S3", lamp=4)
+		self._order("PREF-S4", lamp=1, desk=2)
+
+		call_command("rebuild_sales_rollups", counters=True, stdout=StringIO())
+
+		self.assertEqual(ProductSalesDay.objects.get(product=self.lamp).units, 5)
+		self.assertEqual(Product.objects.get(pk=self.desk.pk).cantidad_vendidos, 2)
+		self.assertFalse(Order.objects.filter(sales_recorded=False).exists())
+
+
+class SalesAnalyticsTests(TestCase):
+	def setUp(self):
+		self.user = get_user_model().objects.create_superuser(username="boss", password="secret123", email="boss@example.com")
+		self.product = Product.objects.create(name="Chair", price=Decimal("50.00"), stock=10)
+
+	def _order(self, preference_id, status, quantity):
+		order = Order.objects.create(user=self.user, preference_id=preference_id, total=self.product.price * quantity, status=status)
+		OrderItem.objects.create(order=order, product=self.product, product_name="Chair", quantity=quantity, unit_price=self.product.price)
+		return order
+
+	def test_refresh_builds_day_and_month_buckets(self):
+		self._order("PREF-A1", Order.Status.APPROVED, 2)
+		self._order("PREF-A2", Order.Status.APPROVED, 4)
+		self._order("PREF-A3", Order.Status.REJECTED, 1)
+
+		self.assertEqual(refresh_sales_analytics(), (1, 1))
+
+		day = SalesDay.objects.get()
+		self.assertEqual((day.orders_approved, day.orders_rejected, day.units), (2, 1, 6))
+		self.assertEqual(day.revenue, Decimal("300.00"))
+		self.assertEqual(day.average_order_value, Decimal("150.00"))
+		self.assertEqual(SalesMonth.objects.get().revenue, Decimal("300.00"))
+
+	def test_refresh_skips_unchanged_buckets(self):
+		order = self._order("PREF-A4", Order.Status.PENDING, 1)
+		refresh_sales_analytics()
+		Order.objects.filter(pk=order.pk).update(updated_at=timezone.now() - timedelta(days=1))
+		call_command("refresh_sales_analytics", stdout=StringIO())
+		Order.objects.filter(pk=order.pk).update(status=Order.Status.APPROVED, updated_at=timezone.now() - timedelta(days=1))
+
+		self.assertEqual(refresh_sales_analytics(), (0, 0))
+		self.assertEqual(SalesDay.objects.get().orders_pending, 1)
+
+	def test_refresh_reads_only_the_changed_days(self):
+		old = self._order("PREF-A6", Order.Status.PENDING, 1)
+		middle = self._order("PREF-A7", Order.Status.APPROVED, 5)
+		for order, age in ((old, 365), (middle, 180)):
+			moment = timezone.now() - timedelta(days=age)
+			Order.objects.filter(pk=order.pk).update(created_at=moment, updated_at=moment)
+		refresh_sales_analytics()
+		Order.objects.filter(pk=old.pk).update(status=Order.Status.CANCELLED, updated_at=timezone.now())
+		self._order("PREF-A8", Order.Status.APPROVED, 2)
+
+		with CaptureQueriesContext(connection) as queries:
+			self.assertEqual(refresh_sales_analytics(), (2, 2))
+
+		# One range per changed day; the half year between them is not read.
+		scans = [query["sql"] for query in queries if "GROUP BY" in query["sql"] and '"pages_order"."created_at" >=' in query["sql"]]
+		self.assertTrue(scans)
+		self.assertTrue(all(sql.count('"pages_order"."created_at" >=') == 2 for sql in scans))
+		self.assertEqual(SalesDay.objects.get(day=timezone.localdate()).units, 2)
+		self.assertEqual(SalesDay.objects.get(orders_cancelled=1).orders_pending, 0)
+
+	def test_dashboard_reads_rollups_only(self):
+		self._order("PREF-A5", Order.Status.APPROVED, 1)
+		refresh_sales_analytics()
+		self.client.login(username="boss", password="secret123")
+
+		response = self.client.get(reverse("admin:pages_order_sales_dashboard"))
+
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(response.context["totals"]["orders_approved"], 1)
+
+
+class OrderExportTests(TestCase):
+	def setUp(self):
+		self.user = get_user_model().objects.create_superuser(username="finance", password="secret123", email="f@example.com")
+		product = Product.objects.create(name="Sofa", price=Decimal("700.00"), stock=2)
+		self.order = Order.objects.create(user=self.user, preference_id="PREF-E1", total=Decimal("1400.00"), status=Order.Status.APPROVED)
+		OrderItem.objects.create(order=self.order, product=product, product_name="Sofa", quantity=2, unit_price=Decimal("700.00"))
+		Order.objects.create(user=self.user, preference_id="PREF-E2", total=Decimal("0"))
+
+	def test_admin_action_streams_csv(self):
+		self.client.login(username="finance", password="secret123")
+
+		response = self.client.post(
+			reverse("admin:pages_order_changelist"),
+			{"action": "export_csv", "_selected_action": list(Order.objects.values_list("pk", flat=True))},
+		)
+
+		self.assertTrue(response.streaming)
+		lines = b"".join(response.streaming_content).decode().splitlines()
+		self.assertEqual(lines[0].split(",")[:2], ["order_id", "preference_id"])
+		self.assertEqual(len(lines), 3)
+		self.assertIn("Sofa,2,700.00", lines[1])
+
+	def test_command_exports_json_lines_with_filters(self):
+		out = StringIO()
+		call_command("export_orders", format="jsonl", status=["approved"], since=str(timezone.localdate()), stdout=out)
+
+		rows = [json.loads(line) for line in out.getvalue().splitlines()]
+		self.assertEqual(len(rows), 1)
+		self.assertEqual((rows[0]["preference_id"], rows[0]["quantity"]), ("PREF-E1", 2))
+
+
+class InvoiceTests(TestCase):
+	def setUp(self):
+		self.media_root = tempfile.TemporaryDirectory()
+		self.addCleanup(self.media_root.cleanup)
+		media = override_settings(MEDIA_ROOT=self.media_root.name)
+		media.enable()
+		self.addCleanup(media.disable)
+		self.user = get_user_model().objects.create_user(username="client", password="secret123")
+		self.order = Order.objects.create(user=self.user, preference_id="PREF-I1", total=Decimal("20.00"), status=Order.Status.APPROVED)
+		OrderItem.objects.create(order=self.order, product_name="Pen", quantity=4, unit_price=Decimal("5.00"))
+
+	def test_invoice_is_rendered_once_and_served_from_storage(self):
+		self.client.login(username="client", password="secret123")
+
+		with patch("pages.invoices.render_invoice_pdf", wraps=render_invoice_pdf) as render:
+			first = self.client.get(reverse("order_invoice", args=[self.order.pk]))
+			first.close()
+			second = self.client.get(reverse("order_invoice", args=[self.order.pk]))
+
+		self.assertEqual(render.call_count, 1)
+		self.assertEqual(first["Content-Type"], "application/pdf")
+		self.assertTrue(b"".join(second.streaming_content).startswith(b"%PDF"))
+
+	def test_pending_orders_have_no_invoice(self):
+		pending = Order.objects.create(user=self.user, preference_id="PREF-I2", total=Decimal("1.00"))
+		self.client.login(username="client", password="secret123")
+
+		self.assertEqual(self.client.get(reverse("order_invoice", args=[pending.pk])).status_code, 404)
+
+	def test_batch_command_renders_missing_invoices(self):
+		out = StringIO()
+		call_command("render_invoices", workers=1, since=str(timezone.localdate()), stdout=out)
+
+		self.order.refresh_from_db()
+		self.assertTrue(self.order.invoice.name.startswith("invoices/"))
+		self.assertIn("Rendered 1 invoice(s).", out.getvalue())
+
+
+class ProductConditionalGetTests(TestCase):
+	def setUp(self):
+		reset_catalog()
+		self.product = Product.objects.create(name="Guitar", price=Decimal("500.00"), stock=1)
+
+	def test_show_page_answers_304_for_matching_etag(self):
+		url = reverse("show", args=[self.product.pk])
+		first = self.client.get(url)
+
+		second = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+		self.assertEqual(second.status_code, 304)
+		self.assertIn("Last-Modified", first)
+		self.assertIn("Accept-Language", first["Vary"])
+		self.assertIn("Cookie", first["Vary"])
+
+	def test_etag_changes_when_product_is_saved(self):
+		url = reverse("show", args=[self.product.pk])
+		etag = self.client.get(url)["ETag"]
+		self.product.price = Decimal("450.00")
+		self.product.save()
+
+		self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+	def test_pages_with_a_csrf_token_or_cookie_are_not_public(self):
+		response = self.client.get(reverse("show", args=[self.product.pk]))
+
+		self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+		self.assertNotIn("public", response["Cache-Control"])
+		self.assertIn("private", response["Cache-Control"])
+
+	def test_pending_messages_skip_the_etag(self):
+		request = RequestFactory().get(reverse("products"))
+		request.user = AnonymousUser()
+		request._messages = CookieStorage(request)
+		self.assertIsNotNone(_catalog_etag(request))
+
+		messages.info(request, "Product removed from cart.")
+
+		self.assertIsNone(_catalog_etag(request))
+		self.assertIsNone(_product_etag(request, self.product.pk))
+		self.assertEqual([str(message) for message in messages.get_messages(request)], ["Product removed from cart."])
+
+	def test_index_is_private_for_authenticated_users(self):
+		get_user_model().objects.create_user(username="fan", password="secret123")
+		self.client.login(username="fan", password="secret123")
+		first = self.client.get(reverse("products"))
+
+		self.assertIn("private", first["Cache-Control"])
+		self.assertEqual(self.client.get(reverse("products"), HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+
+
+class RecommendationTests(TestCase):
+	def setUp(self):
+		reset_catalog()
+		self.media_root = tempfile.TemporaryDirectory()
+		self.addCleanup(self.media_root.cleanup)
+		media = override_settings(MEDIA_ROOT=self.media_root.name)
+		media.enable()
+		self.addCleanup(media.disable)
+		self.user = get_user_model().objects.create_user(username="shopper", password="secret123")
+		self.tent, self.stove, self.lamp, self.map = (
+			Product.objects.create(name=name, price=Decimal("10.00"), stock=5) for name in ("Tent", "Stove", "Lamp", "Map")
+		)
+
+	def _approved_order(self, preference_id, *products, approved_at=None):
+		order = Order.objects.create(
+			user=self.user,
+			preference_id=preference_id,
+			total=Decimal("0"),
+			status=Order.Status.APPROVED,
+			approved_at=approved_at or timezone.now(),
+		)
+		for product in products:
+			OrderItem.objects.create(order=order, product=product, product_name=product.name, quantity=1, unit_price=product.price)
+
+	def _related(self, product):
+		return list(ProductRecommendation.objects.filter(product=product).order_by("rank").values_list("related__name", "score"))
+
+	def test_full_build_ranks_by_co_purchase_count(self):
+		self._approved_order("PREF-R1", self.tent, self.stove, self.lamp)
+		self._approved_order("PREF-R2", self.tent, self.stove)
+
+		build_recommendations(full=True, k=2)
+
+		self.assertEqual(self._related(self.tent), [("Stove", 2), ("Lamp", 1)])
+		self.assertEqual(self._related(self.map), [])
+
+	def test_incremental_build_adds_only_new_orders(self):
+		self._approved_order("PREF-R3", self.tent, self.lamp, approved_at=timezone.now() - timedelta(days=1))
+		build_recommendations(full=True)
+		self._approved_order("PREF-R4", self.tent, self.map)
+		self._approved_order("PREF-R5", self.map, self.tent)
+
+		self.assertEqual(build_recommendations(), 2)
+		self.assertEqual(self._related(self.tent), [("Map", 2), ("Lamp", 1)])
+		self.assertEqual(self._related(self.lamp), [("Tent", 1)])
+
+	def test_orders_approved_during_a_build_are_counted_once(self):
+		started = timezone.now()
+		self._approved_order("PREF-R7", self.tent, self.stove, approved_at=started + timedelta(seconds=1))
+
+		with patch("pages.recommendations.timezone.now", return_value=started):
+			build_recommendations(full=True)
+		self.assertEqual(self._related(self.tent), [])
+
+		with patch("pages.recommendations.timezone.now", return_value=started + timedelta(seconds=2)):
+			build_recommendations()
+			build_recommendations()
+		self.assertEqual(self._related(self.tent), [("Stove", 1)])
+
+	def test_orders_committed_after_a_build_read_them_are_counted_once(self):
+		started = timezone.now()
+		self._approved_order("PREF-R8", self.tent, self.lamp, approved_at=started - timedelta(seconds=1))
+		with patch("pages.recommendations.timezone.now", return_value=started):
+			build_recommendations(full=True)
+		# Approved before that build started, but committed after it read the table.
+		self._approved_order("PREF-R9", self.tent, self.stove, approved_at=started - timedelta(seconds=1))
+
+		for seconds in (60, 120):
+			with patch("pages.recommendations.timezone.now", return_value=started + timedelta(seconds=seconds)):
+				build_recommendations()
+
+		self.assertEqual(self._related(self.tent), [("Stove", 1), ("Lamp", 1)])
+
+	def test_product_page_shows_recommendations(self):
+		self._approved_order("PREF-R6", self.tent, self.stove)
+		build_recommendations(full=True)
+
+		response = self.client.get(reverse("show", args=[self.tent.pk]))
+
+		self.assertEqual([product.name for product in response.context["related_products"]], ["Stove"])
+
+
+@override_settings(PRODUCT_CHANGES_SETTLE_SECONDS=0)
+class ProductChangeFeedTests(TestCase):
+	def setUp(self):
+		reset_catalog()
+		self.tent = Product.objects.create(name="Tent", price=Decimal("10.00"), stock=3)
+		self.stove = Product.objects.create(name="Stove", price=Decimal("20.00"), stock=1)
+
+	def _feed(self, cursor=0, **params):
+		return self.client.get(reverse("product_changes_api"), {"cursor": cursor, **params}).json()
+
+	def test_feed_returns_only_changes_after_cursor(self):
+		cursor = self._feed()["next_cursor"]
+		self.stove.stock = 0
+		self.stove.save()
+		lamp_id = Product.objects.create(name="Lamp", price=Decimal("5.00"), stock=2).pk
+		tent_id = self.tent.pk
+		self.tent.delete()
+
+		data = self._feed(cursor)
+
+		self.assertEqual(
+			data["products"],
+			[
+				{"id": self.stove.pk, "deleted": False, "name": "Stove", "price": "20.00", "stock": 0},
+				{"id": lamp_id, "deleted": False, "name": "Lamp", "price": "5.00", "stock": 2},
+				{"id": tent_id, "deleted": True},
+			],
+		)
+		self.assertFalse(data["has_more"])
+		self.assertEqual(self._feed(data["next_cursor"])["products"], [])
+
+	def test_feed_paginates_with_cursor(self):
+		first = self._feed(limit=1)
+		second = self._feed(first["next_cursor"], limit=1)
+
+		self.assertTrue(first["has_more"])
+		self.assertEqual([p["name"] for p in first["products"] + second["products"]], ["Tent", "Stove"])
+		self.assertFalse(second["has_more"])
+
+	def test_compaction_keeps_latest_entry_per_product(self):
+		for stock in (5, 6, 7):
+			self.tent.stock = stock
+			self.tent.save()
+
+		self.assertEqual(compact_product_changes(batch_size=1), 3)
+		self.assertEqual(ProductChange.objects.count(), 2)
+		self.assertEqual(self._feed()["products"][1]["stock"], 7)
+
+	def test_rejects_non_integer_cursor(self):
+		response = self.client.get(reverse("product_changes_api"), {"cursor": "abc"})
+
+		self.assertEqual(response.status_code, 400)
+
+
+class _StubFeedHandler(BaseHTTPRequestHandler):
+	payloads = {}
+
+	def do_GET(self):
+		if self.path == "/slow":
+			time.sleep(1.5)
+		body = self.payloads.get(self.path, b"")
+		self.send_response(200 if self.path in self.payloads else 404)
+		self.send_header("Content-Type", "application/json")
+		self.end_headers()
+		# Written in small pieces so the client parses across chunk boundaries.
+		try:
+			for start in range(0, len(body), 7):
+				self.wfile.write(body[start:start + 7])
+		except (BrokenPipeError, ConnectionResetError):
+			# The client gave up on purpose (size cap).
+			pass
+
+	def log_message(self, *args):
+		pass
+
+
+class PartnerFeedTests(TestCase):
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubFeedHandler)
+		threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+		cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+	@classmethod
+	def tearDownClass(cls):
+		cls.server.shutdown()
+		cls.server.server_close()
+		super().tearDownClass()
+
+	def setUp(self):
+		reset_catalog()
+		self.tent = Product.objects.create(name="Tent", price=Decimal("10.00"), stock=3)
+		self.stove = Product.objects.create(name="Stove", price=Decimal("20.00"), stock=1)
+		items = [
+			{"id": self.tent.pk, "name": "Tent", "price": "12.50", "stock": 7},
+			{"id": self.stove.pk, "name": "Stove", "price": 20, "stock": 1},
+			{"id": 999999, "name": "Unknown", "price": "1.00", "stock": 1},
+			{"id": "bad"},
+		]
+		_StubFeedHandler.payloads = {
+			"/feed": json.dumps({"generated": "now", "products": items}).encode(),
+			"/slow": b"[]",
+			"/broken": b'{"products": [{"id": 1, "price": ',
+		}
+
+	def _feed(self, name, path, **fields):
+		return PartnerFeed.objects.create(name=name, url=self.base_url + path, **fields)
+
+	def test_iter_json_items_parses_across_chunks(self):
+		payload = json.dumps([{"name": "Café", "n": n} for n in range(50)]).encode()
+		chunks = (payload[start:start + 5] for start in range(0, len(payload), 5))
+
+		items = list(iter_json_items(chunks))
+
+		self.assertEqual(len(items), 50)
+		self.assertEqual(items[49], {"name": "Café", "n": 49})
+		with self.assertRaises(FeedError):
+			list(iter_json_items([b'{"other": []}']))
+
+	def test_ingest_updates_matching_products_and_records_status(self):
+		feed = self._feed("partner", "/feed")
+
+		ingest_feeds([feed], batch_size=1)
+
+		self.tent.refresh_from_db()
+		self.assertEqual((self.tent.price, self.tent.stock), (Decimal("12.50"), 7))
+		feed.refresh_from_db()
+		self.assertEqual(feed.last_status, PartnerFeed.Status.OK)
+		self.assertEqual((feed.items_seen, feed.products_updated), (4, 1))
+		self.assertEqual(get_catalog().get(self.tent.pk).stock, 7)
+
+	def test_feeds_fail_independently_on_timeout_size_and_bad_json(self):
+		good = self._feed("good", "/feed", match_on=PartnerFeed.MatchOn.NAME)
+		slow = self._feed("slow", "/slow", timeout_seconds=1)
+		capped = self._feed("capped", "/feed", max_bytes=10)
+		broken = self._feed("broken", "/broken")
+
+		ingest_feeds([good, slow, capped, broken])
+
+		statuses = dict(PartnerFeed.objects.values_list("name", "last_status"))
+		self.assertEqual(
+			statuses,
+			{"good": "ok", "slow": "failed", "capped": "failed", "broken": "failed"},
+		)
+		self.assertIn("10 byte limit", PartnerFeed.objects.get(name="capped").last_error)
+		self.assertEqual(Product.objects.get(pk=self.tent.pk).stock, 7)
+
+	def test_command_runs_only_due_feeds(self):
+		self._feed("due", "/feed")
+		self._feed("recent", "/feed", last_run_at=timezone.now(), last_status=PartnerFeed.Status.OK)
+		out = StringIO()
+
+		call_command("ingest_partner_feeds", stdout=out)
+
+		self.assertIn("due: ok", out.getvalue())
+		self.assertNotIn("recent", out.getvalue())
+
+
+class ProductAdminTests(TestCase):
+	def setUp(self):
+		reset_catalog()
+		self.admin = get_user_model().objects.create_superuser(username="admin", password="secret123", email="a@example.com")
+		self.client.force_login(self.admin)
+		self.tent = Product.objects.create(name="Tent", price=Decimal("10.00"), stock=3, cantidad_vendidos=150)
+		self.tarp = Product.objects.create(name="tarp", price=Decimal("4.00"), stock=0, es_producto_dia=True)
+		self.stove = Product.objects.create(name="Stove", price=Decimal("20.00"), stock=12, cantidad_vendidos=5)
+
+	def _changelist(self, **params):
+		return self.client.get(reverse("admin:pages_product_changelist"), params)
+
+	def _action(self, action, products, **fields):
+		data = {"action": action, "_selected_action": [product.pk for product in products], **fields}
+		return self.client.post(reverse("admin:pages_product_changelist"), data, follow=True)
+
+	def test_range_filters_and_prefix_search(self):
+		self.assertEqual(list(self._changelist(sold="100+").context["cl"].result_list), [self.tent])
+		self.assertEqual(list(self._changelist(stock_level="6-20").context["cl"].result_list), [self.stove])
+		self.assertEqual({p.name for p in self._changelist(q="TA").context["cl"].result_list}, {"tarp"})
+		self.assertEqual(list(self._changelist(q=str(self.stove.pk)).context["cl"].result_list), [self.stove])
+
+	def test_search_folds_accents_and_matches_any_part_of_the_name(self):
+		nandu = Product.objects.create(name="Ñandú de peluche", price=Decimal("8.00"), descripcion="Relleno suave")
+
+		self.assertEqual(list(self._changelist(q="ñandu").context["cl"].result_list), [nandu])
+		self.assertEqual(list(self._changelist(q="PELUCHE").context["cl"].result_list), [nandu])
+		self.assertEqual(list(self._changelist(q="suave").context["cl"].result_list), [])
+		# Names starting with the term do not hide the ones containing it.
+		self.assertEqual({p.name for p in self._changelist(q="t").context["cl"].result_list}, {"Tent", "tarp", "Stove"})
+
+	def test_search_ignores_numbers_too_large_to_be_ids(self):
+		response = self._changelist(q="9" * 30)
+
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(list(response.context["cl"].result_list), [])
+
+	def test_bulk_stock_and_price_actions(self):
+		self._action("adjust_stock", [self.tent, self.stove], stock_delta="-5")
+		self._action("set_price", [self.tent], price="9.99")
+
+		self.assertEqual(
+			list(Product.objects.order_by("pk").values_list("stock", "price")),
+			[(0, Decimal("9.99")), (0, Decimal("4.00")), (7, Decimal("20.00"))],
+		)
+		self.assertEqual(get_catalog().get(self.stove.pk).stock, 7)
+
+	def test_select_across_updates_with_a_subquery(self):
+		url = reverse("admin:pages_product_changelist") + "?q=e"
+		data = {"action": "adjust_stock", "select_across": "1", "_selected_action": [self.tent.pk], "stock_delta": "10"}
+		logged = ProductChange.objects.count()
+
+		with CaptureQueriesContext(connection) as queries:
+			self.client.post(url, data)
+
+		update = next(query["sql"] for query in queries if query["sql"].startswith('UPDATE "pages_product"'))
+		self.assertIn("SELECT", update)
+		self.assertEqual(dict(Product.objects.values_list("name", "stock")), {"Tent": 13, "tarp": 0, "Stove": 22})
+		changed = ProductChange.objects.order_by("pk")[logged:].values_list("product_id", flat=True)
+		self.assertEqual(set(changed), {self.tent.pk, self.stove.pk})
+
+	def test_action_without_value_changes_nothing(self):
+		response = self._action("adjust_stock", [self.tent])
+
+		self.assertContains(response, "Fill in")
+		self.assertEqual(Product.objects.get(pk=self.tent.pk).stock, 3)
+
+	def test_rotate_product_of_day(self):
+		self._action("rotate_product_of_day", [self.tent, self.tarp, self.stove])
+		self.assertEqual(list(Product.objects.filter(es_producto_dia=True)), [self.stove])
+
+		self._action("rotate_product_of_day", [self.tent, self.tarp, self.stove])
+		self.assertEqual(list(Product.objects.filter(es_producto_dia=True)), [self.tent])
+		self.assertEqual(get_catalog().product_of_day.id, self.tent.pk)
+
+
+@override_settings(
+	THROTTLE_RATES={
+		"product_inventory_api": {"ip": "2/min"},
+		"add_to_cart": {"user": "1/min", "ip": "100/min"},
+		"checkout": {"user": "1/min", "ip": "100/min"},
+	},
+	THROTTLE_PROXY_COUNT=1,
+)
+class ThrottleTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		reset_catalog()
+
+	def test_token_bucket_refills_over_time(self):
+		self.assertEqual(take_token("bucket", "2/min", now=1000), 0)
+		self.assertEqual(take_token("bucket", "2/min", now=1000), 0)
+		self.assertAlmostEqual(take_token("bucket", "2/min", now=1000), 30)
+		self.assertEqual(take_token("bucket", "2/min", now=1030), 0)
+
+	def test_ip_limit_returns_429_without_querying(self):
+		url = reverse("product_inventory_api")
+		for _attempt in range(2):
+			self.assertEqual(self.client.get(url, HTTP_X_FORWARDED_FOR="10.0.0.1").status_code, 200)
+
+		with self.assertNumQueries(0):
+			response = self.client.get(url, HTTP_X_FORWARDED_FOR="10.0.0.1")
+
+		self.assertEqual(response.status_code, 429)
+		self.assertEqual(response["Retry-After"], "30")
+		# A spoofed left-most hop does not escape the bucket; another client address does.
+		self.assertEqual(self.client.get(url, HTTP_X_FORWARDED_FOR="1.2.3.4, 10.0.0.1").status_code, 429)
+		self.assertEqual(self.client.get(url, HTTP_X_FORWARDED_FOR="10.0.0.2").status_code, 200)
+
+	def test_user_limit_applies_per_user(self):
+		product = Product.objects.create(name="Tent", price=Decimal("10.00"), stock=5)
+		url = reverse("add_to_cart", args=[product.pk])
+		self.client.force_login(get_user_model().objects.create_user(username="first", password="secret123"))
+		self.assertEqual(self.client.post(url).status_code, 302)
+		self.assertEqual(self.client.post(url).status_code, 429)
+
+		self.client.force_login(get_user_model().objects.create_user(username="second", password="secret123"))
+		self.assertEqual(self.client.post(url).status_code, 302)
+
+	@patch("pages.views._get_mercadopago_client")
+	def test_checkout_is_throttled(self, mock_client_factory):
+		buyer = get_user_model().objects.create_user(username="buyer", password="secret123")
+		Cart.objects.create(user=buyer)
+		self.client.force_login(buyer)
+		url = reverse("checkout")
+		self.assertEqual(self.client.post(url).status_code, 302)
+		self.assertEqual(self.client.post(url).status_code, 429)
+		self.assertEqual(mock_client_factory.call_count, 1)
+
+	@override_settings(THROTTLE_RATES=settings.THROTTLE_RATES)
+	def test_configured_rates_are_keyed_by_route_names(self):
+		route_names = {name for name in get_resolver().reverse_dict if isinstance(name, str)}
+		self.assertLessEqual(set(settings.THROTTLE_RATES), route_names)
+
+
+class _CapturingHandler(logging.Handler):
+	def __init__(self):
+		super().__init__()
+		self.records = []
+		self.addFilter(CorrelationIdFilter())
+
+	def emit(self, record):
+		self.records.append(record)
+
+
+class StructuredLoggingTests(TestCase):
+	def setUp(self):
+		self.user = get_user_model().objects.create_user(username="payer", email="payer@example.com", password="secret123")
+		self.client.force_login(self.user)
+		self.capture = _CapturingHandler()
+		payments = logging.getLogger("pages.payments")
+		payments.addHandler(self.capture)
+		self.addCleanup(payments.removeHandler, self.capture)
+
+	def test_json_formatter_redacts_payer_fields(self):
+		record = logging.LogRecord("pages.payments", logging.INFO, __file__, 1, "created %s", ("PREF-1",), None)
+		record.preference = {"payer": {"email": "payer@example.com"}, "items": [{"title": "Tent"}], "email": "x@y.z"}
+		record.correlation_id = "abc"
+		record.product = {"name": "Tent", "last_name": "Doe"}
+
+		entry = json.loads(JsonFormatter().format(record))
+
+		self.assertEqual(entry["message"], "created PREF-1")
+		self.assertEqual(entry["correlation_id"], "abc")
+		self.assertEqual(entry["preference"], {"payer": "[redacted]", "items": [{"title": "Tent"}], "email": "[redacted]"})
+		self.assertEqual(entry["product"], {"name": "Tent", "last_name": "[redacted]"})
+
+	def test_sampling_only_drops_low_levels_of_listed_loggers(self):
+		sampling = SamplingFilter({"pages.throttle": 0.0})
+
+		def keeps(name, level):
+			return sampling.filter(logging.LogRecord(name, level, __file__, 1, "event", (), None))
+
+		self.assertFalse(keeps("pages.throttle", logging.INFO))
+		self.assertFalse(keeps("pages.throttle.child", logging.INFO))
+		self.assertTrue(keeps("pages.throttle", logging.WARNING))
+		self.assertTrue(keeps("pages.payments", logging.INFO))
+
+	def test_queue_handler_writes_in_background_and_drops_when_full(self):
+		stream = io.StringIO()
+		handler = BackgroundQueueHandler(stream=stream, maxsize=1)
+		handler.setFormatter(JsonFormatter())
+		handler.stop()
+		record = logging.LogRecord("pages", logging.INFO, __file__, 1, "queued", (), None)
+
+		handler.handle(record)
+		handler.handle(record)
+		self.assertEqual(handler.dropped, 1)
+
+		handler.start()
+		handler.stop()
+		self.assertEqual(json.loads(stream.getvalue())["message"], "queued")
+
+	@override_settings(MERCADOPAGO_ACCESS_TOKEN="TEST-TOKEN")
+	@patch("pages.views._get_mercadopago_client")
+	def test_payment_callback_logs_under_checkout_correlation_id(self, mock_client_factory):
+		product = Product.objects.create(name="Tent", price=Decimal("10.00"), stock=5)
+		CartItem.objects.create(cart=Cart.objects.create(user=self.user), product=product, quantity=1)
+		mock_client_factory.return_value.preference.return_value.create.return_value = {
+			"response": {"id": "PREF-LOG", "init_point": "https://pay.example/PREF-LOG"}
+		}
+		mock_client_factory.return_value.payment.return_value.get.return_value = {
+			"response": {"status": "approved", "id": "PAY-LOG", "status_detail": "accredited"}
+		}
+
+		checkout = self.client.post(reverse("checkout"), HTTP_X_REQUEST_ID="checkout42")
+		callback = self.client.get(reverse("payment_success"), {"preference_id": "PREF-LOG", "payment_id": "PAY-LOG"})
+
+		self.assertEqual(checkout["X-Request-ID"], "checkout42")
+		self.assertNotEqual(callback["X-Request-ID"], "checkout42")
+		self.assertEqual(Order.objects.get().correlation_id, "checkout42")
+		sent = mock_client_factory.return_value.preference.return_value.create.call_args.args[0]
+		self.assertEqual(sent["external_reference"], "checkout42")
+		self.assertEqual({record.correlation_id for record in self.capture.records}, {"checkout42"})
+		self.assertIn("order status updated", [record.getMessage() for record in self.capture.records])
+		self.assertIsNone(get_correlation_id())
+
+	def test_request_id_is_unbound_once_the_response_is_closed(self):
+		self.client.get(reverse("healthz"), HTTP_X_REQUEST_ID="request7")
+		enqueue(_recording_task, "after")
+
+		self.assertIsNone(get_correlation_id())
+		self.assertEqual(Task.objects.get().correlation_id, "")
+
+
+class OrderArchiveTests(TestCase):
+	def setUp(self):
+		reset_catalog()
+		self.user = get_user_model().objects.create_user(username="buyer", password="secret123")
+		self.product = Product.objects.create(name="Tent", price=Decimal("10.00"), stock=5)
+		self.old_approved = self._order("PREF-OLD", Order.Status.APPROVED, days_ago=400)
+		self.old_pending = self._order("PREF-PENDING", Order.Status.PENDING, days_ago=400)
+		self.recent = self._order("PREF-NEW", Order.Status.APPROVED, days_ago=1)
+
+	def _order(self, preference_id, status, days_ago):
+		order = Order.objects.create(user=self.user, preference_id=preference_id, total=Decimal("20.00"), status=status)
+		OrderItem.objects.create(order=order, product=self.product, product_name="Tent", quantity=2, unit_price=Decimal("10.00"))
+		moment = timezone.now() - timedelta(days=days_ago)
+		Order.objects.filter(pk=order.pk).update(created_at=moment, updated_at=moment, approved_at=moment)
+		return order
+
+	def test_moves_only_old_finalized_orders_in_batches(self):
+		self.assertEqual(archive_orders(365, batch_size=1), (1, 1))
+
+		self.assertEqual(set(Order.objects.values_list("preference_id", flat=True)), {"PREF-PENDING", "PREF-NEW"})
+		archived = ArchivedOrder.objects.get()
+		self.assertEqual((archived.pk, archived.status), (self.old_approved.pk, Order.Status.APPROVED))
+		self.assertEqual(ArchivedOrderItem.objects.get().order_id, self.old_approved.pk)
+		self.assertFalse(OrderItem.objects.filter(order_id=self.old_approved.pk).exists())
+
+		self.client.force_login(get_user_model().objects.create_superuser("staff", "staff@example.com", "secret123"))
+		self.assertContains(self.client.get(reverse("admin:pages_archivedorder_changelist")), "PREF-OLD")
+		self.assertEqual(self.client.get(reverse("admin:pages_archivedorder_change", args=[archived.pk])).status_code, 200)
+
+	def test_orders_touched_after_selection_stay_live(self):
+		cutoff = archive_cutoff(365)
+		Order.objects.filter(pk=self.old_approved.pk).update(updated_at=timezone.now())
+
+		self.assertEqual(archive_batch([self.old_approved.pk], cutoff), (0, 0))
+		self.assertTrue(Order.objects.filter(pk=self.old_approved.pk).exists())
+
+	def test_history_reads_archive_when_asked(self):
+		archive_orders(365)
+		self.client.force_login(self.user)
+
+		recent = self.client.get(reverse("orders_list"))
+		older = self.client.get(reverse("orders_list"), {"archived": "1"})
+		detail = self.client.get(reverse("order_detail", args=[self.old_approved.pk]))
+
+		self.assertEqual([order.preference_id for order in recent.context["orders"]], ["PREF-NEW", "PREF-PENDING"])
+		self.assertEqual([order.preference_id for order in older.context["orders"]], ["PREF-OLD"])
+		self.assertContains(detail, "PREF-OLD")
+
+	def test_full_rebuilds_include_archived_orders(self):
+		archive_orders(365)
+
+		refresh_sales_analytics(full=True)
+		call_command("rebuild_sales_rollups", counters=True, stdout=StringIO())
+
+		self.assertEqual(sum(SalesDay.objects.values_list("orders_approved", flat=True)), 2)
+		self.assertEqual(Product.objects.get(pk=self.product.pk).cantidad_vendidos, 4)
+		self.assertEqual(sum(ProductSalesDay.objects.values_list("units", flat=True)), 4)
+
+
+@override_settings(MERCADOPAGO_ACCESS_TOKEN="TEST-TOKEN", CHECKOUT_PREFERENCE_TTL_MINUTES=30)
+class IdempotentCheckoutTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.user = get_user_model().objects.create_user(username="buyer", email="buyer@example.com", password="secret123")
+		self.client.force_login(self.user)
+		self.product = Product.objects.create(name="Tent", price=Decimal("10.00"), stock=5)
+		self.item = CartItem.objects.create(cart=Cart.objects.create(user=self.user), product=self.product, quantity=1)
+		patcher = patch("pages.views._get_mercadopago_client")
+		self.sdk = patcher.start().return_value
+		self.addCleanup(patcher.stop)
+		self.sdk.preference.return_value.create.side_effect = lambda data: {
+			"response": {
+				"id": f"PREF-{self.sdk.preference.return_value.create.call_count}",
+				"init_point": f"https://pay.example/{self.sdk.preference.return_value.create.call_count}",
+			}
+		}
+
+	def _checkout(self):
+		return self.client.post(reverse("checkout"))
+
+	def test_unchanged_cart_reuses_pending_order(self):
+		first = self._checkout()
+		second = self._checkout()
+
+		self.assertEqual(first["Location"], "https://pay.example/1")
+		self.assertEqual(second["Location"], "https://pay.example/1")
+		self.assertEqual(self.sdk.preference.return_value.create.call_count, 1)
+		self.assertEqual(Order.objects.count(), 1)
+		self.assertTrue(self.sdk.preference.return_value.create.call_args.args[0]["expires"])
+
+	def test_changed_cart_or_price_creates_new_preference(self):
+		self._checkout()
+		CartItem.objects.filter(pk=self.item.pk).update(quantity=2)
+		self.assertEqual(self._checkout()["Location"], "https://pay.example/2")
+		Product.objects.filter(pk=self.product.pk).update(price=Decimal("12.00"))
+		self.assertEqual(self._checkout()["Location"], "https://pay.example/3")
+
+	def test_expired_or_settled_orders_are_not_reused(self):
+		self._checkout()
+		Order.objects.update(created_at=timezone.now() - timedelta(minutes=45))
+		self.assertEqual(self._checkout()["Location"], "https://pay.example/2")
+		Order.objects.update(status=Order.Status.REJECTED)
+		self.assertEqual(self._checkout()["Location"], "https://pay.example/3")
+
+	def test_concurrent_checkout_returns_at_once_instead_of_creating(self):
+		fingerprint = cart_fingerprint(CartItem.objects.select_related("product"))
+		with checkout_lock(self.user, fingerprint) as acquired:
+			self.assertTrue(acquired)
+			with checkout_lock(self.user, fingerprint) as second:
+				self.assertFalse(second)
+			response = self._checkout()
+
+		self.assertRedirects(response, reverse("cart"), fetch_redirect_response=False)
+		self.sdk.preference.return_value.create.assert_not_called()
+		self.assertFalse(CheckoutClaim.objects.exists())
+
+	def test_abandoned_claims_expire(self):
+		fingerprint = cart_fingerprint(CartItem.objects.select_related("product"))
+		CheckoutClaim.objects.create(user=self.user, cart_fingerprint=fingerprint)
+		CheckoutClaim.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+
+		self.assertEqual(self._checkout()["Location"], "https://pay.example/1")
+
+
+class TypeaheadTests(TestCase):
+	def setUp(self):
+		reset_catalog()
+		Product.objects.create(name="Café Crème", price=Decimal("5.00"), stock=1, cantidad_vendidos=3)
+		Product.objects.create(name="Camping Stove", price=Decimal("40.00"), stock=1, cantidad_vendidos=50)
+		Product.objects.create(name="Camp Chair", price=Decimal("25.00"), stock=0, cantidad_vendidos=10)
+
+	def _names(self, query):
+		return [product.name for product in get_typeahead().suggest(query)]
+
+	def test_normalize_folds_accents_case_and_punctuation(self):
+		self.assertEqual(normalize("  Café-CRÈME! "), "cafe creme")
+
+	def test_prefix_matches_any_word_ranked_by_sales(self):
+		self.assertEqual(self._names("ca"), ["Camping Stove", "Camp Chair", "Café Crème"])
+		self.assertEqual(self._names("camp"), ["Camping Stove", "Camp Chair"])
+		self.assertEqual(self._names("CREM"), ["Café Crème"])
+		self.assertEqual(self._names("st"), ["Camping Stove"])
+		self.assertEqual(self._names("zz"), [])
+
+	def test_products_matching_through_many_words_leave_room_for_others(self):
+		Product.objects.create(name=" ".join(["Cart"] * 25), price=Decimal("9.00"), stock=1, cantidad_vendidos=500)
+
+		self.assertEqual(self._names("ca"), ["Cart " * 24 + "Cart", "Camping Stove", "Camp Chair", "Café Crème"])
+
+	def test_index_rebuilds_when_catalog_changes(self):
+		before = get_typeahead()
+		self.assertIs(get_typeahead(), before)
+
+		Product.objects.create(name="Canteen", price=Decimal("8.00"), stock=1, cantidad_vendidos=99)
+
+		self.assertEqual(self._names("can"), ["Canteen"])
+		self.assertEqual(self._names("ca")[0], "Canteen")
+
+	def test_suggest_endpoint(self):
+		response = self.client.get(reverse("product_suggest_api"), {"q": "cafe", "limit": "5"})
+
+		self.assertEqual([product["name"] for product in response.json()["products"]], ["Café Crème"])
+		self.assertIn("public", response["Cache-Control"])
+
+
+@override_settings(CATALOG_PRICE_FACETS=[0, 100, 500], CATALOG_STOCK_FACETS=[0, 1, 10])
+class ProductFacetTests(TestCase):
+	def setUp(self):
+		reset_catalog()
+		Product.objects.create(name="Cable", price=Decimal("10.00"), stock=3)
+		Product.objects.create(name="Cable Reel", price=Decimal("150.00"), stock=0)
+		Product.objects.create(name="Amplifier", price=Decimal("900.00"), stock=25)
+		Product.objects.create(name="Speaker", price=Decimal("600.00"), stock=0)
+
+	def _counts(self, facets, dimension):
+		return {facet["key"]: facet["count"] for facet in facets[dimension]}
+
+	def test_unsearched_counts_come_from_the_snapshot_histogram(self):
+		catalog = get_catalog()
+
+		with patch("pages.catalog.histogram") as recount:
+			facets = catalog.facets()
+		recount.assert_not_called()
+		self.assertEqual(self._counts(facets, "price"), {"0-100": 1, "100-500": 1, "500-": 2})
+		self.assertEqual(self._counts(facets, "stock"), {"0-1": 2, "1-10": 1, "10-": 1})
+		self.assertEqual(facets["stock"][0]["label"], "Out of stock")
+
+	def test_counts_follow_the_query_and_the_other_selection(self):
+		catalog = get_catalog()
+		out_of_stock = catalog.stock_buckets[0]
+
+		facets = catalog.facets("cable", stock=out_of_stock)
+
+		self.assertEqual(self._counts(facets, "price"), {"0-100": 0, "100-500": 1, "500-": 0})
+		self.assertEqual(self._counts(facets, "stock"), {"0-1": 1, "1-10": 1, "10-": 0})
+		self.assertTrue(facets["stock"][0]["selected"])
+
+	def test_list_filters_by_bucket_with_ordering(self):
+		response = self.client.get(reverse("products"), {"price": "500-", "order": "price_asc"})
+
+		self.assertEqual([p.name for p in response.context["products"]], ["Speaker", "Amplifier"])
+		response = self.client.get(reverse("products"), {"price": "500-", "stock": "0-1"})
+		self.assertEqual([p.name for p in response.context["products"]], ["Speaker"])
+		response = self.client.get(reverse("products"), {"price": "bogus"})
+		self.assertEqual(len(response.context["products"]), 4)
+		self.assertContains(response, "Out of stock (2)")
+
+
+class MediaServingTests(TestCase):
+	def setUp(self):
+		self.media_root = tempfile.TemporaryDirectory()
+		self.addCleanup(self.media_root.cleanup)
+		media = override_settings(MEDIA_ROOT=self.media_root.name, MEDIA_SERVE_BACKEND="")
+		media.enable()
+		self.addCleanup(media.disable)
+		self.product = Product(name="Tent", price=Decimal("10.00"))
+		self.product.image.save("Tent Photo.JPG", ContentFile(b"0123456789"))
+		self.url = self.product.image.url
+
+	def _get(self, *args, **kwargs):
+		# Streamed files stay open (and the request's log binding with them) until the response is closed.
+		response = self.client.get(*args, **kwargs)
+		self.addCleanup(response.close)
+		return response
+
+	def test_uploads_get_content_hashed_names(self):
+		self.assertRegex(self.product.image.name, r"^products/Tent_Photo\.[0-9a-f]{16}\.jpg$")
+		other = Product(name="Tarp", price=Decimal("10.00"))
+		other.image.save("Tent Photo.JPG", ContentFile(b"0123456789"))
+		self.assertEqual(other.image.name, self.product.image.name)
+
+	def test_hashed_files_are_immutable_and_revalidate_by_etag(self):
+		response = self._get(self.url)
+
+		self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+		self.assertIn("immutable", response["Cache-Control"])
+		self.assertEqual(response["Accept-Ranges"], "bytes")
+		self.assertFalse(response["ETag"].startswith("W/"))
+		self.assertEqual(self._get(self.url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+	def test_byte_ranges(self):
+		etag = self._get(self.url)["ETag"]
+
+		response = self._get(self.url, HTTP_RANGE="bytes=2-5")
+		self.assertEqual(response.status_code, 206)
+		self.assertEqual(response["Content-Range"], "bytes 2-5/10")
+		self.assertEqual(b"".join(response.streaming_content), b"2345")
+		self.assertEqual(b"".join(self._get(self.url, HTTP_RANGE="bytes=-3").streaming_content), b"789")
+		self.assertEqual(self._get(self.url, HTTP_RANGE="bytes=20-").status_code, 416)
+		stale = self._get(self.url, HTTP_RANGE="bytes=2-5", HTTP_IF_RANGE='"old"')
+		self.assertEqual(stale.status_code, 200)
+		self.assertEqual(self._get(self.url, HTTP_RANGE="bytes=2-5", HTTP_IF_RANGE=etag).status_code, 206)
+
+	def test_front_server_handoff(self):
+		with override_settings(MEDIA_SERVE_BACKEND="x-accel-redirect"):
+			response = self._get(self.url)
+		self.assertEqual(response["X-Accel-Redirect"], "/protected-media/" + self.product.image.name)
+		self.assertEqual(response.content, b"")
+		self.assertIn("ETag", response)
+
+	def test_only_public_uploads_are_served(self):
+		default_storage.save("invoices/secret.pdf", ContentFile(b"%PDF"))
+
+		self.assertEqual(self._get("/media/invoices/secret.pdf").status_code, 404)
+		self.assertEqual(self._get("/media/products/../invoices/secret.pdf").status_code, 404)
+		self.assertEqual(self._get("/media/products/missing.jpg").status_code, 404)
+		self.assertEqual(self.client.post(self.url).status_code, 405)
+
+
+TASK_CALLS = []
+
+
+@task(max_attempts=2)
+def _recording_task(value, fail=False):
+	TASK_CALLS.append(value)
+	if fail:
+		raise RuntimeError("boom")
+
+
+class TaskQueueTests(TestCase):
+	def setUp(self):
+		TASK_CALLS.clear()
+
+	def test_queued_tasks_run_once_with_their_arguments(self):
+		queued = enqueue(_recording_task, "a")
+		enqueue(_recording_task, value="b")
+
+		self.assertEqual(run_pending_tasks(), 2)
+		self.assertEqual(run_pending_tasks(), 0)
+		self.assertEqual(TASK_CALLS, ["a", "b"])
+		queued.refresh_from_db()
+		self.assertEqual((queued.status, queued.attempts, queued.locked_by), (Task.Status.DONE, 1, ""))
+
+	def test_scheduled_tasks_wait_until_due(self):
+		queued = enqueue(_recording_task, "later", run_at=timezone.now() + timedelta(minutes=5))
+
+		self.assertEqual(run_pending_tasks(), 0)
+		Task.objects.filter(pk=queued.pk).update(run_at=timezone.now())
+		self.assertEqual(run_pending_tasks(), 1)
+
+	def test_failures_retry_with_backoff_then_fail(self):
+		queued = enqueue(_recording_task, "x", fail=True)
+
+		run_pending_tasks()
+		queued.refresh_from_db()
+		self.assertEqual((queued.status, queued.attempts), (Task.Status.QUEUED, 1))
+		self.assertGreater(queued.run_at, timezone.now() + timedelta(seconds=4))
+		self.assertIn("RuntimeError: boom", queued.last_error)
+
+		Task.objects.filter(pk=queued.pk).update(run_at=timezone.now())
+		run_pending_tasks()
+		queued.refresh_from_db()
+		self.assertEqual((queued.status, queued.attempts), (Task.Status.FAILED, 2))
+		self.assertEqual(TASK_CALLS, ["x", "x"])
+
+	def test_leases_keep_other_workers_off_until_they_expire(self):
+		queued = enqueue(_recording_task, "leased")
+
+		self.assertEqual([t.pk for t in claim_tasks("worker-1", 5)], [queued.pk])
+		self.assertEqual(claim_tasks("worker-2", 5), [])
+
+		Task.objects.filter(pk=queued.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+		reclaimed = claim_tasks("worker-2", 5)
+		self.assertEqual([(t.pk, t.attempts) for t in reclaimed], [(queued.pk, 2)])
+		# The first worker's late finish no longer applies to a task it lost.
+		run_task(Task.objects.get(pk=queued.pk), "worker-1")
+		self.assertEqual(Task.objects.get(pk=queued.pk).locked_by, "worker-2")
+
+	def test_only_decorated_functions_are_tasks(self):
+		with self.assertRaises(ValueError):
+			enqueue(print, "x")
+		Task.objects.create(name="os.system", args=["true"])
+
+		Task.objects.create(name="pages.missing_module.task")
+
+		run_pending_tasks()
+		for queued in Task.objects.all():
+			self.assertEqual((queued.status, queued.attempts), (Task.Status.FAILED, 1))
+		self.assertIn("is not a task", Task.objects.get(name="os.system").last_error)
+
+	def test_run_worker_command_drains_the_queue(self):
+		enqueue(_recording_task, "cmd")
+		out = StringIO()
+
+		call_command("run_worker", "--once", stdout=out)
+
+		self.assertIn("ran 1 task(s)", out.getvalue())
+		self.assertEqual(TASK_CALLS, ["cmd"])
+
+	def test_inventory_pdf_reads_the_products_in_one_pass(self):
+		Product.objects.create(name="Lamp", price=Decimal("5.00"), stock=2)
+
+		with self.assertNumQueries(1):
+			self.assertTrue(render_inventory_pdf().startswith(b"%PDF"))
+		Product.objects.all().delete()
+		with self.assertNumQueries(1):
+			render_inventory_pdf()
+
+	def test_inventory_pdf_is_built_in_the_background(self):
+		media_root = tempfile.TemporaryDirectory()
+		self.addCleanup(media_root.cleanup)
+		admin_user = get_user_model().objects.create_superuser("boss", "boss@example.com", "secret123")
+		self.client.force_login(admin_user)
+		Product.objects.create(name="Lamp", price=Decimal("5.00"), stock=2)
+
+		with override_settings(MEDIA_ROOT=media_root.name):
+			self.client.get(reverse("admin:pages_product_export_inventory"))
+			self.client.get(reverse("admin:pages_product_export_inventory"))
+			self.assertEqual(Task.objects.count(), 1)
+			self.assertFalse(default_storage.exists(INVENTORY_REPORT_NAME))
+
+			run_pending_tasks()
+			response = self.client.get(reverse("admin:pages_product_inventory_report"))
+
+		self.assertEqual(response["Content-Type"], "application/pdf")
+		self.assertTrue(b"".join(response.streaming_content).startswith(b"%PDF"))
+
+
+def _busy_for(seconds):
+	deadline = time.perf_counter() + seconds
+	while time.perf_counter() < deadline:
+		pass
+
+
+class RequestProfilingTests(TestCase):
+	def setUp(self):
+		reset_catalog()
+		Product.objects.create(name="Lamp", price=Decimal("5.00"), stock=2)
+		self.staff = get_user_model().objects.create_user("ops", password="secret123", is_staff=True)
+		self.customer = get_user_model().objects.create_user("buyer", password="secret123")
+
+	def test_requests_are_not_profiled_unless_asked(self):
+		self.client.force_login(self.customer)
+
+		with patch("pages.middleware.new_profiler") as profiler:
+			response = self.client.get(reverse("products"), HTTP_X_PROFILE="1")
+
+		profiler.assert_not_called()
+		self.assertNotIn("X-Profile-Id", response)
+		self.assertFalse(RequestProfile.objects.exists())
+
+	def test_staff_header_stores_sql_and_template_timings(self):
+		self.client.force_login(self.staff)
+
+		response = self.client.get(reverse("products"), HTTP_X_PROFILE="1")
+
+		profile = RequestProfile.objects.get(pk=response["X-Profile-Id"])
+		self.assertEqual((profile.trigger, profile.status_code, profile.view_name), ("header", 200, "products"))
+		self.assertEqual(profile.user, self.staff)
+		self.assertGreater(profile.sql_count, 0)
+		self.assertTrue(any("pages_product" in query["sql"] for query in profile.queries))
+		self.assertEqual(profile.templates[0]["template"], "pages/products/index.html")
+		self.assertGreater(profile.template_ms, 0)
+		self.assertGreaterEqual(profile.duration_ms, profile.sql_ms)
+
+	@override_settings(PROFILE_SAMPLE_RATE=1.0, PROFILE_KEEP=2)
+	def test_sampled_requests_are_profiled_and_pruned(self):
+		for _ in range(3):
+			response = self.client.get(reverse("products"))
+
+		self.assertNotIn("X-Profile-Id", response)
+		self.assertEqual(list(RequestProfile.objects.values_list("trigger", flat=True)), ["sampled", "sampled"])
+
+	def test_sampler_folds_stacks(self):
+		worker = threading.Thread(target=_busy_for, args=(0.2,))
+		worker.start()
+		sampler = StackSampler(worker.ident, 0.002)
+		sampler.start()
+		worker.join()
+		sampler.stop()
+
+		folded = sampler.folded()
+		self.assertIn("pages.tests:_busy_for", folded)
+		self.assertEqual(hot_frames(folded)[0][0], "pages.tests:_busy_for")
+
+	def test_admin_downloads_folded_stacks(self):
+		self.client.force_login(get_user_model().objects.create_superuser("root", "root@example.com", "secret123"))
+		profile = RequestProfile.objects.create(
+			method="GET", path="/", status_code=200, trigger="header", duration_ms=12, sample_interval_ms=5,
+			sample_count=3, sql_count=0, sql_ms=0, template_ms=1, folded="a;b 2\na;c 1",
+		)
+
+		self.assertContains(self.client.get(reverse("admin:pages_requestprofile_change", args=[profile.pk])), "<code>b</code> 2")
+		response = self.client.get(reverse("admin:pages_requestprofile_folded", args=[profile.pk]))
+		self.assertEqual(response.content, b"a;b 2\na;c 1")
+
+
+class BenchmarkSuiteTests(TestCase):
+	@patch("pages.benchmarks.MIN_RUN_SECONDS", 0.001)
+	def test_benchmarks_report_timing_and_memory_and_roll_back_fixtures(self):
+		results = run_benchmarks(["preference_payload[10]", "msgfmt_make_mo[1000]"], repeat=2)
+
+		self.assertEqual(set(results), {"preference_payload[10]", "msgfmt_make_mo[1000]"})
+		for result in results.values():
+			self.assertGreater(result["median_ms"], 0)
+			self.assertGreater(result["peak_kib"], 0)
+			self.assertEqual(result["runs"], 2)
+		self.assertFalse(Product.objects.exists())
+
+	def test_regressions_are_flagged_past_the_threshold(self):
+		baseline = {"a": {"median_ms": 10.0, "peak_kib": 100.0}, "b": {"median_ms": 10.0, "peak_kib": 100.0}}
+		results = {
+			"a": {"median_ms": 12.0, "peak_kib": 100.0},
+			"b": {"median_ms": 10.0, "peak_kib": 200.0},
+			"c": {"median_ms": 99.0, "peak_kib": 1.0},
+		}
+
+		self.assertEqual(find_regressions(results, baseline, 0.25), [("b", "peak_kib", 100.0, 200.0)])
+
+	def test_committed_baseline_covers_every_benchmark(self):
+		baseline = json.loads(BASELINE_PATH.read_text(encoding="utf-8"))["results"]
+
+		self.assertEqual(set(baseline), {bench.name for bench in BENCHMARKS})
@@ -0,0 +1,13 @@
+"""Text normalization shared by product search (admin) and autocomplete."""
+import re
+import unicodedata
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize(text):
+    """``"  Café-Crème "`` -> ``"cafe creme"``."""
+    if not text.isascii():
+        decomposed = unicodedata.normalize("NFKD", text)
+        text = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_WORD.sub(" ", text.casefold()).strip()
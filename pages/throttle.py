@@ -0,0 +1,61 @@
+"""Token-bucket request limits kept in the shared cache.
+
+Each bucket is one cache entry holding ``(tokens, updated_at)``; a check is one ``get`` and
+one ``set`` whatever the traffic. The read-modify-write is not atomic, so concurrent
+requests may occasionally both take the last token; that slack is accepted to stay
+backend-agnostic.
+"""
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+_UNITS = {"s": 1, "sec": 1, "min": 60, "h": 3600, "hour": 3600}
+
+
+def parse_rate(rate):
+    """``"30/min"`` -> ``(30, 0.5)``: bucket capacity and tokens refilled per second."""
+    count, _, unit = rate.partition("/")
+    count = int(count)
+    return count, count / _UNITS[unit.strip()]
+
+
+def take_token(key, rate, now=None):
+    """Spend one token from bucket ``key``; returns 0 if allowed, else seconds until a token is available."""
+    capacity, refill = parse_rate(rate)
+    now = time.time() if now is None else now
+    tokens, updated_at = cache.get(key, (capacity, now))
+    tokens = min(capacity, tokens + (now - updated_at) * refill)
+    if tokens < 1:
+        return (1 - tokens) / refill
+    # Expires once it would have refilled completely; a missing bucket reads as full.
+    cache.set(key, (tokens - 1, now), timeout=math.ceil(capacity / refill))
+    return 0
+
+
+def client_ip(request):
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR")
+    proxies = settings.THROTTLE_PROXY_COUNT
+    if proxies and forwarded:
+        # Only trust the hop our own proxies appended; anything further left is client-supplied.
+        hops = [hop.strip() for hop in forwarded.split(",")]
+        return hops[-proxies] if len(hops) >= proxies else hops[0]
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def check_request(request, route, user_id=None):
+    """Return the ``Retry-After`` seconds if ``request`` is over a limit for ``route``, else 0."""
+    rates = settings.THROTTLE_RATES.get(route)
+    if not rates:
+        return 0
+    buckets = []
+    if user_id is not None and "user" in rates:
+        buckets.append((f"throttle:{route}:user:{user_id}", rates["user"]))
+    if "ip" in rates:
+        buckets.append((f"throttle:{route}:ip:{client_ip(request)}", rates["ip"]))
+    for key, rate in buckets:
+        wait = take_token(key, rate)
+        if wait:
+            return wait
+    return 0
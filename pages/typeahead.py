@@ -0,0 +1,86 @@
+"""Per-worker prefix index for product-name autocomplete.
+
+Names are normalized (accent-folded, case-folded, punctuation collapsed) and indexed from the
+start of every word, in one sorted array searched with ``bisect``. Results are ranked by
+``cantidad_vendidos``. Short prefixes match large ranges, so their top results are ranked
+once and memoized on the index; longer prefixes rank their (small) matching range per query.
+The index is derived from the catalog snapshot and rebuilt whenever the catalog version moves.
+"""
+import heapq
+import threading
+from bisect import bisect_left
+
+from .catalog import get_catalog
+from .text import normalize
+
+MAX_RESULTS = 10
+# Results for prefixes up to this length are memoized per index.
+PRECOMPUTED_PREFIX_LENGTH = 3
+
+
+class TypeaheadIndex:
+    __slots__ = ("version", "keys", "product_ids", "ranks", "short_prefixes", "products")
+
+    def __init__(self, version, products):
+        self.version = version
+        self.products = {product.id: product for product in products}
+        by_rank = sorted(products, key=lambda product: (-product.cantidad_vendidos, product.name, product.id))
+        rank_of = {product.id: rank for rank, product in enumerate(by_rank)}
+
+        entries = []
+        for product in products:
+            words = normalize(product.name).split()
+            # One entry per word start, so "stove" also finds "Camping Stove".
+            for position in range(len(words)):
+                entries.append((" ".join(words[position:]), rank_of[product.id], product.id))
+        entries.sort()
+        self.keys = [key for key, _rank, _product_id in entries]
+        self.ranks = [rank for _key, rank, _product_id in entries]
+        self.product_ids = [product_id for _key, _rank, product_id in entries]
+
+        self.short_prefixes = {}
+
+    def _rank(self, prefix, limit):
+        start = bisect_left(self.keys, prefix)
+        # Every key starting with ``prefix`` sorts before prefix + U+10FFFF.
+        end = bisect_left(self.keys, prefix + "\U0010ffff", start)
+        # A product can match through several of its words, so fetch more entries until they
+        # hold ``limit`` distinct products or the range runs out.
+        fetch = limit
+        while True:
+            best = heapq.nsmallest(fetch, range(start, end), key=self.ranks.__getitem__)
+            product_ids = list(dict.fromkeys(self.product_ids[position] for position in best))
+            if len(product_ids) >= limit or fetch >= end - start:
+                return product_ids[:limit]
+            fetch *= 2
+
+    def suggest(self, query, limit=MAX_RESULTS):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        if len(prefix) <= PRECOMPUTED_PREFIX_LENGTH:
+            product_ids = self.short_prefixes.get(prefix)
+            if product_ids is None:
+                product_ids = self.short_prefixes[prefix] = self._rank(prefix, MAX_RESULTS)
+        else:
+            product_ids = self._rank(prefix, MAX_RESULTS)
+        return [self.products[product_id] for product_id in product_ids[: min(limit, MAX_RESULTS)]]
+
+
+_index = None
+_rebuild_lock = threading.Lock()
+
+
+def get_typeahead():
+    """Return the index for the current catalog snapshot, rebuilding it when the catalog changed."""
+    global _index
+    catalog = get_catalog()
+    index = _index
+    if index is not None and index.version == catalog.version:
+        return index
+    with _rebuild_lock:
+        index = _index
+        if index is None or index.version != catalog.version:
+            index = TypeaheadIndex(catalog.version, catalog.products)
+            _index = index
+    return index
@@ -8,9 +8,14 @@ from .views import (
 	ProductIndexView,
 	ProductShowView,
 	add_to_cart,
+	best_sellers_api,
+	cache_stats_view,
+	healthz,
 	cart_view,
 	mercado_pago_checkout,
 	product_inventory_api,
+	product_changes_api,
+	product_suggest_api,
 	register,
 	remove_from_cart,
 	payment_success,
@@ -18,13 +23,14 @@ from .views import (
 	payment_pending,
 	orders_list,
 	order_detail,
+	order_invoice,
 )
 
 urlpatterns = [
 	path('', HomePageView.as_view(), name='home'),
 	path('about/', AboutPageView.as_view(), name='about'),
 	path('products/', ProductIndexView.as_view(), name='products'),
-	path('products/<str:id>', ProductShowView.as_view(), name='show'),
+	path('products/<int:id>', ProductShowView.as_view(), name='show'),
 	path('products/create', ProductCreateView.as_view(), name='form'),
 	path('login/', auth_views.LoginView.as_view(template_name='pages/login.html'), name='login'),
 	path('logout/', auth_views.LogoutView.as_view(next_page='/login/'), name='logout'),
@@ -37,6 +43,12 @@ urlpatterns = [
 	path("payments/failure/", payment_failure, name="payment_failure"),
 	path("payments/pending/", payment_pending, name="payment_pending"),
 	path("api/products/", product_inventory_api, name="product_inventory_api"),
+	path("api/products/changes/", product_changes_api, name="product_changes_api"),
+	path("api/products/suggest/", product_suggest_api, name="product_suggest_api"),
+	path("api/best-sellers/", best_sellers_api, name="best_sellers_api"),
 	path("orders/", orders_list, name="orders_list"),
 	path("orders/<int:pk>/", order_detail, name="order_detail"),
+	path("orders/<int:pk>/invoice.pdf", order_invoice, name="order_invoice"),
+	path("healthz/", healthz, name="healthz"),
+	path("cache/stats/", cache_stats_view, name="cache_stats"),
 ]
@@ -1,40 +1,92 @@
 from decimal import Decimal
+from functools import wraps
 import logging
 
-import mercadopago
-
-from django.http import HttpResponse # new
+from django.http import FileResponse, Http404, HttpResponse # new
 from django.views.generic import TemplateView
 from django.views import View
 from django import forms
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from django.utils.translation import gettext as _
+from django.utils.translation import get_language, gettext as _
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.decorators import method_decorator
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.http import require_GET
-from .models import Cart, CartItem, Order, OrderItem, Product
+from django.contrib.admin.views.decorators import staff_member_required
+from django.views.decorators.http import condition, require_GET
+from .archive import find_order
+from .cache import cache_stats, namespace_version
+from .catalog import get_catalog
+from .changefeed import changes_since
+from .checkout import cart_fingerprint, checkout_lock, preference_expires_at, reusable_order
+from .facets import find_bucket
+from .guest_cart import add_to_guest_cart, guest_cart_items, read_guest_cart, write_guest_cart
+from .invoices import ensure_invoice
+from .logs import bind_correlation_id, get_correlation_id
+from .models import ArchivedOrder, Cart, CartItem, Order, OrderItem, Product
+from .recommendations import RECOMMENDATIONS_NAMESPACE, related_product_ids
+from .sales import best_sellers, record_order_sales
+from .tasks import enqueue, task
+from .typeahead import MAX_RESULTS, get_typeahead
 from django.shortcuts import get_object_or_404
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
 from django.urls import reverse
 from django.http import JsonResponse
 
 logger = logging.getLogger(__name__)
+# Checkout and payment-callback events; payer fields are redacted by pages.logs.JsonFormatter.
+payments_logger = logging.getLogger("pages.payments")
+
+def _cart_count(request):
+    # Memoized per request: catalog ETags and the page itself both need it.
+    if not hasattr(request, "_cart_count"):
+        if request.user.is_authenticated:
+            count = CartItem.objects.filter(cart__user=request.user).aggregate(total=Sum("quantity"))["total"] or 0
+        else:
+            # Guests: read straight from the signed cookie, no database round trip.
+            count = sum(read_guest_cart(request).values())
+        request._cart_count = count
+    return request._cart_count
 
-@login_required(login_url='/login/')
 def cart_view(request):
-    cart, created = Cart.objects.get_or_create(user=request.user)
-    items = cart.cartitem_set.all()
-    total = sum(item.get_total() for item in items)
+    if request.user.is_authenticated:
+        cart, created = Cart.objects.get_or_create(user=request.user)
+        items = cart.cartitem_set.select_related("product")
+        total = sum(item.get_total() for item in items)
+    else:
+        items, total = guest_cart_items(read_guest_cart(request), get_catalog())
     return render(request, 'pages/cart.html', {
         'cart_items': items,
         'total': total,
         'mercadopago_ready': bool(settings.MERCADOPAGO_ACCESS_TOKEN),
     })
 
-@login_required(login_url='/login/')
+def _add_to_guest_cart(request, product_id):
+    if get_catalog().get(product_id) is None:
+        raise Http404(_("Product not found."))
+    items = read_guest_cart(request)
+    added = add_to_guest_cart(items, product_id)
+    message = _("Product added to cart.") if added else _("Your cart is full.")
+
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        response = JsonResponse({
+            "success": added,
+            "cart_count": sum(items.values()),
+            "message": message,
+        })
+    else:
+        (messages.success if added else messages.error)(request, message)
+        response = redirect("cart")
+    write_guest_cart(response, items)
+    return response
+
 def add_to_cart(request, product_id):
     if request.method == "POST":
+        if not request.user.is_authenticated:
+            return _add_to_guest_cart(request, product_id)
         product = get_object_or_404(Product, id=product_id)
         cart, created = Cart.objects.get_or_create(user=request.user)
         cart_item, created = CartItem.objects.get_or_create(cart=cart, product=product)
@@ -53,8 +105,14 @@ def add_to_cart(request, product_id):
         messages.success(request, _("Product added to cart."))
         return redirect("cart")
 
-@login_required
 def remove_from_cart(request, product_id):
+    if not request.user.is_authenticated:
+        items = read_guest_cart(request)
+        response = redirect("cart")
+        if items.pop(product_id, None):
+            messages.info(request, _("Product removed from cart."))
+            write_guest_cart(response, items)
+        return response
     cart = get_object_or_404(Cart, user=request.user)
     product = get_object_or_404(Product, id=product_id)
     cart_item = CartItem.objects.filter(cart=cart, product=product).first()
@@ -82,20 +140,15 @@ class HomePageView(TemplateView):
     def get_context_data(self, **kwargs):
         import random
         context = super().get_context_data(**kwargs)
-        productos_mas_vendidos = Product.objects.order_by('-cantidad_vendidos')[:4]
-        context['productos_mas_vendidos'] = productos_mas_vendidos
-        producto_dia = Product.objects.filter(es_producto_dia=True).first()
+        catalog = get_catalog()
+        best = (catalog.get(product_id) for product_id, _units in best_sellers(limit=4))
+        context['productos_mas_vendidos'] = [product for product in best if product is not None]
+        producto_dia = catalog.product_of_day
         if producto_dia:
             context['producto_aleatorio'] = producto_dia
         else:
-            productos = list(Product.objects.all())
-            context['producto_aleatorio'] = random.choice(productos) if productos else None
-        # Contar productos en carrito si autenticado
-        if self.request.user.is_authenticated:
-            cart, created = Cart.objects.get_or_create(user=self.request.user)
-            context['cart_count'] = sum(item.quantity for item in cart.cartitem_set.all())
-        else:
-            context['cart_count'] = 0
+            context['producto_aleatorio'] = random.choice(catalog.products) if catalog.products else None
+        context['cart_count'] = _cart_count(self.request)
         return context
  
 class AboutPageView(TemplateView):
@@ -112,36 +165,77 @@ class AboutPageView(TemplateView):
         return context
 
 
-from django.db.models import Q  # 👈 para búsquedas con OR
+def _viewer_tag(request):
+    # Catalog pages also render the language, the login state and the cart badge.
+    viewer = request.user.pk if request.user.is_authenticated else "anon"
+    return f"{get_language()}-{viewer}-{_cart_count(request)}"
+
+
+def _has_pending_messages(request):
+    # A 304 would leave flashed messages queued but never shown; len() does not consume them.
+    return bool(len(messages.get_messages(request)))
+
+
+def _catalog_etag(request, *args, **kwargs):
+    if _has_pending_messages(request):
+        return None
+    return f"catalog-{get_catalog().version}-{_viewer_tag(request)}"
+
+
+def _product_etag(request, id):
+    product = get_catalog().get(id)
+    if product is None or _has_pending_messages(request):
+        return None
+    recommendations = namespace_version(RECOMMENDATIONS_NAMESPACE)
+    return f"product-{product.id}-{product.updated_at.timestamp()}-{recommendations}-{_viewer_tag(request)}"
+
+
+def _product_last_modified(request, id):
+    product = get_catalog().get(id)
+    if product is None or _has_pending_messages(request):
+        return None
+    return product.updated_at
+
+
+def catalog_cache_headers(view):
+    """Let browsers revalidate catalog pages by ETag; shared caches never store them.
+
+    Every page renders a CSRF token (language switcher, add-to-cart buttons), so none is the
+    same for two visitors. The JSON catalog API carries no token and stays publicly cacheable.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        patch_vary_headers(response, ("Accept-Language", "Cookie"))
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return wrapper
+
 
 class ProductIndexView(View):
     template_name = 'pages/products/index.html'
  
+    @method_decorator(catalog_cache_headers)
+    @method_decorator(condition(etag_func=_catalog_etag))
     def get(self, request):
         query = request.GET.get("q")
         order = request.GET.get("order")
-        products = Product.objects.all()
-        if query:
-            products = products.filter(
-                Q(name__icontains=query)
-            )
-        if order == "price_asc":
-            products = products.order_by("price")
-        elif order == "price_desc":
-            products = products.order_by("-price")
+        catalog = get_catalog()
+        # Unknown bucket keys are ignored rather than emptying the list.
+        price = find_bucket(catalog.price_buckets, request.GET.get("price"))
+        stock = find_bucket(catalog.stock_buckets, request.GET.get("stock"))
+        products = catalog.search(query, order, price, stock)
 
-        # Contar productos en carrito si autenticado
-        if request.user.is_authenticated:
-            cart, created = Cart.objects.get_or_create(user=request.user)
-            cart_count = sum(item.quantity for item in cart.cartitem_set.all())
-        else:
-            cart_count = 0
+        cart_count = _cart_count(request)
 
         viewData = {
             "title": _("Products - Online Store"),
             "subtitle": _("List of products"),
             "products": products,
             "query": query,
+            "facets": catalog.facets(query, price, stock),
+            "selected_price": price.key if price else "",
+            "selected_stock": stock.key if stock else "",
             "cart_count": cart_count,
         }
         return render(request, self.template_name, viewData)
@@ -151,19 +245,21 @@ class ProductIndexView(View):
 class ProductShowView(View):
     template_name = 'pages/products/show.html'
  
+    @method_decorator(catalog_cache_headers)
+    @method_decorator(condition(etag_func=_product_etag, last_modified_func=_product_last_modified))
     def get(self, request, id):
         viewData = {}
-        product = Product.objects.get(pk=id)  # ✅ busca en la BD
+        catalog = get_catalog()
+        product = catalog.get(id)
+        if product is None:
+            raise Http404(_("Product not found."))
         viewData["title"] = _("%(product)s - Online Store") % {"product": product.name}
         viewData["subtitle"] = _("%(product)s - Product information") % {"product": product.name}
         viewData["product"] = product
-        # Contar productos en carrito si autenticado
-        if request.user.is_authenticated:
-            cart, created = Cart.objects.get_or_create(user=request.user)
-            cart_count = sum(item.quantity for item in cart.cartitem_set.all())
-        else:
-            cart_count = 0
-        viewData["cart_count"] = cart_count
+        viewData["related_products"] = [
+            catalog.get(related_id) for related_id in related_product_ids(product.id) if catalog.get(related_id)
+        ]
+        viewData["cart_count"] = _cart_count(request)
         return render(request, self.template_name, viewData)
 
 class ProductForm(forms.Form):
@@ -194,7 +290,7 @@ class ProductCreateView(View):
 
 @require_GET
 def product_inventory_api(request):
-    products = Product.objects.filter(stock__gt=0).order_by("name")
+    products = get_catalog().in_stock_by_name
     data = {
         "products": [
             {
@@ -209,10 +305,83 @@ def product_inventory_api(request):
     return JsonResponse(data)
 
 
+@require_GET
+def product_suggest_api(request):
+    """Autocomplete for the product search box, served from the in-memory prefix index."""
+    try:
+        limit = min(max(int(request.GET.get("limit", MAX_RESULTS)), 1), MAX_RESULTS)
+    except ValueError:
+        limit = MAX_RESULTS
+    products = get_typeahead().suggest(request.GET.get("q", "")[:100], limit)
+    response = JsonResponse(
+        {
+            "products": [
+                {
+                    "id": product.id,
+                    "name": product.name,
+                    "price": str(product.price),
+                    "url": reverse("show", kwargs={"id": product.id}),
+                }
+                for product in products
+            ]
+        }
+    )
+    patch_cache_control(response, public=True, max_age=settings.CATALOG_CACHE_MAX_AGE)
+    return response
+
+
+@require_GET
+def product_changes_api(request):
+    """Products changed since ``cursor``; pass back ``next_cursor`` until ``has_more`` is false."""
+    try:
+        cursor = int(request.GET.get("cursor", 0))
+        limit = int(request.GET.get("limit", settings.PRODUCT_CHANGES_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({"error": _("cursor and limit must be integers.")}, status=400)
+    limit = min(max(limit, 1), settings.PRODUCT_CHANGES_PAGE_SIZE)
+    products, next_cursor, has_more = changes_since(max(cursor, 0), limit)
+    return JsonResponse({"products": products, "next_cursor": next_cursor, "has_more": has_more})
+
+
+@require_GET
+def healthz(request):
+    # Liveness probe: touches neither the database nor the session so it answers as soon as gunicorn binds.
+    return HttpResponse("ok", content_type="text/plain")
+
+
+@staff_member_required
+@require_GET
+def cache_stats_view(request):
+    # Counters are per worker; each gunicorn process reports its own.
+    return JsonResponse({"stats": cache_stats()})
+
+
+@require_GET
+def best_sellers_api(request):
+    days = {"7": 7, "30": 30}.get(request.GET.get("days"))
+    catalog = get_catalog()
+    data = {
+        "days": days,
+        "products": [
+            {
+                "id": product_id,
+                "name": catalog.get(product_id).name,
+                "units": units,
+            }
+            for product_id, units in best_sellers(days=days, limit=10)
+            if catalog.get(product_id) is not None
+        ],
+    }
+    return JsonResponse(data)
+
+
 def _get_mercadopago_client():
     access_token = settings.MERCADOPAGO_ACCESS_TOKEN
     if not access_token:
         raise ValueError("Mercado Pago access token is not configured.")
+    # Imported on first use so workers that never take a payment don't pay for the SDK import.
+    import mercadopago
+
     return mercadopago.SDK(access_token)
 
 
@@ -240,6 +409,35 @@ def mercado_pago_checkout(request):
         messages.error(request, _("You have no products in the cart."))
         return redirect("cart")
 
+    # Stock is validated here, in the same query that loads the cart lines.
+    if any(item.quantity > item.product.stock for item in items_qs):
+        messages.error(request, _("Some products in your cart are no longer available in that quantity."))
+        return redirect("cart")
+
+    fingerprint = cart_fingerprint(items_qs)
+    order = reusable_order(request.user, fingerprint)
+    if order is not None:
+        payments_logger.info("reusing payment preference", extra={"order_id": order.pk, "preference_id": order.preference_id})
+        return redirect(order.init_point)
+
+    with checkout_lock(request.user, fingerprint) as acquired:
+        if not acquired:
+            # A double-click or second tab: follow the other request's preference if it is ready,
+            # and never create a second one.
+            order = reusable_order(request.user, fingerprint)
+            if order is None:
+                messages.info(request, _("Your checkout is already being processed. Please try again in a moment."))
+                return redirect("cart")
+            return redirect(order.init_point)
+        # Checked again under the lock, in case a concurrent checkout finished in between.
+        order = reusable_order(request.user, fingerprint)
+        if order is not None:
+            return redirect(order.init_point)
+        return _create_payment_order(request, sdk, items_qs, total, fingerprint)
+
+
+def _preference_data(request, items):
+    """Mercado Pago preference payload for the cart lines ``items`` (with their products loaded)."""
     success_url = request.build_absolute_uri(reverse("payment_success"))
     failure_url = request.build_absolute_uri(reverse("payment_failure"))
     pending_url = request.build_absolute_uri(reverse("payment_pending"))
@@ -253,7 +451,7 @@ def mercado_pago_checkout(request):
                 "currency_id": "COP",
                 "unit_price": float(item.product.price),
             }
-            for item in items_qs
+            for item in items
         ],
         "payer": {
             "name": request.user.first_name,
@@ -269,22 +467,38 @@ def mercado_pago_checkout(request):
 
     if success_url.startswith("https://"):
         preference_data["auto_return"] = "approved"
+    return preference_data
 
-    print("Mercado Pago preference payload:", preference_data)
+
+def _create_payment_order(request, sdk, items_qs, total, fingerprint):
+    preference_data = _preference_data(request, items_qs)
+
+    # Expires when the order stops being reused, so a stale tab cannot pay for an outdated cart.
+    preference_data["expires"] = True
+    preference_data["expiration_date_to"] = preference_expires_at().isoformat(timespec="milliseconds")
+
+    correlation_id = get_correlation_id() or ""
+    # Mercado Pago echoes it back on the payment, tying their records to our logs.
+    preference_data["external_reference"] = correlation_id
+    payments_logger.info("creating payment preference", extra={"preference": preference_data})
+
+    import mercadopago
 
     try:
         preference_response = sdk.preference().create(preference_data)
         preference = preference_response.get("response", {})
-        print("Mercado Pago preference response:", preference_response)
+        payments_logger.info(
+            "payment preference created",
+            extra={"status": preference_response.get("status"), "preference_id": preference.get("id")},
+        )
     except mercadopago.exceptions.MPApiException as exc:
         error_response = getattr(exc, "response", {}) or {}
         error_msg = error_response.get("message") or error_response.get("error") or str(exc)
-        logger.warning("Mercado Pago API error while creating preference: %s", error_response)
-        print("Mercado Pago API error while creating preference:", error_response)
+        payments_logger.warning("Mercado Pago API error while creating preference", extra={"response": error_response})
         messages.error(request, _("Mercado Pago error: %(msg)s") % {"msg": error_msg})
         return redirect("cart")
     except Exception as exc:  # pragma: no cover - network failure safeguard
-        logger.exception("Unexpected error while creating Mercado Pago preference")
+        payments_logger.exception("Unexpected error while creating Mercado Pago preference")
         messages.error(request, str(exc))
         return redirect("cart")
 
@@ -295,23 +509,28 @@ def mercado_pago_checkout(request):
         messages.error(request, _("There was an error creating the payment preference."))
         return redirect("cart")
 
-    order = Order.objects.create(
-        user=request.user,
-        preference_id=preference_id,
-        total=total,
-    )
-
-    order_items = [
-        OrderItem(
-            order=order,
-            product=item.product,
-            product_name=item.product.name,
-            quantity=item.quantity,
-            unit_price=item.product.price,
+    # Committed together, so a checkout waiting on the lock never sees an order without its items.
+    with transaction.atomic():
+        order = Order.objects.create(
+            user=request.user,
+            preference_id=preference_id,
+            total=total,
+            correlation_id=correlation_id,
+            cart_fingerprint=fingerprint,
+            init_point=init_point,
         )
-        for item in items_qs
-    ]
-    OrderItem.objects.bulk_create(order_items)
+
+        order_items = [
+            OrderItem(
+                order=order,
+                product=item.product,
+                product_name=item.product.name,
+                quantity=item.quantity,
+                unit_price=item.product.price,
+            )
+            for item in items_qs
+        ]
+        OrderItem.objects.bulk_create(order_items)
 
     return redirect(init_point)
 
@@ -338,6 +557,58 @@ def _update_order_status(order, payment_response):
         order.status = Order.Status.REJECTED
 
     order.save(update_fields=["payment_id", "status", "status_detail", "updated_at"])
+    payments_logger.info(
+        "order status updated",
+        extra={"order_id": order.pk, "payment_id": order.payment_id, "status": order.status, "status_detail": detail},
+    )
+
+    if order.status == Order.Status.APPROVED:
+        record_order_sales(order)
+
+
+@task()
+def sync_payment_status(order_id, payment_id):
+    """Look the payment up at Mercado Pago and apply its status; queued when the callback's lookup failed."""
+    order = Order.objects.filter(pk=order_id).first()
+    if order is None:
+        return
+    sdk = _get_mercadopago_client()
+    _update_order_status(order, sdk.payment().get(payment_id))
+
+
+def _apply_payment_feedback(request, order, preference_id, payment_id):
+    payments_logger.info(
+        "payment callback received",
+        extra={
+            "preference_id": preference_id,
+            "payment_id": payment_id,
+            "status": request.GET.get("status"),
+            "request_id": getattr(request, "correlation_id", None),
+        },
+    )
+
+    if payment_id:
+        try:
+            sdk = _get_mercadopago_client()
+            payment_response = sdk.payment().get(payment_id)
+            _update_order_status(order, payment_response)
+        except Exception:
+            # The page shows the order as it is; the task worker retries the lookup with backoff.
+            payments_logger.exception("payment lookup failed", extra={"payment_id": payment_id})
+            enqueue(sync_payment_status, order.pk, payment_id)
+    else:
+        # fallback to status provided in the query params. The buyer controls them, so they only
+        # change the status shown on this page; the order itself changes once a payment is looked up.
+        status = request.GET.get("status")
+        mapped = {
+            "approved": Order.Status.APPROVED,
+            "pending": Order.Status.PENDING,
+            "in_process": Order.Status.PENDING,
+            "cancelled": Order.Status.CANCELLED,
+            "rejected": Order.Status.REJECTED,
+        }.get(status)
+        if mapped and order.status == Order.Status.PENDING:
+            order.status = mapped
 
 
 def _handle_payment_feedback(request):
@@ -350,30 +621,14 @@ def _handle_payment_feedback(request):
 
     order = Order.objects.filter(preference_id=preference_id, user=request.user).first()
     if not order:
+        payments_logger.warning("payment callback for unknown order", extra={"preference_id": preference_id})
         messages.error(request, _("Order not found."))
         return None
 
-    if payment_id:
-        try:
-            sdk = _get_mercadopago_client()
-            payment_response = sdk.payment().get(payment_id)
-            _update_order_status(order, payment_response)
-        except Exception as exc:  # pragma: no cover - network failure safeguard
-            messages.error(request, str(exc))
-    else:
-        # fallback to status provided in the query params
-        status = request.GET.get("status")
-        if status:
-            mapped = {
-                "approved": Order.Status.APPROVED,
-                "pending": Order.Status.PENDING,
-                "in_process": Order.Status.PENDING,
-                "cancelled": Order.Status.CANCELLED,
-                "rejected": Order.Status.REJECTED,
-            }.get(status)
-            if mapped:
-                order.status = mapped
-                order.save(update_fields=["status", "updated_at"])
+    # The callback logs under the checkout's id, so the payment can be traced from the cart on;
+    # the request's own id is restored once it is handled.
+    with bind_correlation_id(order.correlation_id or get_correlation_id()):
+        _apply_payment_feedback(request, order, preference_id, payment_id)
 
     return order
 
@@ -409,11 +664,34 @@ def payment_pending(request):
 
 @login_required(login_url='/login/')
 def orders_list(request):
-    orders = Order.objects.filter(user=request.user).order_by("-created_at")
-    return render(request, "pages/orders/list.html", {"orders": orders})
+    # Older, finalized orders live in the archive and are only read when asked for.
+    archived = request.GET.get("archived") == "1"
+    model = ArchivedOrder if archived else Order
+    orders = model.objects.filter(user=request.user).order_by("-created_at")
+    return render(request, "pages/orders/list.html", {"orders": orders, "archived": archived})
+
+
+@login_required(login_url='/login/')
+def order_invoice(request, pk):
+    order = find_order(pk, user=request.user)
+    if order is None:
+        raise Http404(_("Order not found."))
+    if not order.invoice:
+        if order.status != Order.Status.APPROVED:
+            raise Http404(_("Invoices are only available for approved orders."))
+        ensure_invoice(order)
+    # Served straight from storage; the PDF is only rendered the first time.
+    return FileResponse(
+        order.invoice.open("rb"),
+        as_attachment=True,
+        filename=f"invoice-{order.preference_id}.pdf",
+        content_type="application/pdf",
+    )
 
 
 @login_required(login_url='/login/')
 def order_detail(request, pk):
-    order = get_object_or_404(Order, pk=pk, user=request.user)
+    order = find_order(pk, user=request.user)
+    if order is None:
+        raise Http404(_("Order not found."))
     return render(request, "pages/orders/detail.html", {"order": order})